@@ -1,11 +1,39 @@
-from flask import Flask, render_template, request, url_for, send_file, redirect, jsonify
-from sqlalchemy import create_engine, MetaData, Table, and_, select, distinct, func, or_, Column, String, Float, Integer, ForeignKey
+from flask import Flask, render_template, request, url_for, send_file, redirect, jsonify, Response
+from sqlalchemy import and_, select, distinct, func, or_, bindparam
 import os
 import glob2
 from datetime import datetime
 import shutil
 import uuid
 import math
+from spatial_index import bbox_predicate_filter, normalize_predicate, PREDICATE_INSIDE, SPATIAL_PREDICATES
+from packed_index import PackedAreaIndex, NUMPY_AVAILABLE
+from intersection_filter import projects_in_intersection_range, intersection_range_filter
+from scale_utils import (
+    parse_scale_band, scale_band_condition,
+    scale_filter, parse_scale_range, scale_range_filters
+)
+from db_migrations import derived_area_values, derived_project_values
+from db_schema import projects_table, areas_table, initialize_database, live_tables, database_features
+from date_utils import parse_date_range, date_range_filters
+from text_search import (
+    prefix_filter, parse_text_query, text_matches, text_scan_filter, substring_filter, associated_scales_filter
+)
+from duplicates import parse_duplicates_args, list_duplicate_candidates
+from spatial_queries import (
+    areas_at_point, nearest_areas, MAX_NEAREST_K,
+    parse_footprint_size_range, footprint_size_filters
+)
+from batch_search import parse_batch_request, search_boxes
+from db_engine import create_sqlite_engine
+from counters import listing_total, counter_facet
+from coverage import parse_heatmap_args, coverage_grid, grid_to_json, grid_to_png, region_coverage
+import tiles
+
+try:
+    from config import INTERSECTION_FILTER_IN_SQL
+except ImportError:
+    INTERSECTION_FILTER_IN_SQL = True
 
 # Add pyproj for coordinate transformations
 try:
@@ -229,162 +257,55 @@ def datetime_filter(timestamp):
     return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
 
 DATABASE_URL = 'sqlite:///elements.db'
-engine = create_engine(DATABASE_URL)
-metadata = MetaData()
+# WAL, PRAGMAs and pool sizing from config.py (see db_engine.py); connects on first use
+engine = create_sqlite_engine(DATABASE_URL)
 
-def initialize_database():
-    """
-    Initialize the database with required tables if they don't exist.
-    This function creates the tables if the database is empty or doesn't exist.
-    """
-    try:
-        # Check if tables exist by trying to reflect them
-        metadata.reflect(bind=engine)
-        
-        # If tables don't exist, create them
-        if 'projects' not in metadata.tables or 'areas' not in metadata.tables:
-            print("🔄 Database tables not found. Creating tables...")
-            
-            # Define the projects table
-            projects_table = Table('projects', metadata,
-                Column('uuid', String, primary_key=True),
-                Column('project_name', String, nullable=False),
-                Column('user_name', String, nullable=False),
-                Column('date', String, nullable=False),
-                Column('file_location', String, nullable=False),
-                Column('paper_size', String, nullable=False),
-                Column('description', String, nullable=True)
-            )
-            
-            # Define the areas table
-            areas_table = Table('areas', metadata,
-                Column('id', Integer, primary_key=True, autoincrement=True),
-                Column('project_id', String, ForeignKey('projects.uuid'), nullable=False),
-                Column('xmin', Integer, nullable=False),
-                Column('ymin', Integer, nullable=False),
-                Column('xmax', Integer, nullable=False),
-                Column('ymax', Integer, nullable=False),
-                Column('scale', String, nullable=False)
-            )
-            
-            # Create all tables
-            metadata.create_all(engine)
-            print("✅ Database tables created successfully!")
-            
-            return projects_table, areas_table
-        else:
-            print("✅ Database tables already exist.")
-            # Return the existing tables
-            return metadata.tables['projects'], metadata.tables['areas']
-            
-    except Exception as e:
-        print(f"❌ Error initializing database: {e}")
-        # Create tables from scratch if reflection fails
-        print("🔄 Creating tables from scratch...")
-        
-        # Clear metadata and create tables
-        metadata.clear()
-        
-        projects_table = Table('projects', metadata,
-            Column('uuid', String, primary_key=True),
-            Column('project_name', String, nullable=False),
-            Column('user_name', String, nullable=False),
-            Column('date', String, nullable=False),
-            Column('file_location', String, nullable=False),
-            Column('paper_size', String, nullable=False),
-            Column('description', String, nullable=True)
-        )
-        
-        areas_table = Table('areas', metadata,
-            Column('id', Integer, primary_key=True, autoincrement=True),
-            Column('project_id', String, ForeignKey('projects.uuid'), nullable=False),
-            Column('xmin', Float, nullable=False),
-            Column('ymin', Float, nullable=False),
-            Column('xmax', Float, nullable=False),
-            Column('ymax', Float, nullable=False),
-            Column('scale', String, nullable=False)
-        )
-        
-        metadata.create_all(engine)
-        print("✅ Database tables created successfully!")
-        return projects_table, areas_table
+# In-memory spatial index, loaded lazily on the first search of each worker
+area_index = PackedAreaIndex(engine)
 
-# Initialize database and get table references
-projects_table, areas_table = initialize_database()
+# Optional indexes of the database, set by create_app(); it also replaces
+# projects_table and areas_table by the tables with the database's columns
+RTREE_AVAILABLE = False
+FTS_AVAILABLE = False
+TRIGRAM_AVAILABLE = False
+DUPLICATES_AVAILABLE = False
 
-def create_sample_data():
+def setup_database():
     """
-    Create sample data if the database is empty.
-    This function adds some example projects and areas for testing.
+    Create, migrate and index the database like `python db_schema.py`. For
+    single-process servers, which can do it themselves before create_app();
+    gunicorn workers must not, so main.py leaves it to the init command.
     """
-    try:
-        with engine.connect() as conn:
-            # Check if there are any projects
-            result = conn.execute(select(func.count()).select_from(projects_table)).scalar()
-            
-            if result == 0:
-                print("📝 Database is empty. Creating sample data...")
-                
-                # Sample projects
-                sample_projects = [
-                    {
-                        'uuid': 'sample001',
-                        'project_name': 'Sample Project 1',
-                        'user_name': 'Test User',
-                        'date': '01-01-24',
-                        'file_location': 'sampleDataset/sample1',
-                        'paper_size': 'A1',
-                        'description': 'Sample project for testing'
-                    },
-                    {
-                        'uuid': 'sample002',
-                        'project_name': 'Sample Project 2',
-                        'user_name': 'Test User',
-                        'date': '02-01-24',
-                        'file_location': 'sampleDataset/sample2',
-                        'paper_size': 'A2',
-                        'description': 'Another sample project'
-                    }
-                ]
-                
-                # Sample areas
-                sample_areas = [
-                    {
-                        'project_id': 'sample001',
-                        'xmin': 732387,
-                        'ymin': 3595538,
-                        'xmax': 740294,
-                        'ymax': 3601127,
-                        'scale': '1:1000'
-                    },
-                    {
-                        'project_id': 'sample002',
-                        'xmin': 741000,
-                        'ymin': 3600000,
-                        'xmax': 742000,
-                        'ymax': 3602000,
-                        'scale': '1:2000'
-                    }
-                ]
-                
-                # Insert sample projects
-                for project in sample_projects:
-                    conn.execute(projects_table.insert().values(**project))
-                
-                # Insert sample areas
-                for area in sample_areas:
-                    conn.execute(areas_table.insert().values(**area))
-                
-                conn.commit()
-                print("✅ Sample data created successfully!")
-            else:
-                print(f"📊 Database contains {result} projects. Skipping sample data creation.")
-                
-    except Exception as e:
-        print(f"❌ Error creating sample data: {e}")
+    initialize_database(engine)
 
-# Create sample data if database is empty
-create_sample_data()
+def create_app(database_url=None):
+    """
+    Prepare the app for serving and return it.
+
+    Creating and migrating the schema, building the indexes and adding sample
+    data is left to `python db_schema.py`, run once before the workers start.
+    This only reads which columns and optional indexes the database has; a
+    database with pending migrations is served without the newer columns.
+
+    Args:
+        database_url: serve another database than elements.db
+
+    Raises:
+        RuntimeError: if the database has no projects or areas table
+    """
+    global engine, area_index, projects_table, areas_table
+    global RTREE_AVAILABLE, FTS_AVAILABLE, TRIGRAM_AVAILABLE, DUPLICATES_AVAILABLE
+    new_engine = engine if database_url is None else create_sqlite_engine(database_url)
+    projects_table, areas_table = live_tables(new_engine)
+    features = database_features(new_engine)
+    if new_engine is not engine:
+        engine = new_engine
+        area_index = PackedAreaIndex(engine)
+    RTREE_AVAILABLE = features['rtree']
+    FTS_AVAILABLE = features['fts']
+    TRIGRAM_AVAILABLE = features['trigram']
+    DUPLICATES_AVAILABLE = features['duplicates']
+    return app
 
 
 def calculate_area_size(xmin, ymin, xmax, ymax):
@@ -447,6 +368,7 @@ def api_add_project():
     try:
         # Generate a unique UUID using the reusable function
         generated_uuid = generate_unique_uuid()
+        new_areas = []
         
         with engine.begin() as conn:
             # Insert project with generated UUID
@@ -457,7 +379,8 @@ def api_add_project():
                 date=data['date'],
                 file_location=data['file_location'],
                 paper_size=data['paper_size'],
-                description=data['description']
+                description=data['description'],
+                **derived_project_values(projects_table, data)
             ))
             
             # Insert areas if provided
@@ -485,14 +408,19 @@ def api_add_project():
                         xmax_utm, ymax_utm, _ = transform_to_utm(xmax, ymax)
                         xmin, ymin, xmax, ymax = xmin_utm, ymin_utm, xmax_utm, ymax_utm
                     
-                    conn.execute(areas_table.insert().values(
+                    area_result = conn.execute(areas_table.insert().values(
                         project_id=generated_uuid,
                         xmin=xmin,
                         ymin=ymin,
                         xmax=xmax,
                         ymax=ymax,
-                        scale=scale_value
+                        scale=scale_value,
+                        **derived_area_values(areas_table, xmin, ymin, xmax, ymax, scale_value)
                     ))
+                    new_areas.append((area_result.inserted_primary_key[0], xmin, ymin, xmax, ymax, scale_value))
+        
+        # Keep this worker's in-memory spatial index current
+        area_index.add_areas(new_areas)
         
         return jsonify({"message": "Project added successfully", "uuid": generated_uuid}), 201
     except Exception as e:
@@ -568,10 +496,142 @@ def api_get_project(uuid):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/areas/at_point', methods=['GET'])
+def api_areas_at_point():
+    """Return the map frames whose rectangle contains a coordinate, ordered by scale"""
+    point = request.args.get('point', '').strip()
+    if not point:
+        return jsonify({"error": "Missing 'point' parameter"}), 400
+    
+    coords, parse_error = parse_point(point)
+    if parse_error is not None or not coords:
+        return jsonify({"error": parse_error or "Invalid coordinate format"}), 400
+    
+    try:
+        x, y = coords
+        with engine.connect() as conn:
+            areas = areas_at_point(conn, projects_table, areas_table, x, y, use_index=RTREE_AVAILABLE, area_index=area_index)
+        return jsonify({"point": {"x": x, "y": y}, "count": len(areas), "areas": areas}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/areas/nearest', methods=['GET'])
+def api_areas_nearest():
+    """Return the k map frames closest to a coordinate, optionally filtered by scale and user"""
+    point = request.args.get('point', '').strip()
+    if not point:
+        return jsonify({"error": "Missing 'point' parameter"}), 400
+    
+    coords, parse_error = parse_point(point)
+    if parse_error is not None or not coords:
+        return jsonify({"error": parse_error or "Invalid coordinate format"}), 400
+    
+    k = request.args.get('k', 10, type=int)
+    if k is None or k < 1 or k > MAX_NEAREST_K:
+        return jsonify({"error": f"'k' must be an integer between 1 and {MAX_NEAREST_K}"}), 400
+    scale = request.args.get('scale', '').strip()
+    user = request.args.get('user', '').strip()
+    
+    try:
+        x, y = coords
+        with engine.connect() as conn:
+            areas = nearest_areas(conn, projects_table, areas_table, x, y, k, scale=scale, user=user,
+                                  use_index=RTREE_AVAILABLE, area_index=area_index)
+        return jsonify({"point": {"x": x, "y": y}, "k": k, "count": len(areas), "areas": areas}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/duplicates', methods=['GET'])
+def api_duplicates():
+    """Return near-duplicate map frame pairs found by duplicates.py, highest IoU first"""
+    if not DUPLICATES_AVAILABLE:
+        return jsonify({"error": "The duplicate_candidates table does not exist. Set up the database with: python db_schema.py"}), 500
+    options, error = parse_duplicates_args(request.args)
+    if error is not None:
+        return jsonify({"error": error}), 400
+    
+    try:
+        with engine.connect() as conn:
+            pairs = list_duplicate_candidates(conn, projects_table, **options)
+        return jsonify({"count": len(pairs), "pairs": pairs}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/projects/search_batch', methods=['POST'])
+def api_search_batch():
+    """
+    Answer many query boxes with shared filters in one request.
+    Expects JSON {"boxes": [...], "predicate": ..., other search filters}.
+    """
+    data = request.get_json(silent=True) or {}
+    boxes, predicate, filters, error = parse_batch_request(data, projects_table, areas_table, parse_point)
+    if error is not None:
+        return jsonify({"error": error}), 400
+    
+    try:
+        with engine.connect() as conn:
+            per_box = search_boxes(conn, projects_table, areas_table, boxes, predicate, filters, use_index=RTREE_AVAILABLE)
+        results = [
+            {
+                "box": i,
+                "bounds": {"xmin": box[0], "ymin": box[1], "xmax": box[2], "ymax": box[3]},
+                "count": len(projects),
+                "projects": projects
+            }
+            for i, (box, projects) in enumerate(zip(boxes, per_box))
+        ]
+        return jsonify({"predicate": predicate, "count": len(results), "results": results}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/coverage/heatmap', methods=['GET'])
+def api_coverage_heatmap():
+    """
+    Map coverage density over a UTM 36N extent: the number of map frames
+    overlapping every grid cell, as JSON or as a PNG image.
+    """
+    if not NUMPY_AVAILABLE:
+        return jsonify({"error": "Coverage heatmaps require numpy. Install with: pip install numpy"}), 500
+    
+    options, error = parse_heatmap_args(request.args)
+    if error is not None:
+        return jsonify({"error": error}), 400
+    
+    try:
+        with engine.connect() as conn:
+            grid = coverage_grid(conn, projects_table, areas_table, options, use_index=RTREE_AVAILABLE)
+        if options['format'] == 'png':
+            return Response(grid_to_png(grid), mimetype='image/png')
+        return jsonify(grid_to_json(grid, options)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def footprint_tile(z, x, y):
+    """Map frame footprints of an XYZ tile as a compact GeoJSON FeatureCollection"""
+    if not tiles.PYPROJ_AVAILABLE:
+        return jsonify({"error": "Footprint tiles require pyproj. Install with: pip install pyproj"}), 500
+    
+    tile_error = tiles.validate_tile(z, x, y)
+    if tile_error is not None:
+        return jsonify({"error": tile_error}), 404
+    
+    try:
+        with engine.connect() as conn:
+            tile, version = tiles.footprint_tile(conn, areas_table, z, x, y, use_index=RTREE_AVAILABLE, area_index=area_index)
+        response = Response(tile, mimetype='application/geo+json')
+        if version is not None:
+            response.set_etag(tiles.tile_etag(version))
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     results = None
     error = None
+    coverage = None
     # Query unique user names for the dropdown
     with engine.connect() as conn:
         user_names = [row[0] for row in conn.execute(select(projects_table.c.user_name).distinct())]
@@ -584,8 +644,17 @@ def index():
         bottom_left = request.form.get('bottom_left', '').strip()
         top_right = request.form.get('top_right', '').strip()
         # Removed: relative_size_enabled, size_percentage, inside_enabled, outside_enabled, percentage_overlap_enabled, overlap_percentage
-
-        if bottom_left and top_right:
+        # Spatial predicate: inside (default), intersects or contains
+        predicate = normalize_predicate(request.form.get('predicate', ''))
+        if predicate is None:
+            error = f"Invalid spatial predicate. Use one of: {', '.join(SPATIAL_PREDICATES)}."
+        # Scale band: restricts the search to one partition of the spatial index
+        scale_band, scale_band_error = parse_scale_band(request.form.get('scale_band', ''))
+        if scale_band_error is not None and error is None:
+            error = scale_band_error
+        spatial_filter_added = False
+
+        if bottom_left and top_right and error is None:
             bl_result = parse_point(bottom_left)
             tr_result = parse_point(top_right)
             
@@ -599,21 +668,27 @@ def index():
             else:
                 xmin, ymin = bl_result[0]
                 xmax, ymax = tr_result[0]
-                if xmin >= xmax or ymin >= ymax:
+                # Intersects/contains searches may use the same point twice ("which maps cover this point")
+                if (xmin > xmax or ymin > ymax) or (predicate == PREDICATE_INSIDE and (xmin == xmax or ymin == ymax)):
                     error = 'Bottom Left must be southwest (smaller X and Y) of Top Right. Please check your input.'
                 else:
-                    # Only use the default INSIDE spatial filter
-                    inside_filters = [
-                        areas_table.c.xmin >= xmin,
-                        areas_table.c.xmax <= xmax,
-                        areas_table.c.ymin >= ymin,
-                        areas_table.c.ymax <= ymax
-                    ]
-                    filters.append(and_(*inside_filters))
+                    # Spatial filter for the selected predicate (index backed when available)
+                    filters.append(bbox_predicate_filter(areas_table, predicate, xmin, ymin, xmax, ymax, use_index=RTREE_AVAILABLE, area_index=area_index, band=scale_band))
+                    spatial_filter_added = True
+        if scale_band is not None and not spatial_filter_added:
+            filters.append(scale_band_condition(areas_table, scale_band))
         # Parse other filters
         uuid = request.form.get('uuid', '').strip()
         if uuid:
-            filters.append(projects_table.c.uuid.ilike(f"{uuid}%"))
+            filters.append(prefix_filter(projects_table.c.uuid, uuid))
+        # Free-text search of the name, description and user (ranked when the full-text index exists)
+        matches = None
+        text_terms = parse_text_query(request.form.get('text_query', ''))
+        if text_terms:
+            if FTS_AVAILABLE:
+                matches = text_matches(text_terms)
+            else:
+                filters.append(text_scan_filter(projects_table, text_terms))
         # Handle user name searches (both partial and exact matches)
         user_name_partial = request.form.get('user_name_partial', '').strip()
         user_name_list = request.form.getlist('user_name')
@@ -622,9 +697,9 @@ def index():
         # Combine all user name filters with OR logic
         user_name_filters = []
         if user_name_partial:
-            user_name_filters.append(projects_table.c.user_name.ilike(f"{user_name_partial}%"))
+            user_name_filters.append(prefix_filter(projects_table.c.user_name, user_name_partial))
         if selected_user_names:
-            user_name_filters.extend([projects_table.c.user_name.ilike(f"{n}%") for n in selected_user_names])
+            user_name_filters.extend([prefix_filter(projects_table.c.user_name, n) for n in selected_user_names])
         
         if user_name_filters:
             filters.append(or_(*user_name_filters))
@@ -638,58 +713,44 @@ def index():
                     height_cm = float(custom_height)
                     width_cm = float(custom_width)
                     custom_size_format = f"Custom Size: Height: {height_cm} cm, Width: {width_cm} cm"
-                    filters.append(projects_table.c.paper_size.ilike(f"{custom_size_format}%"))
+                    filters.append(prefix_filter(projects_table.c.paper_size, custom_size_format))
                 except ValueError:
                     error = 'Custom height and width must be valid numbers.'
             elif paper_size != 'custom':
-                filters.append(projects_table.c.paper_size.ilike(f"{paper_size}%"))
+                filters.append(prefix_filter(projects_table.c.paper_size, paper_size))
             elif paper_size == 'custom' and (not custom_height or not custom_width):
                 error = 'Please enter both height and width for custom size.'
         scale = request.form.get('scale', '').strip()
         if scale:
             # Filter projects by checking if *any* associated area has this scale
-            # Support both old numeric format and new string format
-            try:
-                # Try to parse as float for backward compatibility
-                scale_val = float(scale)
-                filters.append(areas_table.c.scale == str(scale_val))
-            except ValueError:
-                # If not a number, treat as string scale format
-                filters.append(areas_table.c.scale.ilike(f"%{scale}%"))
+            # ("1:5000" matches the denominator exactly, legacy values match the text)
+            filters.append(scale_filter(areas_table, scale))
+        # Scale denominator range (uses the indexed scale_denominator column)
+        scale_min, scale_max, scale_range_error = parse_scale_range(
+            request.form.get('scale_min', ''), request.form.get('scale_max', ''))
+        if scale_range_error is not None:
+            error = scale_range_error
+        else:
+            filters.extend(scale_range_filters(areas_table, scale_min, scale_max))
+        # Footprint size range in km² (uses the indexed area_m2 column)
+        min_area_m2, max_area_m2, size_range_error = parse_footprint_size_range(
+            request.form.get('min_area_km2', ''), request.form.get('max_area_km2', ''))
+        if size_range_error is not None:
+            error = size_range_error
+        else:
+            filters.extend(footprint_size_filters(areas_table, min_area_m2, max_area_m2))
 
         # Parse date range
         date_from = request.form.get('date_from', '').strip()
         date_to = request.form.get('date_to', '').strip()
 
         if date_from or date_to:
-            # Convert DD/MM/YYYY format to database format (DD-MM-YY) for comparison
-            def convert_date_to_db_format(date_str):
-                try:
-                    if date_str and '/' in date_str:  # DD/MM/YYYY format
-                        day, month, year = date_str.split('/')
-                        # Convert to DD-MM-YY format for database comparison
-                        return f"{day.zfill(2)}-{month.zfill(2)}-{year[2:]}"
-                    elif date_str and '-' in date_str:  # DD-MM-YY format (already correct)
-                        return date_str
-                    return None
-                except:
-                    return None
-
-            if date_from:
-                converted_from = convert_date_to_db_format(date_from)
-                if converted_from:
-                    # For date comparison, we need to ensure proper string comparison
-                    filters.append(projects_table.c.date >= converted_from)
-                else:
-                    error = 'Invalid date format for "From Date". Use DD/MM/YYYY format.'
-
-            if date_to:
-                converted_to = convert_date_to_db_format(date_to)
-                if converted_to:
-                    # For date comparison, we need to ensure proper string comparison
-                    filters.append(projects_table.c.date <= converted_to)
-                else:
-                    error = 'Invalid date format for "To Date". Use DD/MM/YYYY format.'
+            # DD/MM/YYYY to ISO-8601, compared with the indexed date_iso column
+            iso_from, iso_to, date_error = parse_date_range(date_from, date_to)
+            if date_error is not None:
+                error = date_error
+            else:
+                filters.extend(date_range_filters(projects_table, iso_from, iso_to))
 
         # Parse intersection range filter
         intersection_range_enabled = request.form.get('relative_size') == '1'
@@ -707,11 +768,22 @@ def index():
                 except ValueError:
                     error = 'Intersection range values must be valid numbers.'
 
+        # Run the intersection range filter inside SQLite when configured
+        intersection_in_sql = False
+        if error is None and INTERSECTION_FILTER_IN_SQL and intersection_range_enabled and bottom_left and top_right:
+            filters.append(intersection_range_filter(
+                projects_table, areas_table, xmin, ymin, xmax, ymax,
+                float(intersection_range_from), float(intersection_range_to)
+            ))
+            intersection_in_sql = True
+
         if error is None:
             with engine.connect() as conn:
                 # Use the same aggregation approach for all search results to ensure consistent associated_scales
                 # This matches the "All Projects" table approach exactly
                 projects_join_stmt = projects_table.outerjoin(areas_table, projects_table.c.uuid == areas_table.c.project_id)
+                if matches is not None:
+                    projects_join_stmt = projects_join_stmt.join(matches, matches.c.uuid == projects_table.c.uuid)
                 sel = select(
                     projects_table.c.uuid,
                     projects_table.c.project_name,
@@ -735,48 +807,40 @@ def index():
                     projects_table.c.paper_size,
                     projects_table.c.description
                 )
+                if matches is not None:
+                    # Best text matches first
+                    sel = sel.group_by(matches.c.text_rank).order_by(matches.c.text_rank)
                 
                 search_results = conn.execute(sel)
                 results = [row._mapping for row in search_results]
 
                 # Apply intersection range filter if enabled (after aggregation)
-                if intersection_range_enabled and bottom_left and top_right and intersection_range_from and intersection_range_to:
+                if not intersection_in_sql and intersection_range_enabled and bottom_left and top_right and intersection_range_from and intersection_range_to:
                     try:
                         intersection_from = float(intersection_range_from)
                         intersection_to = float(intersection_range_to)
-                        required_area = calculate_area_size(xmin, ymin, xmax, ymax)
-                        filtered_results = []
-                        for res in results:
-                            res_dict = row_to_dict(res)
-                            # For intersection filtering, we need to check individual areas
-                            # This requires a separate query to get area details
-                            project_uuid = res_dict['uuid']
-                            area_query = select(areas_table).where(areas_table.c.project_id == project_uuid)
-                            project_areas = conn.execute(area_query).fetchall()
-                            
-                            # Check if any area meets the intersection criteria
-                            area_meets_criteria = False
-                            for area in project_areas:
-                                area_dict = row_to_dict(area)
-                                if all(area_dict.get(k) is not None for k in ['xmin', 'ymin', 'xmax', 'ymax']):
-                                    # Calculate intersection area
-                                    intersect_xmin = max(area_dict['xmin'], xmin)
-                                    intersect_ymin = max(area_dict['ymin'], ymin)
-                                    intersect_xmax = min(area_dict['xmax'], xmax)
-                                    intersect_ymax = min(area_dict['ymax'], ymax)
-                                    if intersect_xmin < intersect_xmax and intersect_ymin < intersect_ymax:
-                                        intersection_area = (intersect_xmax - intersect_xmin) * (intersect_ymax - intersect_ymin)
-                                        intersection_pct = (intersection_area / required_area) * 100 if required_area > 0 else 0
-                                        if intersection_from <= intersection_pct <= intersection_to:
-                                            area_meets_criteria = True
-                                            break
-                            
-                            if area_meets_criteria:
-                                filtered_results.append(res_dict)
-                        results = filtered_results
+                        # One bulk query plus a vectorized pass instead of one query per project
+                        matching_uuids = projects_in_intersection_range(
+                            conn, areas_table, [res['uuid'] for res in results],
+                            xmin, ymin, xmax, ymax, intersection_from, intersection_to
+                        )
+                        results = [row_to_dict(res) for res in results if res['uuid'] in matching_uuids]
                     except ValueError:
                         error = 'Intersection range values must be valid numbers.'
 
+                # Fraction of the search box covered by the union of the matching map frames
+                if error is None and bottom_left and top_right:
+                    coverage_filters = list(filters)
+                    if not intersection_in_sql and intersection_range_enabled:
+                        coverage_filters.append(areas_table.c.project_id.in_(
+                            bindparam(None, [res['uuid'] for res in results], expanding=True, literal_execute=True)
+                        ))
+                    frames = conn.execute(
+                        select(areas_table.c.xmin, areas_table.c.ymin, areas_table.c.xmax, areas_table.c.ymax)
+                        .select_from(projects_join_stmt).where(and_(*coverage_filters))
+                    ).fetchall()
+                    coverage = region_coverage(frames, xmin, ymin, xmax, ymax)
+
 
             # Add absolute file location for file explorer links
             processed_results = []
@@ -845,21 +909,24 @@ def index():
 
     projects_query_filters = []
     if projects_filters['uuid_filter']:
-        projects_query_filters.append(projects_table.c.uuid.ilike(f"{projects_filters['uuid_filter']}%"))
+        projects_query_filters.append(prefix_filter(projects_table.c.uuid, projects_filters['uuid_filter']))
     if projects_filters['project_name_filter']:
-        projects_query_filters.append(projects_table.c.project_name.ilike(f"{projects_filters['project_name_filter']}%"))
+        projects_query_filters.append(prefix_filter(projects_table.c.project_name, projects_filters['project_name_filter']))
     if projects_filters['user_name_filter']:
-        projects_query_filters.append(projects_table.c.user_name.ilike(f"{projects_filters['user_name_filter']}%"))
+        projects_query_filters.append(prefix_filter(projects_table.c.user_name, projects_filters['user_name_filter']))
     if projects_filters['date_filter']:
-        projects_query_filters.append(projects_table.c.date.ilike(f"{projects_filters['date_filter']}%"))
+        projects_query_filters.append(prefix_filter(projects_table.c.date, projects_filters['date_filter']))
     if projects_filters['file_location_filter']:
-        projects_query_filters.append(projects_table.c.file_location.ilike(f"{projects_filters['file_location_filter']}%"))
+        projects_query_filters.append(prefix_filter(projects_table.c.file_location, projects_filters['file_location_filter']))
     if projects_filters['paper_size_filter']:
-        projects_query_filters.append(projects_table.c.paper_size.ilike(f"{projects_filters['paper_size_filter']}%"))
+        projects_query_filters.append(prefix_filter(projects_table.c.paper_size, projects_filters['paper_size_filter']))
+    # Scale substring: projects with an area whose scale contains it (trigram index backed)
+    associated_scales_condition = None
     if projects_filters['associated_scales_filter']:
-        # This filter needs to apply to the aggregated 'associated_scales' string
-        # It's more complex as it's not a direct column. We'll handle this in the main query.
-        pass
+        associated_scales_condition = associated_scales_filter(
+            projects_table, areas_table, projects_filters['associated_scales_filter'], use_index=TRIGRAM_AVAILABLE)
+        if associated_scales_condition is not None:
+            projects_query_filters.append(associated_scales_condition)
 
     # For "All Areas" table
     areas_current_page = request.args.get('areas_page', 1, type=int)
@@ -883,7 +950,7 @@ def index():
         except ValueError:
             areas_query_filters.append(areas_table.c.id == -1)
     if areas_filters['project_id_filter']:
-        areas_query_filters.append(areas_table.c.project_id.ilike(f"%{areas_filters['project_id_filter']}%"))
+        areas_query_filters.append(substring_filter(areas_table, 'project_id', areas_filters['project_id_filter'], use_index=TRIGRAM_AVAILABLE))
     if areas_filters['xmin_filter']:
         try:
             xmin_val = float(areas_filters['xmin_filter'])
@@ -915,69 +982,89 @@ def index():
             areas_query_filters.append(areas_table.c.scale == str(scale_val))
         except ValueError:
             # If not a number, treat as string scale format
-            areas_query_filters.append(areas_table.c.scale.ilike(f"%{areas_filters['scale_filter']}%"))
+            areas_query_filters.append(substring_filter(areas_table, 'scale', areas_filters['scale_filter'], use_index=TRIGRAM_AVAILABLE))
 
 
     with engine.connect() as conn:
-        # For "All Projects" table: Join projects and areas, group by project, and aggregate scales
-        projects_join_stmt = projects_table.outerjoin(areas_table, projects_table.c.uuid == areas_table.c.project_id)
-
-        # Base query for projects with aggregated scales
-        projects_base_query = select(
-            projects_table.c.uuid,
-            projects_table.c.project_name,
-            projects_table.c.user_name,
-            projects_table.c.date,
-            projects_table.c.file_location,
-            projects_table.c.paper_size,
-            projects_table.c.description,  # <-- Added
-            func.coalesce(func.group_concat(distinct(areas_table.c.scale)), '').label('associated_scales')
-        ).select_from(projects_join_stmt).group_by(
-            projects_table.c.uuid,
-            projects_table.c.project_name,
-            projects_table.c.user_name,
-            projects_table.c.date,
-            projects_table.c.file_location,
-            projects_table.c.paper_size,
-            projects_table.c.description  # <-- Added
-        )
-
-        # Apply basic filters directly
-        for f in projects_query_filters:
-            projects_base_query = projects_base_query.where(f)
-
-        # If there's a filter for associated_scales, it needs to be applied after aggregation
-        # This requires subquerying or applying a HAVING clause, which SQLAlchemy's `label` helps with.
-        if projects_filters['associated_scales_filter']:
-            scale_filter_val = projects_filters['associated_scales_filter']
-            # Convert float to string for comparison with concatenated string
-            projects_base_query = projects_base_query.having(
-                func.coalesce(func.group_concat(distinct(areas_table.c.scale)), '').like(f"%{scale_filter_val}%")
+        if 'associated_scales' in projects_table.c:
+            # The scales are materialized in projects.associated_scales (kept current by triggers
+            # on areas), so the list is a plain read of projects in primary key order
+            projects_base_query = select(
+                projects_table.c.uuid,
+                projects_table.c.project_name,
+                projects_table.c.user_name,
+                projects_table.c.date,
+                projects_table.c.file_location,
+                projects_table.c.paper_size,
+                projects_table.c.description,
+                func.coalesce(projects_table.c.associated_scales, '').label('associated_scales')
+            ).where(*projects_query_filters).order_by(projects_table.c.uuid)
+            count_subquery = select(projects_table.c.uuid).where(*projects_query_filters)
+        else:
+            # Older databases without the column: join projects and areas, group by project, and aggregate scales
+            projects_join_stmt = projects_table.outerjoin(areas_table, projects_table.c.uuid == areas_table.c.project_id)
+
+            # Base query for projects with aggregated scales
+            projects_base_query = select(
+                projects_table.c.uuid,
+                projects_table.c.project_name,
+                projects_table.c.user_name,
+                projects_table.c.date,
+                projects_table.c.file_location,
+                projects_table.c.paper_size,
+                projects_table.c.description,  # <-- Added
+                func.coalesce(func.group_concat(distinct(areas_table.c.scale)), '').label('associated_scales')
+            ).select_from(projects_join_stmt).group_by(
+                projects_table.c.uuid,
+                projects_table.c.project_name,
+                projects_table.c.user_name,
+                projects_table.c.date,
+                projects_table.c.file_location,
+                projects_table.c.paper_size,
+                projects_table.c.description  # <-- Added
             )
 
+            # Apply basic filters directly
+            for f in projects_query_filters:
+                projects_base_query = projects_base_query.where(f)
+
+            # A scale filter spanning two scales ("5000,1:") is matched against the aggregated string
+            if projects_filters['associated_scales_filter'] and associated_scales_condition is None:
+                scale_filter_val = projects_filters['associated_scales_filter']
+                # Convert float to string for comparison with concatenated string
+                projects_base_query = projects_base_query.having(
+                    func.coalesce(func.group_concat(distinct(areas_table.c.scale)), '').like(f"%{scale_filter_val}%")
+                )
+
 
-        # Get total count for projects pagination
-        # This needs to be done carefully when using group_by.
-        # A subquery is usually the safest way to count distinct projects after filtering and grouping.
-        count_subquery = select(projects_table.c.uuid).select_from(projects_join_stmt)
-        for f in projects_query_filters:
-            count_subquery = count_subquery.where(f)
-        count_subquery = count_subquery.group_by(
-            projects_table.c.uuid,
-            projects_table.c.project_name,
-            projects_table.c.user_name,
-            projects_table.c.date,
-            projects_table.c.file_location,
-            projects_table.c.paper_size,
-            projects_table.c.description  # <-- Added
-        )
-        if projects_filters['associated_scales_filter']:
-             scale_filter_val = projects_filters['associated_scales_filter']
-             count_subquery = count_subquery.having(
-                 func.coalesce(func.group_concat(distinct(areas_table.c.scale)), '').like(f"%{scale_filter_val}%")
-             )
-
-        projects_total_items = conn.execute(select(func.count()).select_from(count_subquery.subquery())).scalar_one()
+            # Get total count for projects pagination
+            # This needs to be done carefully when using group_by.
+            # A subquery is usually the safest way to count distinct projects after filtering and grouping.
+            count_subquery = select(projects_table.c.uuid).select_from(projects_join_stmt)
+            for f in projects_query_filters:
+                count_subquery = count_subquery.where(f)
+            count_subquery = count_subquery.group_by(
+                projects_table.c.uuid,
+                projects_table.c.project_name,
+                projects_table.c.user_name,
+                projects_table.c.date,
+                projects_table.c.file_location,
+                projects_table.c.paper_size,
+                projects_table.c.description  # <-- Added
+            )
+            if projects_filters['associated_scales_filter'] and associated_scales_condition is None:
+                 scale_filter_val = projects_filters['associated_scales_filter']
+                 count_subquery = count_subquery.having(
+                     func.coalesce(func.group_concat(distinct(areas_table.c.scale)), '').like(f"%{scale_filter_val}%")
+                 )
+
+        # Unfiltered and single user / paper size filtered totals come from the row counters
+        active_projects_filters = {name[:-len('_filter')]: value for name, value in projects_filters.items() if value}
+        facet, facet_prefix = counter_facet(active_projects_filters)
+        scale_having = projects_filters['associated_scales_filter'] and associated_scales_condition is None
+        projects_total_items, _ = listing_total(
+            conn, projects_table, None if scale_having else projects_query_filters,
+            select(func.count()).select_from(count_subquery.subquery()), facet=facet, prefix=facet_prefix)
 
         projects_total_pages = (projects_total_items + projects_per_page - 1) // projects_per_page
         if projects_current_page > projects_total_pages and projects_total_pages > 0:
@@ -1049,7 +1136,7 @@ def index():
         areas_count_stmt = select(func.count()).select_from(areas_table)
         if areas_query_filters:
             areas_count_stmt = areas_count_stmt.where(and_(*areas_query_filters))
-        areas_total_items = conn.execute(areas_count_stmt).scalar_one()
+        areas_total_items, _ = listing_total(conn, areas_table, areas_query_filters, areas_count_stmt)
 
         areas_total_pages = (areas_total_items + areas_per_page - 1) // areas_per_page
         if areas_current_page > areas_total_pages and areas_total_pages > 0:
@@ -1120,6 +1207,7 @@ def index():
         'index.html',
         results=results,
         error=error,
+        coverage=coverage,
         projects=projects,
         areas=areas,
         user_names=user_names,
@@ -1185,8 +1273,11 @@ def delete_project(uuid):
                 print(f"[DEBUG] Folder does not exist or is not a directory: {folder}")
         proj_result = conn.execute(projects_table.delete().where(projects_table.c.uuid == uuid))
         print(f"[DEBUG] Projects deleted: {proj_result.rowcount}")
+        deleted_area_ids = [row[0] for row in conn.execute(select(areas_table.c.id).where(areas_table.c.project_id == uuid))]
         area_result = conn.execute(areas_table.delete().where(areas_table.c.project_id == uuid))
         print(f"[DEBUG] Areas deleted: {area_result.rowcount}")
+    # Keep this worker's in-memory spatial index current
+    area_index.remove_areas(deleted_area_ids)
     print(f"[DEBUG] Deletion complete for UUID: {uuid}")
     return redirect(url_for('index'))
 
@@ -1,17 +1,55 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, Response
 from sqlalchemy import select, func, and_
-from models.database import engine, areas_table, projects_table
+from models.database import engine, areas_table, projects_table, area_index
+from models import database
 from utils.file_utils import get_project_files
+from utils.helpers import parse_point
+from spatial_queries import (
+    areas_at_point, nearest_areas, MAX_NEAREST_K,
+    footprint_area_column, parse_footprint_size_range, footprint_size_filters
+)
+from coverage import parse_heatmap_args, coverage_grid, grid_to_json, grid_to_png
+from packed_index import NUMPY_AVAILABLE
+from duplicates import parse_duplicates_args, list_duplicate_candidates
+from text_search import substring_filter
+from pagination import decode_cursor, fetch_keyset_page, keyset_order
+from counters import listing_total
 import os
 
 areas_bp = Blueprint('areas', __name__)
 
+AREA_SORT_ORDERS = ('area_m2', '-area_m2')
+
+def area_cursor_keys(sort):
+    """Sort key of the area listing in cursor mode (label, column, descending); the id breaks ties"""
+    keys = [('id', areas_table.c.id, False)]
+    if sort in AREA_SORT_ORDERS:
+        keys.insert(0, ('area_m2', footprint_area_column(areas_table), sort == '-area_m2'))
+    return keys
+
 @areas_bp.route('/areas', methods=['GET'])
 def get_all_areas():
     """Get all areas with pagination and filtering"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
+        # Optional ordering by footprint size: area_m2 (smallest first) or -area_m2
+        sort = request.args.get('sort', '', type=str).strip()
+        if sort and sort not in AREA_SORT_ORDERS:
+            return jsonify({'error': f"Invalid sort. Use one of: {', '.join(AREA_SORT_ORDERS)}."}), 400
+        # estimate=true: estimate filtered totals from a sample instead of counting every match
+        estimate = request.args.get('estimate', '', type=str).lower() == 'true'
+
+        # Cursor mode (?after=<token>, empty for the first page) instead of page numbers
+        cursor_mode = 'after' in request.args
+        cursor_keys = area_cursor_keys(sort)
+        after_values = None
+        if cursor_mode:
+            if per_page < 1:
+                return jsonify({'error': "'per_page' must be at least 1"}), 400
+            after_values, cursor_error = decode_cursor(request.args.get('after'), sort or 'id', len(cursor_keys))
+            if cursor_error is not None:
+                return jsonify({'error': cursor_error}), 400
         
         # Filters
         filters = {}
@@ -31,7 +69,7 @@ def get_all_areas():
             except ValueError:
                 query_filters.append(areas_table.c.id == -1)
         if filters['project_id_filter']:
-            query_filters.append(areas_table.c.project_id.ilike(f"%{filters['project_id_filter']}%"))
+            query_filters.append(substring_filter(areas_table, 'project_id', filters['project_id_filter'], use_index=database.TRIGRAM_AVAILABLE))
         if filters['xmin_filter']:
             try:
                 xmin_val = float(filters['xmin_filter'])
@@ -63,22 +101,17 @@ def get_all_areas():
                 query_filters.append(areas_table.c.scale == str(scale_val))
             except ValueError:
                 # If not a number, treat as string scale format
-                query_filters.append(areas_table.c.scale.ilike(f"%{filters['scale_filter']}%"))
-
-        with engine.connect() as conn:
-            # Get total count for areas pagination
-            count_stmt = select(func.count()).select_from(areas_table)
-            if query_filters:
-                count_stmt = count_stmt.where(and_(*query_filters))
-            total_items = conn.execute(count_stmt).scalar_one()
+                query_filters.append(substring_filter(areas_table, 'scale', filters['scale_filter'], use_index=database.TRIGRAM_AVAILABLE))
 
-            total_pages = (total_items + per_page - 1) // per_page
-            if page > total_pages and total_pages > 0:
-                page = total_pages
-            elif total_pages == 0:
-                page = 1
+        # Footprint size range in km² (uses the indexed area_m2 column)
+        min_area_m2, max_area_m2, size_range_error = parse_footprint_size_range(
+            request.args.get('min_area_km2'), request.args.get('max_area_km2'))
+        if size_range_error is not None:
+            return jsonify({'error': size_range_error}), 400
+        query_filters.extend(footprint_size_filters(areas_table, min_area_m2, max_area_m2))
 
-            # Query areas for the current page with filters, joined with projects to get file location
+        with engine.connect() as conn:
+            # Query areas with filters, joined with projects to get file location
             stmt = select(
                 areas_table.c.id, 
                 areas_table.c.project_id, 
@@ -87,20 +120,47 @@ def get_all_areas():
                 areas_table.c.xmax, 
                 areas_table.c.ymax, 
                 areas_table.c.scale, 
+                footprint_area_column(areas_table).label('area_m2'),
                 projects_table.c.file_location.label('project_file_location')
             )
             stmt = stmt.select_from(areas_table.join(projects_table, areas_table.c.project_id == projects_table.c.uuid))
             
             if query_filters:
                 stmt = stmt.where(and_(*query_filters))
-            
-            stmt = stmt.limit(per_page).offset((page - 1) * per_page)
-            areas = conn.execute(stmt).fetchall()
+
+            if cursor_mode:
+                # Keyset pagination on (area_m2,) id, no COUNT
+                areas, next_after = fetch_keyset_page(conn, stmt, cursor_keys, sort or 'id', after_values, per_page)
+                pagination = {'per_page': per_page, 'next_after': next_after}
+            else:
+                # Get total count for areas pagination
+                count_stmt = select(func.count()).select_from(areas_table)
+                if query_filters:
+                    count_stmt = count_stmt.where(and_(*query_filters))
+                total_items, total_is_estimate = listing_total(
+                    conn, areas_table, query_filters, count_stmt, estimate=estimate)
+
+                total_pages = (total_items + per_page - 1) // per_page
+                if page > total_pages and total_pages > 0:
+                    page = total_pages
+                elif total_pages == 0:
+                    page = 1
+
+                stmt = stmt.order_by(*keyset_order(cursor_keys))
+                stmt = stmt.limit(per_page).offset((page - 1) * per_page)
+                areas = conn.execute(stmt).fetchall()
+                pagination = {
+                    'current_page': page,
+                    'per_page': per_page,
+                    'total_pages': total_pages,
+                    'total_items': total_items,
+                    'total_is_estimate': total_is_estimate
+                }
 
             # Add file information for areas (show files of associated project)
             areas_list = []
             for area in areas:
-                area_dict = dict(area)
+                area_dict = dict(area._mapping)
                 project_file_location = area_dict['project_file_location']
                 
                 # Add file information
@@ -123,14 +183,89 @@ def get_all_areas():
 
             return jsonify({
                 'areas': areas_list,
-                'pagination': {
-                    'current_page': page,
-                    'per_page': per_page,
-                    'total_pages': total_pages,
-                    'total_items': total_items
-                },
+                'pagination': pagination,
                 'filters': filters
             })
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+@areas_bp.route('/areas/at_point', methods=['GET'])
+def get_areas_at_point():
+    """Get the map frames whose rectangle contains a coordinate, ordered by scale"""
+    point = request.args.get('point', '').strip()
+    if not point:
+        return jsonify({'error': "Missing 'point' parameter"}), 400
+    
+    coords, parse_error = parse_point(point)
+    if parse_error is not None or not coords:
+        return jsonify({'error': parse_error or 'Invalid coordinate format'}), 400
+    
+    try:
+        x, y = coords
+        with engine.connect() as conn:
+            areas = areas_at_point(conn, projects_table, areas_table, x, y, use_index=database.RTREE_AVAILABLE, area_index=area_index)
+        return jsonify({'point': {'x': x, 'y': y}, 'count': len(areas), 'areas': areas})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@areas_bp.route('/areas/nearest', methods=['GET'])
+def get_nearest_areas():
+    """Get the k map frames closest to a coordinate, optionally filtered by scale and user"""
+    point = request.args.get('point', '').strip()
+    if not point:
+        return jsonify({'error': "Missing 'point' parameter"}), 400
+    
+    coords, parse_error = parse_point(point)
+    if parse_error is not None or not coords:
+        return jsonify({'error': parse_error or 'Invalid coordinate format'}), 400
+    
+    k = request.args.get('k', 10, type=int)
+    if k is None or k < 1 or k > MAX_NEAREST_K:
+        return jsonify({'error': f"'k' must be an integer between 1 and {MAX_NEAREST_K}"}), 400
+    scale = request.args.get('scale', '').strip()
+    user = request.args.get('user', '').strip()
+    
+    try:
+        x, y = coords
+        with engine.connect() as conn:
+            areas = nearest_areas(conn, projects_table, areas_table, x, y, k, scale=scale, user=user,
+                                  use_index=database.RTREE_AVAILABLE, area_index=area_index)
+        return jsonify({'point': {'x': x, 'y': y}, 'k': k, 'count': len(areas), 'areas': areas})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@areas_bp.route('/duplicates', methods=['GET'])
+def get_duplicates():
+    """Get near-duplicate map frame pairs found by duplicates.py, highest IoU first"""
+    if not database.DUPLICATES_AVAILABLE:
+        return jsonify({'error': 'The duplicate_candidates table does not exist. Set up the database with: python db_schema.py'}), 500
+    options, error = parse_duplicates_args(request.args)
+    if error is not None:
+        return jsonify({'error': error}), 400
+    
+    try:
+        with engine.connect() as conn:
+            pairs = list_duplicate_candidates(conn, projects_table, **options)
+        return jsonify({'count': len(pairs), 'pairs': pairs})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@areas_bp.route('/coverage/heatmap', methods=['GET'])
+def get_coverage_heatmap():
+    """Get the map coverage density grid over a UTM 36N extent as JSON or PNG"""
+    if not NUMPY_AVAILABLE:
+        return jsonify({'error': 'Coverage heatmaps require numpy. Install with: pip install numpy'}), 500
+
+    options, error = parse_heatmap_args(request.args)
+    if error is not None:
+        return jsonify({'error': error}), 400
+
+    try:
+        with engine.connect() as conn:
+            grid = coverage_grid(conn, projects_table, areas_table, options, use_index=database.RTREE_AVAILABLE)
+        if options['format'] == 'png':
+            return Response(grid_to_png(grid), mimetype='image/png')
+        return jsonify(grid_to_json(grid, options))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
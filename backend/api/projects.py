@@ -1,7 +1,27 @@
 from flask import Blueprint, jsonify, request
 from sqlalchemy import select, distinct, func, and_, or_
-from models.database import engine, projects_table, areas_table
-from utils.helpers import parse_point, calculate_area_size, convert_date_to_db_format
+from models.database import engine, projects_table, areas_table, area_index
+from models import database
+from spatial_index import bbox_predicate_filter, normalize_predicate, PREDICATE_INSIDE, SPATIAL_PREDICATES
+from intersection_filter import intersection_percentage_condition
+from batch_search import parse_batch_request, search_boxes
+from db_migrations import derived_area_values, derived_project_values
+from date_utils import parse_date_range, date_range_filters
+from pagination import decode_cursor, fetch_keyset_page
+from counters import listing_total, counter_facet
+from text_search import prefix_filter, parse_text_query, text_matches, text_scan_filter, associated_scales_filter
+from coverage import region_coverage
+from spatial_queries import parse_footprint_size_range, footprint_size_filters
+from scale_utils import (
+    parse_scale_band, scale_band_condition,
+    scale_filter, parse_scale_range, scale_range_filters
+)
+
+try:
+    from config import INTERSECTION_FILTER_IN_SQL
+except ImportError:
+    INTERSECTION_FILTER_IN_SQL = True
+from utils.helpers import parse_point, calculate_area_size
 from utils.file_utils import get_project_files
 import os
 import uuid
@@ -25,12 +45,27 @@ def generate_unique_uuid():
 
 projects_bp = Blueprint('projects', __name__)
 
+# Sort key of the project listing in cursor mode (label, column, descending)
+PROJECT_CURSOR_KEYS = [('uuid', projects_table.c.uuid, False)]
+
 @projects_bp.route('/projects', methods=['GET'])
 def get_all_projects():
     """Get all projects with pagination and filtering"""
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
+        # estimate=true: estimate filtered totals from a sample instead of counting every match
+        estimate = request.args.get('estimate', '', type=str).lower() == 'true'
+
+        # Cursor mode (?after=<token>, empty for the first page) instead of page numbers
+        cursor_mode = 'after' in request.args
+        after_values = None
+        if cursor_mode:
+            if per_page < 1:
+                return jsonify({'error': "'per_page' must be at least 1"}), 400
+            after_values, cursor_error = decode_cursor(request.args.get('after'), 'uuid', len(PROJECT_CURSOR_KEYS))
+            if cursor_error is not None:
+                return jsonify({'error': cursor_error}), 400
         
         # Filters
         filters = {}
@@ -46,88 +81,130 @@ def get_all_projects():
         
         query_filters = []
         if filters['uuid_filter']:
-            query_filters.append(projects_table.c.uuid.ilike(f"{filters['uuid_filter']}%"))
+            query_filters.append(prefix_filter(projects_table.c.uuid, filters['uuid_filter']))
         if filters['project_name_filter']:
-            query_filters.append(projects_table.c.project_name.ilike(f"{filters['project_name_filter']}%"))
+            query_filters.append(prefix_filter(projects_table.c.project_name, filters['project_name_filter']))
         if filters['user_name_filter']:
-            query_filters.append(projects_table.c.user_name.ilike(f"{filters['user_name_filter']}%"))
+            query_filters.append(prefix_filter(projects_table.c.user_name, filters['user_name_filter']))
         if filters['date_filter']:
-            query_filters.append(projects_table.c.date.ilike(f"{filters['date_filter']}%"))
+            query_filters.append(prefix_filter(projects_table.c.date, filters['date_filter']))
         if filters['file_location_filter']:
-            query_filters.append(projects_table.c.file_location.ilike(f"{filters['file_location_filter']}%"))
+            query_filters.append(prefix_filter(projects_table.c.file_location, filters['file_location_filter']))
         if filters['paper_size_filter']:
-            query_filters.append(projects_table.c.paper_size.ilike(f"{filters['paper_size_filter']}%"))
+            query_filters.append(prefix_filter(projects_table.c.paper_size, filters['paper_size_filter']))
+        # Scale substring: projects with an area whose scale contains it (trigram index backed)
+        associated_scales_condition = None
+        if filters['associated_scales_filter']:
+            associated_scales_condition = associated_scales_filter(
+                projects_table, areas_table, filters['associated_scales_filter'], use_index=database.TRIGRAM_AVAILABLE)
+            if associated_scales_condition is not None:
+                query_filters.append(associated_scales_condition)
 
         with engine.connect() as conn:
-            # Join projects and areas, group by project, and aggregate scales
-            join_stmt = projects_table.outerjoin(areas_table, projects_table.c.uuid == areas_table.c.project_id)
-
-            # Base query for projects with aggregated scales
-            base_query = select(
-                projects_table.c.uuid,
-                projects_table.c.project_name,
-                projects_table.c.user_name,
-                projects_table.c.date,
-                projects_table.c.file_location,
-                projects_table.c.paper_size,
-                projects_table.c.description,
-                func.group_concat(distinct(areas_table.c.scale)).label('associated_scales')
-            ).select_from(join_stmt).group_by(
-                projects_table.c.uuid,
-                projects_table.c.project_name,
-                projects_table.c.user_name,
-                projects_table.c.date,
-                projects_table.c.file_location,
-                projects_table.c.paper_size,
-                projects_table.c.description
-            )
-
-            # Apply basic filters
-            for f in query_filters:
-                base_query = base_query.where(f)
-
-            # Handle associated scales filter
-            if filters['associated_scales_filter']:
-                scale_filter_val = filters['associated_scales_filter']
-                base_query = base_query.having(
-                    func.group_concat(distinct(areas_table.c.scale)).like(f"%{scale_filter_val}%")
-                )
+            if 'associated_scales' in projects_table.c:
+                # The scales are materialized in projects.associated_scales (kept current by triggers
+                # on areas), so the list is a plain read of projects
+                base_query = select(
+                    projects_table.c.uuid,
+                    projects_table.c.project_name,
+                    projects_table.c.user_name,
+                    projects_table.c.date,
+                    projects_table.c.file_location,
+                    projects_table.c.paper_size,
+                    projects_table.c.description,
+                    projects_table.c.associated_scales
+                ).where(*query_filters)
+                count_subquery = select(projects_table.c.uuid).where(*query_filters)
+            else:
+                # Older databases without the column: join projects and areas, group by project, and aggregate scales
+                join_stmt = projects_table.outerjoin(areas_table, projects_table.c.uuid == areas_table.c.project_id)
 
-            # Get total count for pagination
-            count_subquery = select(projects_table.c.uuid).select_from(join_stmt)
-            for f in query_filters:
-                count_subquery = count_subquery.where(f)
-            count_subquery = count_subquery.group_by(
-                projects_table.c.uuid,
-                projects_table.c.project_name,
-                projects_table.c.user_name,
-                projects_table.c.date,
-                projects_table.c.file_location,
-                projects_table.c.paper_size,
-                projects_table.c.description
-            )
-            if filters['associated_scales_filter']:
-                scale_filter_val = filters['associated_scales_filter']
-                count_subquery = count_subquery.having(
-                    func.group_concat(distinct(areas_table.c.scale)).like(f"%{scale_filter_val}%")
+                # Base query for projects with aggregated scales
+                base_query = select(
+                    projects_table.c.uuid,
+                    projects_table.c.project_name,
+                    projects_table.c.user_name,
+                    projects_table.c.date,
+                    projects_table.c.file_location,
+                    projects_table.c.paper_size,
+                    projects_table.c.description,
+                    func.group_concat(distinct(areas_table.c.scale)).label('associated_scales')
+                ).select_from(join_stmt).group_by(
+                    projects_table.c.uuid,
+                    projects_table.c.project_name,
+                    projects_table.c.user_name,
+                    projects_table.c.date,
+                    projects_table.c.file_location,
+                    projects_table.c.paper_size,
+                    projects_table.c.description
                 )
 
-            total_items = conn.execute(select(func.count()).select_from(count_subquery.subquery())).scalar_one()
-            total_pages = (total_items + per_page - 1) // per_page
-
-            if page > total_pages and total_pages > 0:
-                page = total_pages
-            elif total_pages == 0:
-                page = 1
-
-            # Query projects for the current page
-            stmt = base_query.limit(per_page).offset((page - 1) * per_page)
-            projects = conn.execute(stmt).fetchall()
+                # Apply basic filters
+                for f in query_filters:
+                    base_query = base_query.where(f)
+
+                # A scale filter spanning two scales ("5000,1:") is matched against the aggregated string
+                if filters['associated_scales_filter'] and associated_scales_condition is None:
+                    scale_filter_val = filters['associated_scales_filter']
+                    base_query = base_query.having(
+                        func.group_concat(distinct(areas_table.c.scale)).like(f"%{scale_filter_val}%")
+                    )
+
+                # Get total count for pagination
+                count_subquery = select(projects_table.c.uuid).select_from(join_stmt)
+                for f in query_filters:
+                    count_subquery = count_subquery.where(f)
+                count_subquery = count_subquery.group_by(
+                    projects_table.c.uuid,
+                    projects_table.c.project_name,
+                    projects_table.c.user_name,
+                    projects_table.c.date,
+                    projects_table.c.file_location,
+                    projects_table.c.paper_size,
+                    projects_table.c.description
+                )
+                if filters['associated_scales_filter'] and associated_scales_condition is None:
+                    scale_filter_val = filters['associated_scales_filter']
+                    count_subquery = count_subquery.having(
+                        func.group_concat(distinct(areas_table.c.scale)).like(f"%{scale_filter_val}%")
+                    )
+
+            if cursor_mode:
+                # Keyset pagination on the primary key, no COUNT
+                projects, next_after = fetch_keyset_page(
+                    conn, base_query, PROJECT_CURSOR_KEYS, 'uuid', after_values, per_page)
+                pagination = {'per_page': per_page, 'next_after': next_after}
+            else:
+                # Unfiltered and single user / paper size filtered totals come from the row counters
+                active_filters = {name[:-len('_filter')]: value for name, value in filters.items() if value}
+                facet, facet_prefix = counter_facet(active_filters)
+                scale_having = filters['associated_scales_filter'] and associated_scales_condition is None
+                total_items, total_is_estimate = listing_total(
+                    conn, projects_table, None if scale_having else query_filters,
+                    select(func.count()).select_from(count_subquery.subquery()),
+                    facet=facet, prefix=facet_prefix, estimate=estimate)
+                total_pages = (total_items + per_page - 1) // per_page
+
+                if page > total_pages and total_pages > 0:
+                    page = total_pages
+                elif total_pages == 0:
+                    page = 1
+
+                # Query projects for the current page
+                stmt = base_query.order_by(projects_table.c.uuid).limit(per_page).offset((page - 1) * per_page)
+                projects = conn.execute(stmt).fetchall()
+                pagination = {
+                    'current_page': page,
+                    'per_page': per_page,
+                    'total_pages': total_pages,
+                    'total_items': total_items,
+                    'total_is_estimate': total_is_estimate
+                }
 
             # Process projects and add file information
             projects_list = []
             for proj in projects:
-                proj_dict = dict(proj)
+                proj_dict = dict(proj._mapping)
                 
                 # Add file information
                 file_info = get_project_files(proj_dict['file_location'])
@@ -149,12 +226,7 @@ def get_all_projects():
 
             return jsonify({
                 'projects': projects_list,
-                'pagination': {
-                    'current_page': page,
-                    'per_page': per_page,
-                    'total_pages': total_pages,
-                    'total_items': total_items
-                },
+                'pagination': pagination,
                 'filters': filters
             })
 
@@ -174,6 +246,16 @@ def search_projects():
         bottom_left = data.get('bottom_left', '').strip()
         top_right = data.get('top_right', '').strip()
         
+        # Spatial predicate: inside (default), intersects or contains
+        predicate = normalize_predicate(data.get('predicate', ''))
+        if predicate is None:
+            return jsonify({'error': f"Invalid spatial predicate. Use one of: {', '.join(SPATIAL_PREDICATES)}."}), 400
+
+        # Scale band: restricts the search to one partition of the spatial index
+        scale_band, scale_band_error = parse_scale_band(data.get('scale_band', ''))
+        if scale_band_error is not None:
+            return jsonify({'error': scale_band_error}), 400
+        
         if bottom_left and top_right:
             bl_result = parse_point(bottom_left)
             tr_result = parse_point(top_right)
@@ -188,27 +270,35 @@ def search_projects():
             else:
                 xmin, ymin = bl_result[0]
                 xmax, ymax = tr_result[0]
-                if xmin >= xmax or ymin >= ymax:
+                # Intersects/contains searches may use the same point twice ("which maps cover this point")
+                if (xmin > xmax or ymin > ymax) or (predicate == PREDICATE_INSIDE and (xmin == xmax or ymin == ymax)):
                     return jsonify({'error': 'Bottom Left must be southwest (smaller X and Y) of Top Right. Please check your input.'}), 400
                 
                 join_areas = True
-                # Default INSIDE spatial filter
-                inside_filters = [
-                    areas_table.c.xmin >= xmin,
-                    areas_table.c.xmax <= xmax,
-                    areas_table.c.ymin >= ymin,
-                    areas_table.c.ymax <= ymax
-                ]
-                filters.append(and_(*inside_filters))
+                # Spatial filter for the selected predicate (index backed when available)
+                filters.append(bbox_predicate_filter(areas_table, predicate, xmin, ymin, xmax, ymax, use_index=database.RTREE_AVAILABLE, area_index=area_index, band=scale_band))
+
+        if scale_band is not None and not join_areas:
+            join_areas = True
+            filters.append(scale_band_condition(areas_table, scale_band))
 
         # Parse other filters
         uuid = data.get('uuid', '').strip()
         if uuid:
-            filters.append(projects_table.c.uuid.ilike(f"{uuid}%"))
+            filters.append(prefix_filter(projects_table.c.uuid, uuid))
+
+        # Free-text search of the name, description and user (ranked when the full-text index exists)
+        matches = None
+        text_terms = parse_text_query(data.get('text_query', ''))
+        if text_terms:
+            if database.FTS_AVAILABLE:
+                matches = text_matches(text_terms)
+            else:
+                filters.append(text_scan_filter(projects_table, text_terms))
 
         user_names = data.get('user_names', [])
         if user_names:
-            filters.append(or_(*[projects_table.c.user_name.ilike(f"{n}%") for n in user_names]))
+            filters.append(or_(*[prefix_filter(projects_table.c.user_name, n) for n in user_names]))
 
         paper_size = data.get('paper_size', '').strip()
         custom_height = data.get('custom_height', '').strip()
@@ -220,43 +310,45 @@ def search_projects():
                     height_cm = float(custom_height)
                     width_cm = float(custom_width)
                     custom_size_format = f"Custom Size: Height: {height_cm} cm, Width: {width_cm} cm"
-                    filters.append(projects_table.c.paper_size.ilike(f"{custom_size_format}%"))
+                    filters.append(prefix_filter(projects_table.c.paper_size, custom_size_format))
                 except ValueError:
                     return jsonify({'error': 'Custom height and width must be valid numbers.'}), 400
             elif paper_size != 'custom':
-                filters.append(projects_table.c.paper_size.ilike(f"{paper_size}%"))
+                filters.append(prefix_filter(projects_table.c.paper_size, paper_size))
             elif paper_size == 'custom' and (not custom_height or not custom_width):
                 return jsonify({'error': 'Please enter both height and width for custom size.'}), 400
 
         scale = data.get('scale', '').strip()
         if scale:
-            try:
-                # Try to parse as float for backward compatibility
-                scale_val = float(scale)
-                join_areas = True
-                filters.append(areas_table.c.scale == str(scale_val))
-            except ValueError:
-                # If not a number, treat as string scale format
-                join_areas = True
-                filters.append(areas_table.c.scale.ilike(f"%{scale}%"))
+            # "1:5000" matches the denominator exactly, legacy values match the text
+            join_areas = True
+            filters.append(scale_filter(areas_table, scale))
+
+        # Scale denominator range (uses the indexed scale_denominator column)
+        scale_min, scale_max, scale_range_error = parse_scale_range(data.get('scale_min'), data.get('scale_max'))
+        if scale_range_error is not None:
+            return jsonify({'error': scale_range_error}), 400
+        if scale_min is not None or scale_max is not None:
+            join_areas = True
+            filters.extend(scale_range_filters(areas_table, scale_min, scale_max))
+
+        # Footprint size range in km² (uses the indexed area_m2 column)
+        min_area_m2, max_area_m2, size_range_error = parse_footprint_size_range(data.get('min_area_km2'), data.get('max_area_km2'))
+        if size_range_error is not None:
+            return jsonify({'error': size_range_error}), 400
+        if min_area_m2 is not None or max_area_m2 is not None:
+            join_areas = True
+            filters.extend(footprint_size_filters(areas_table, min_area_m2, max_area_m2))
 
         # Parse date range
         date_from = data.get('date_from', '').strip()
         date_to = data.get('date_to', '').strip()
 
-        if date_from:
-            converted_from = convert_date_to_db_format(date_from)
-            if converted_from:
-                filters.append(projects_table.c.date >= converted_from)
-            else:
-                return jsonify({'error': 'Invalid date format for "From Date". Use DD/MM/YYYY format.'}), 400
-
-        if date_to:
-            converted_to = convert_date_to_db_format(date_to)
-            if converted_to:
-                filters.append(projects_table.c.date <= converted_to)
-            else:
-                return jsonify({'error': 'Invalid date format for "To Date". Use DD/MM/YYYY format.'}), 400
+        # DD/MM/YYYY to ISO-8601, compared with the indexed date_iso column
+        iso_from, iso_to, date_error = parse_date_range(date_from, date_to)
+        if date_error is not None:
+            return jsonify({'error': date_error}), 400
+        filters.extend(date_range_filters(projects_table, iso_from, iso_to))
 
         # Parse intersection range filter
         intersection_range_enabled = data.get('relative_size', False)
@@ -272,15 +364,31 @@ def search_projects():
             except ValueError:
                 return jsonify({'error': 'Intersection range values must be valid numbers.'}), 400
 
+        # Run the intersection range filter inside SQLite so non-matching rows never leave the database
+        intersection_in_sql = False
+        if INTERSECTION_FILTER_IN_SQL and intersection_range_enabled and bottom_left and top_right:
+            filters.append(intersection_percentage_condition(
+                areas_table, xmin, ymin, xmax, ymax,
+                float(intersection_range_from), float(intersection_range_to)
+            ))
+            intersection_in_sql = True
+
         with engine.connect() as conn:
             # Join areas to retrieve scales
             join_stmt = projects_table.join(areas_table, projects_table.c.uuid == areas_table.c.project_id, isouter=True)
 
-            if filters:
-                results = conn.execute(select(*projects_table.c, *areas_table.c).select_from(join_stmt).where(and_(*filters))).fetchall()
+            if matches is not None:
+                join_stmt = join_stmt.join(matches, matches.c.uuid == projects_table.c.uuid)
+
+            if filters or matches is not None:
+                sel = select(*projects_table.c, *areas_table.c).select_from(join_stmt).where(*filters)
+                if matches is not None:
+                    # Best text matches first
+                    sel = sel.order_by(matches.c.text_rank, projects_table.c.uuid)
+                results = conn.execute(sel).fetchall()
 
                 # Apply intersection range filter if enabled
-                if intersection_range_enabled and bottom_left and top_right and intersection_range_from and intersection_range_to:
+                if not intersection_in_sql and intersection_range_enabled and bottom_left and top_right and intersection_range_from and intersection_range_to:
                     try:
                         intersection_from = float(intersection_range_from)
                         intersection_to = float(intersection_range_to)
@@ -288,7 +396,7 @@ def search_projects():
                         filtered_results = []
                         
                         for res in results:
-                            res_dict = dict(res)
+                            res_dict = dict(res._mapping)
                             if all(res_dict.get(k) is not None for k in ['xmin', 'ymin', 'xmax', 'ymax']):
                                 # Calculate intersection area
                                 intersect_xmin = max(res_dict['xmin'], xmin)
@@ -307,6 +415,20 @@ def search_projects():
                         results = filtered_results
                     except ValueError:
                         return jsonify({'error': 'Intersection range values must be valid numbers.'}), 400
+            elif 'associated_scales' in projects_table.c:
+                # Get all projects with their materialized scales
+                sel = select(
+                    projects_table.c.uuid,
+                    projects_table.c.project_name,
+                    projects_table.c.user_name,
+                    projects_table.c.date,
+                    projects_table.c.file_location,
+                    projects_table.c.paper_size,
+                    projects_table.c.description,
+                    projects_table.c.associated_scales
+                ).order_by(projects_table.c.uuid)
+
+                results = [row for row in conn.execute(sel)]
             else:
                 # Get all projects with aggregated scales
                 sel = select(
@@ -330,10 +452,20 @@ def search_projects():
                 
                 results = [row for row in conn.execute(sel)]
 
+            # Fraction of the search box covered by the union of the matching map frames
+            coverage = None
+            if bottom_left and top_right:
+                frames = []
+                for res in results or []:
+                    res = dict(res._mapping) if hasattr(res, '_mapping') else res
+                    if all(res.get(k) is not None for k in ['xmin', 'ymin', 'xmax', 'ymax']):
+                        frames.append((res['xmin'], res['ymin'], res['xmax'], res['ymax']))
+                coverage = region_coverage(frames, xmin, ymin, xmax, ymax)
+
             # Process results and add file information
             processed_results = []
             for row in results or []:
-                proj = dict(row)
+                proj = dict(row._mapping) if hasattr(row, '_mapping') else dict(row)
                 
                 # Add file information
                 file_info = get_project_files(proj['file_location'])
@@ -353,11 +485,35 @@ def search_projects():
 
                 processed_results.append(proj)
 
-            return jsonify({'results': processed_results})
+            return jsonify({'results': processed_results, 'coverage': coverage})
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@projects_bp.route('/projects/search_batch', methods=['POST'])
+def search_projects_batch():
+    """Search many query boxes with shared filters in one request"""
+    data = request.get_json(silent=True) or {}
+    boxes, predicate, filters, error = parse_batch_request(data, projects_table, areas_table, parse_point)
+    if error is not None:
+        return jsonify({'error': error}), 400
+
+    try:
+        with engine.connect() as conn:
+            per_box = search_boxes(conn, projects_table, areas_table, boxes, predicate, filters, use_index=database.RTREE_AVAILABLE)
+        results = [
+            {
+                'box': i,
+                'bounds': {'xmin': box[0], 'ymin': box[1], 'xmax': box[2], 'ymax': box[3]},
+                'count': len(projects),
+                'projects': projects
+            }
+            for i, (box, projects) in enumerate(zip(boxes, per_box))
+        ]
+        return jsonify({'predicate': predicate, 'count': len(results), 'results': results})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @projects_bp.route('/projects/<uuid>', methods=['GET'])
 def get_project(uuid):
     """Get a specific project by UUID"""
@@ -429,12 +585,16 @@ def delete_project(uuid):
                         print(f"Error deleting folder: {e}")
             
             # Delete from database
+            deleted_area_ids = [row[0] for row in conn.execute(select(areas_table.c.id).where(areas_table.c.project_id == uuid))]
             proj_result = conn.execute(projects_table.delete().where(projects_table.c.uuid == uuid))
             area_result = conn.execute(areas_table.delete().where(areas_table.c.project_id == uuid))
             
             if proj_result.rowcount == 0:
                 return jsonify({'error': 'Project not found'}), 404
             
+            # Keep this worker's in-memory spatial index current
+            area_index.remove_areas(deleted_area_ids)
+            
             return jsonify({
                 'message': 'Project deleted successfully',
                 'projects_deleted': proj_result.rowcount,
@@ -460,6 +620,7 @@ def add_project():
     try:
         # Generate a unique UUID using the reusable function
         generated_uuid = generate_unique_uuid()
+        new_areas = []
         
         with engine.begin() as conn:
             # Insert project with generated UUID
@@ -470,7 +631,8 @@ def add_project():
                 date=data['date'],
                 file_location=data['file_location'],
                 paper_size=data['paper_size'],
-                description=data['description']
+                description=data['description'],
+                **derived_project_values(projects_table, data)
             ))
             
             # Insert areas if provided
@@ -484,14 +646,20 @@ def add_project():
                     
                     scale_value = area_data['scale']
                     
-                    conn.execute(areas_table.insert().values(
+                    area_result = conn.execute(areas_table.insert().values(
                         project_id=generated_uuid,
                         xmin=area_data['xmin'],
                         ymin=area_data['ymin'],
                         xmax=area_data['xmax'],
                         ymax=area_data['ymax'],
-                        scale=scale_value
+                        scale=scale_value,
+                        **derived_area_values(areas_table, area_data['xmin'], area_data['ymin'],
+                                              area_data['xmax'], area_data['ymax'], scale_value)
                     ))
+                    new_areas.append((area_result.inserted_primary_key[0], area_data['xmin'], area_data['ymin'], area_data['xmax'], area_data['ymax'], scale_value))
+        
+        # Keep this worker's in-memory spatial index current
+        area_index.add_areas(new_areas)
         
         return jsonify({'message': 'Project added successfully', 'uuid': generated_uuid}), 201
     except Exception as e:
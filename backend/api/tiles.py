@@ -0,0 +1,27 @@
+from flask import Blueprint, jsonify, request, Response
+from models.database import engine, areas_table, area_index
+from models import database
+import tiles
+
+tiles_bp = Blueprint('tiles', __name__)
+
+@tiles_bp.route('/tiles/<int:z>/<int:x>/<int:y>', methods=['GET'])
+def get_footprint_tile(z, x, y):
+    """Get the map frame footprints of an XYZ tile as a compact GeoJSON FeatureCollection"""
+    if not tiles.PYPROJ_AVAILABLE:
+        return jsonify({'error': 'Footprint tiles require pyproj. Install with: pip install pyproj'}), 500
+
+    tile_error = tiles.validate_tile(z, x, y)
+    if tile_error is not None:
+        return jsonify({'error': tile_error}), 404
+
+    try:
+        with engine.connect() as conn:
+            tile, version = tiles.footprint_tile(conn, areas_table, z, x, y, use_index=database.RTREE_AVAILABLE, area_index=area_index)
+        response = Response(tile, mimetype='application/geo+json')
+        if version is not None:
+            response.set_etag(tiles.tile_etag(version))
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -1,27 +1,18 @@
 from flask import Flask, jsonify, send_file
 from flask_cors import CORS
-from api.projects import projects_bp
-from api.areas import areas_bp
-from api.files import files_bp
-from sqlalchemy import Table, MetaData, create_engine
+from models.database import init_database
 import os
 
-# Database configuration
-DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'elements.db')
-DATABASE_URL = f'sqlite:///{DB_PATH}'
-engine = create_engine(DATABASE_URL)
-metadata = MetaData()
-
-# OLD VERSION (with autoload=True) - keeping for reference
-# projects_table = Table('projects', metadata, autoload=True, autoload_with=engine)
-# areas_table = Table('areas', metadata, autoload=True, autoload_with=engine)
-
-# Current version (without autoload=True)
-projects_table = Table('projects', metadata, autoload_with=engine)
-areas_table = Table('areas', metadata, autoload_with=engine)
-
 def create_app():
     app = Flask(__name__)
+
+    # Only reads which columns and optional indexes the database has; the schema is set up by `python db_schema.py`
+    init_database()
+    # Imported afterwards: the API modules import the tables of this database
+    from api.projects import projects_bp
+    from api.areas import areas_bp
+    from api.files import files_bp
+    from api.tiles import tiles_bp
     
     # Enable CORS for all domains on all routes
     CORS(app, origins=["*"])
@@ -30,6 +21,7 @@ def create_app():
     app.register_blueprint(projects_bp, url_prefix='/api')
     app.register_blueprint(areas_bp, url_prefix='/api')
     app.register_blueprint(files_bp)
+    app.register_blueprint(tiles_bp)
     
     # Health check endpoint
     @app.route('/api/health')
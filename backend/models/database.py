@@ -1,12 +1,43 @@
-from sqlalchemy import create_engine, MetaData, Table
-
 # Database configuration
 import os
+import sys
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
 DB_PATH = os.path.join(os.path.dirname(__file__), '..', '..', 'elements.db')
 DATABASE_URL = f'sqlite:///{DB_PATH}'
-engine = create_engine(DATABASE_URL)
-metadata = MetaData()
 
-# Reflect tables from existing database
-projects_table = Table('projects', metadata, autoload_with=engine)
-areas_table = Table('areas', metadata, autoload_with=engine)
+# Shared database helpers (spatial index, ...) live in the project root
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+from db_engine import create_sqlite_engine
+from db_schema import projects_table, areas_table, live_tables, database_features
+from packed_index import PackedAreaIndex
+
+# WAL, PRAGMAs and pool sizing from config.py; connects on first use.
+# The tables are declared in db_schema.py and set up by `python db_schema.py`.
+engine = create_sqlite_engine(DATABASE_URL)
+
+# Optional indexes of the database, set by init_database()
+RTREE_AVAILABLE = False
+FTS_AVAILABLE = False
+TRIGRAM_AVAILABLE = False
+DUPLICATES_AVAILABLE = False
+
+def init_database():
+    """
+    Read which columns and optional tables (R*Tree, full-text and trigram
+    indexes, duplicate candidates) the database has. Runs before the API
+    modules are imported, so they import the tables of this database.
+
+    Raises:
+        RuntimeError: if the database has no projects or areas table
+    """
+    global projects_table, areas_table, RTREE_AVAILABLE, FTS_AVAILABLE, TRIGRAM_AVAILABLE, DUPLICATES_AVAILABLE
+    projects_table, areas_table = live_tables(engine)
+    features = database_features(engine)
+    RTREE_AVAILABLE = features['rtree']
+    FTS_AVAILABLE = features['fts']
+    TRIGRAM_AVAILABLE = features['trigram']
+    DUPLICATES_AVAILABLE = features['duplicates']
+
+# In-memory spatial index, loaded lazily on the first search of each worker
+area_index = PackedAreaIndex(engine)
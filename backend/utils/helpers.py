@@ -157,16 +157,3 @@ def calculate_overlap_percentage(area_xmin, area_ymin, area_xmax, area_ymax, que
         return 0.0
 
     return (intersect_size / area_size) * 100.0
-
-def convert_date_to_db_format(date_str):
-    """Convert DD/MM/YYYY format to database format (DD-MM-YY) for comparison"""
-    try:
-        if date_str and '/' in date_str:  # DD/MM/YYYY format
-            day, month, year = date_str.split('/')
-            # Convert to DD-MM-YY format for database comparison
-            return f"{day.zfill(2)}-{month.zfill(2)}-{year[2:]}"
-        elif date_str and '-' in date_str:  # DD-MM-YY format (already correct)
-            return date_str
-        return None
-    except:
-        return None
@@ -0,0 +1,196 @@
+"""
+Batch spatial search: many query boxes with shared filters in one request.
+
+All boxes are sent to SQLite as one VALUES table and joined with the areas in a
+single statement (through the R*Tree when available), grouped per box and
+project. This replaces one HTTP call, coordinate parse and group_concat query
+per box.
+"""
+
+import math
+
+from sqlalchemy import select, func, distinct, and_, or_, text, column, Integer, Float
+
+from spatial_index import (
+    areas_rtree_table, exact_bbox_condition, rtree_condition,
+    normalize_predicate, PREDICATE_INSIDE, SPATIAL_PREDICATES
+)
+from spatial_queries import PROJECT_FIELDS, parse_footprint_size_range, footprint_size_filters
+from scale_utils import scale_filter, parse_scale_range, scale_range_filters
+from date_utils import parse_date_range, date_range_filters
+from text_search import prefix_filter
+
+# Upper limit of boxes per request
+MAX_BATCH_BOXES = 1000
+
+def parse_box(box, parse_point):
+    """
+    Parse one query box, either {"bottom_left": ..., "top_right": ...} with any
+    coordinate format parse_point() accepts, or [xmin, ymin, xmax, ymax].
+
+    Returns:
+        tuple: ((xmin, ymin, xmax, ymax), None) or (None, error message)
+    """
+    if isinstance(box, (list, tuple)):
+        if len(box) != 4:
+            return None, 'Expected [xmin, ymin, xmax, ymax]'
+        try:
+            return tuple(float(v) for v in box), None
+        except (TypeError, ValueError):
+            return None, 'Box coordinates must be numbers'
+    if not isinstance(box, dict):
+        return None, 'Expected {"bottom_left": ..., "top_right": ...} or [xmin, ymin, xmax, ymax]'
+
+    bottom_left = str(box.get('bottom_left', '')).strip()
+    top_right = str(box.get('top_right', '')).strip()
+    if not bottom_left or not top_right:
+        return None, 'Both bottom_left and top_right are required'
+    bl_result = parse_point(bottom_left)
+    tr_result = parse_point(top_right)
+    if bl_result[1] is not None:
+        return None, f'Bottom Left: {bl_result[1]}'
+    if tr_result[1] is not None:
+        return None, f'Top Right: {tr_result[1]}'
+    if not bl_result[0] or not tr_result[0]:
+        return None, 'Invalid input format. Please use X/Y or X,Y for both points.'
+    return (*bl_result[0], *tr_result[0]), None
+
+def parse_batch_request(data, projects_table, areas_table, parse_point):
+    """
+    Validate a batch search request.
+
+    Shared filters use the same keys as /api/projects/search: predicate, uuid,
+    user_names, paper_size (custom_height/custom_width), scale, scale_min,
+    scale_max, min_area_km2, max_area_km2, date_from, date_to.
+
+    Returns:
+        tuple: (boxes, predicate, filters, error); error is None when valid
+    """
+    boxes = data.get('boxes')
+    if not isinstance(boxes, list) or not boxes:
+        return None, None, None, "'boxes' must be a non-empty array of query boxes"
+    if len(boxes) > MAX_BATCH_BOXES:
+        return None, None, None, f'Too many boxes ({len(boxes)}), the maximum is {MAX_BATCH_BOXES}'
+
+    predicate = normalize_predicate(data.get('predicate', ''))
+    if predicate is None:
+        return None, None, None, f"Invalid spatial predicate. Use one of: {', '.join(SPATIAL_PREDICATES)}."
+    if data.get('relative_size'):
+        return None, None, None, 'The intersection range filter is not supported in batch searches.'
+
+    parsed_boxes = []
+    for i, box in enumerate(boxes):
+        parsed, box_error = parse_box(box, parse_point)
+        if box_error is not None:
+            return None, None, None, f'Box {i}: {box_error}'
+        if not all(math.isfinite(v) for v in parsed):
+            return None, None, None, f'Box {i}: Coordinates must be finite numbers'
+        xmin, ymin, xmax, ymax = parsed
+        # Intersects/contains searches may use the same point twice ("which maps cover this point")
+        if (xmin > xmax or ymin > ymax) or (predicate == PREDICATE_INSIDE and (xmin == xmax or ymin == ymax)):
+            return None, None, None, f'Box {i}: Bottom Left must be southwest (smaller X and Y) of Top Right.'
+        parsed_boxes.append(parsed)
+
+    filters = []
+    uuid = str(data.get('uuid', '')).strip()
+    if uuid:
+        filters.append(prefix_filter(projects_table.c.uuid, uuid))
+
+    user_names = data.get('user_names', [])
+    if user_names:
+        filters.append(or_(*[prefix_filter(projects_table.c.user_name, n) for n in user_names]))
+
+    paper_size = str(data.get('paper_size', '')).strip()
+    custom_height = str(data.get('custom_height', '')).strip()
+    custom_width = str(data.get('custom_width', '')).strip()
+    if paper_size:
+        if paper_size == 'custom' and custom_height and custom_width:
+            try:
+                custom_size_format = f"Custom Size: Height: {float(custom_height)} cm, Width: {float(custom_width)} cm"
+            except ValueError:
+                return None, None, None, 'Custom height and width must be valid numbers.'
+            filters.append(prefix_filter(projects_table.c.paper_size, custom_size_format))
+        elif paper_size != 'custom':
+            filters.append(prefix_filter(projects_table.c.paper_size, paper_size))
+        else:
+            return None, None, None, 'Please enter both height and width for custom size.'
+
+    scale = str(data.get('scale', '')).strip()
+    if scale:
+        filters.append(scale_filter(areas_table, scale))
+
+    scale_min, scale_max, scale_range_error = parse_scale_range(data.get('scale_min'), data.get('scale_max'))
+    if scale_range_error is not None:
+        return None, None, None, scale_range_error
+    filters.extend(scale_range_filters(areas_table, scale_min, scale_max))
+
+    min_area_m2, max_area_m2, size_range_error = parse_footprint_size_range(data.get('min_area_km2'), data.get('max_area_km2'))
+    if size_range_error is not None:
+        return None, None, None, size_range_error
+    filters.extend(footprint_size_filters(areas_table, min_area_m2, max_area_m2))
+
+    date_from, date_to, date_error = parse_date_range(str(data.get('date_from', '')), str(data.get('date_to', '')))
+    if date_error is not None:
+        return None, None, None, date_error
+    filters.extend(date_range_filters(projects_table, date_from, date_to))
+
+    return parsed_boxes, predicate, filters, None
+
+def search_boxes(conn, projects_table, areas_table, boxes, predicate, filters=(), use_index=True):
+    """
+    Answer many query boxes with one SQL statement.
+
+    Args:
+        boxes: list of (xmin, ymin, xmax, ymax)
+        predicate: spatial predicate between the areas and each box
+        filters: shared SQL conditions on projects/areas
+        use_index: probe the areas R*Tree for each box
+
+    Returns:
+        list (one entry per box, in input order) of lists of project dicts with
+        associated_scales (the scales of the matching areas)
+    """
+    # SQLite names VALUES columns column1..column5 (no column list on the alias).
+    # The validated coordinates are inlined (repr() of a finite float reads back
+    # exactly), so SQLite's variable limit (999 before 3.32) does not apply
+    rows_sql = ', '.join(
+        f"({i}, {float(xmin)!r}, {float(ymin)!r}, {float(xmax)!r}, {float(ymax)!r})"
+        for i, (xmin, ymin, xmax, ymax) in enumerate(boxes)
+    )
+    query_boxes = text(
+        "SELECT column1 AS box, column2 AS xmin, column3 AS ymin, column4 AS xmax, column5 AS ymax "
+        f"FROM (VALUES {rows_sql})"
+    ).columns(
+        column('box', Integer), column('xmin', Float), column('ymin', Float),
+        column('xmax', Float), column('ymax', Float)
+    ).subquery('query_boxes')
+    b = query_boxes.c
+    exact = exact_bbox_condition(
+        (areas_table.c.xmin, areas_table.c.ymin, areas_table.c.xmax, areas_table.c.ymax),
+        predicate, b.xmin, b.ymin, b.xmax, b.ymax
+    )
+
+    if use_index:
+        # Per box R*Tree probe, then primary key lookups of the candidate areas
+        joined = query_boxes.join(
+            areas_rtree_table, rtree_condition(predicate, b.xmin, b.ymin, b.xmax, b.ymax)
+        ).join(areas_table, and_(areas_table.c.id == areas_rtree_table.c.id, exact))
+    else:
+        joined = query_boxes.join(areas_table, exact)
+    joined = joined.join(projects_table, projects_table.c.uuid == areas_table.c.project_id)
+
+    project_columns = [projects_table.c[name] for name in PROJECT_FIELDS]
+    stmt = select(
+        b.box,
+        *project_columns,
+        func.coalesce(func.group_concat(distinct(areas_table.c.scale)), '').label('associated_scales')
+    ).select_from(joined)
+    if filters:
+        stmt = stmt.where(and_(*filters))
+    stmt = stmt.group_by(b.box, *project_columns).order_by(b.box, projects_table.c.uuid)
+
+    results = [[] for _ in boxes]
+    for row in conn.execute(stmt):
+        project = dict(row._mapping)
+        results[project.pop('box')].append(project)
+    return results
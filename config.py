@@ -8,6 +8,18 @@ API_TIMEOUT = 30  # Timeout in seconds for API requests
 # Database Configuration (for local fallback)
 LOCAL_DATABASE_PATH = "elements.db"
 
+# SQLite connection settings (see db_engine.py)
+DB_JOURNAL_MODE = "WAL"  # Use "DELETE" when elements.db is on a network share (WAL needs a local disk)
+DB_BUSY_TIMEOUT_MS = 5000  # How long a writer waits for a lock before "database is locked"
+DB_CACHE_SIZE_KB = 64 * 1024  # Page cache per connection
+DB_MMAP_SIZE = 256 * 1024 * 1024  # Memory-mapped I/O window in bytes (0 disables it)
+DB_POOL_SIZE = 5  # Connections kept open per process (>= waitress threads)
+DB_MAX_OVERFLOW = 10  # Extra connections opened under load
+DB_POOL_TIMEOUT = 30  # Seconds to wait for a free connection
+
+# Search Configuration
+INTERSECTION_FILTER_IN_SQL = True  # Run the intersection range filter inside SQLite (False: vectorized in Python)
+
 # Flask App Configuration
 FLASK_HOST = "0.0.0.0"  # Allow external connections
 FLASK_PORT = 5000
@@ -0,0 +1,261 @@
+"""
+Row counters for the listing totals.
+
+Every page of the All Projects / All Areas tables needs the number of matching
+rows, and a COUNT over the (grouped) listing query costs as much as the page
+itself. The row_counts table keeps the number of rows of projects and areas,
+and the number of projects per user name and per paper size. Triggers on the
+two tables keep the counters current, so every writer maintains them.
+
+- Unfiltered totals are one primary key lookup.
+- A single user name or paper size prefix filter is answered by summing the
+  counters of the matching names (the same LIKE the listing uses).
+- With estimate=True, other filtered totals are extrapolated from
+  ESTIMATE_SAMPLE_ROWS random rowids spread over the whole table (primary
+  key lookups) instead of counting every match.
+
+The change counters (scope 'changes') count every insert, update and delete of
+projects and areas. They only go up, so the per-worker tile and heatmap caches
+use them as table versions without counting any rows.
+"""
+
+import random
+
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, String, and_, bindparam, case, func, literal_column, select, text
+)
+
+from text_search import prefix_filter
+
+COUNTERS_TABLE = 'row_counts'
+
+# Project columns with one counter per value
+COUNTER_FACETS = ('user_name', 'paper_size')
+
+# Counter scope of the inserts, updates and deletes of each table
+CHANGES_SCOPE = 'changes'
+CHANGE_COUNTED_TABLES = ('projects', 'areas')
+
+# Rows checked by an estimated count
+ESTIMATE_SAMPLE_ROWS = 1000
+
+counters_metadata = MetaData()
+row_counts_table = Table(COUNTERS_TABLE, counters_metadata,
+    # 'table' for the table row counts and CHANGES_SCOPE for the change counts
+    # (key = table name), else a column of COUNTER_FACETS
+    Column('scope', String, primary_key=True),
+    Column('key', String, primary_key=True),
+    Column('count', Integer, nullable=False)
+)
+
+def _increment(scope, key, delta):
+    return (
+        f"INSERT INTO {COUNTERS_TABLE} (scope, key, count) VALUES ({scope}, {key}, {delta}) "
+        f"ON CONFLICT (scope, key) DO UPDATE SET count = count + {delta};"
+    )
+
+COUNTERS_SCHEMA = [
+    f"""CREATE TABLE IF NOT EXISTS {COUNTERS_TABLE} (
+        scope TEXT NOT NULL,
+        key TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (scope, key)
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {COUNTERS_TABLE}_projects_insert AFTER INSERT ON projects BEGIN
+        {_increment("'table'", "'projects'", 1)}
+        {' '.join(_increment(f"'{facet}'", f'new.{facet}', 1) for facet in COUNTER_FACETS)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {COUNTERS_TABLE}_projects_delete AFTER DELETE ON projects BEGIN
+        {_increment("'table'", "'projects'", -1)}
+        {' '.join(_increment(f"'{facet}'", f'old.{facet}', -1) for facet in COUNTER_FACETS)}
+    END""",
+    *[
+        f"""CREATE TRIGGER IF NOT EXISTS {COUNTERS_TABLE}_projects_{facet}_update
+        AFTER UPDATE OF {facet} ON projects WHEN old.{facet} IS NOT new.{facet} BEGIN
+            {_increment(f"'{facet}'", f'old.{facet}', -1)}
+            {_increment(f"'{facet}'", f'new.{facet}', 1)}
+        END"""
+        for facet in COUNTER_FACETS
+    ],
+    f"""CREATE TRIGGER IF NOT EXISTS {COUNTERS_TABLE}_areas_insert AFTER INSERT ON areas BEGIN
+        {_increment("'table'", "'areas'", 1)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {COUNTERS_TABLE}_areas_delete AFTER DELETE ON areas BEGIN
+        {_increment("'table'", "'areas'", -1)}
+    END""",
+]
+
+CHANGE_COUNTERS_SCHEMA = [
+    f"""CREATE TRIGGER IF NOT EXISTS {COUNTERS_TABLE}_{table_name}_{event.lower()}_changes AFTER {event} ON {table_name} BEGIN
+        {_increment(f"'{CHANGES_SCOPE}'", f"'{table_name}'", 1)}
+    END"""
+    for table_name in CHANGE_COUNTED_TABLES for event in ('INSERT', 'UPDATE', 'DELETE')
+]
+
+def refresh_row_counters(conn):
+    """Recount all counters from the tables; the change counters are kept"""
+    conn.execute(text(f"DELETE FROM {COUNTERS_TABLE} WHERE scope != '{CHANGES_SCOPE}'"))
+    for table_name in ('projects', 'areas'):
+        conn.execute(text(
+            f"INSERT INTO {COUNTERS_TABLE} (scope, key, count) SELECT 'table', '{table_name}', count(*) FROM {table_name}"
+        ))
+    for facet in COUNTER_FACETS:
+        conn.execute(text(
+            f"""INSERT INTO {COUNTERS_TABLE} (scope, key, count)
+            SELECT '{facet}', {facet}, count(*) FROM projects WHERE {facet} IS NOT NULL GROUP BY {facet}"""
+        ))
+
+def ensure_row_counters(engine):
+    """
+    Create the row_counts table and its triggers, and fill the counters from
+    the current tables.
+
+    Returns:
+        bool: True if the counters are available
+    """
+    try:
+        with engine.begin() as conn:
+            if not conn.execute(text("PRAGMA table_info(projects)")).fetchall() or \
+                    not conn.execute(text("PRAGMA table_info(areas)")).fetchall():
+                return False
+            for statement in COUNTERS_SCHEMA:
+                conn.execute(text(statement))
+            refresh_row_counters(conn)
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not create the row counters: {e}")
+        return False
+
+def ensure_change_counters(engine):
+    """
+    Create the change counters and their triggers (needs the row_counts table
+    of ensure_row_counters()).
+
+    Returns:
+        bool: True if the change counters are available
+    """
+    try:
+        with engine.begin() as conn:
+            if not conn.execute(text(f"PRAGMA table_info({COUNTERS_TABLE})")).fetchall():
+                return False
+            for statement in CHANGE_COUNTERS_SCHEMA:
+                conn.execute(text(statement))
+            for table_name in CHANGE_COUNTED_TABLES:
+                conn.execute(text(
+                    f"INSERT OR IGNORE INTO {COUNTERS_TABLE} (scope, key, count) VALUES ('{CHANGES_SCOPE}', '{table_name}', 0)"
+                ))
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not create the change counters: {e}")
+        return False
+
+def change_count(conn, table_name):
+    """
+    Number of inserts, updates and deletes of projects or areas since the
+    change counters were created (one primary key lookup).
+
+    Returns:
+        int, or None if the database has no change counters
+    """
+    c = row_counts_table.c
+    try:
+        return conn.execute(
+            select(c.count).where(c.scope == CHANGES_SCOPE, c.key == table_name)
+        ).scalar_one_or_none()
+    except Exception:
+        # Databases migrated before the counters existed
+        return None
+
+def counted_total(conn, table_name, facet=None, prefix=None):
+    """
+    Number of rows of projects or areas from the counters, or of the projects
+    whose facet column (one of COUNTER_FACETS) starts with prefix.
+
+    Returns:
+        int, or None if the database has no counters
+    """
+    c = row_counts_table.c
+    try:
+        if facet is None:
+            return conn.execute(
+                select(c.count).where(c.scope == 'table', c.key == table_name)
+            ).scalar_one_or_none() or 0
+        return conn.execute(
+            select(func.coalesce(func.sum(c.count), 0)).where(c.scope == facet, prefix_filter(c.key, prefix))
+        ).scalar_one()
+    except Exception:
+        # Databases migrated before the counters existed
+        return None
+
+def estimated_total(conn, table, filters, total_rows, rng=random):
+    """
+    Estimate the rows of table matching filters from ESTIMATE_SAMPLE_ROWS
+    random rowids between the smallest and largest one: the matching share of
+    the sampled rows that exist, scaled to total_rows. Rows added last weigh
+    as much as the oldest ones. Exact when the table is no bigger than the
+    sample.
+
+    Args:
+        rng: source of the sampled rowids (random.Random(seed) for a repeatable
+             estimate)
+
+    Returns:
+        tuple: (total, True if the total is an estimate)
+    """
+    rowid = literal_column(f'{table.name}.rowid')
+    count_all = select(func.count()).select_from(table).where(*filters)
+    if total_rows <= ESTIMATE_SAMPLE_ROWS:
+        return conn.execute(count_all).scalar_one(), False
+    min_rowid, max_rowid = conn.execute(select(func.min(rowid), func.max(rowid)).select_from(table)).first()
+    if min_rowid is None or max_rowid - min_rowid < ESTIMATE_SAMPLE_ROWS:
+        return conn.execute(count_all).scalar_one(), False
+    # Inlined like area_ids_filter, so SQLite's variable limit does not apply
+    sample = rowid.in_(bindparam(None, rng.sample(range(min_rowid, max_rowid + 1), ESTIMATE_SAMPLE_ROWS),
+                                 expanding=True, literal_execute=True))
+    sampled, matches = conn.execute(
+        select(func.count(), func.coalesce(func.sum(case((and_(*filters), 1), else_=0)), 0))
+        .select_from(table).where(sample)
+    ).first()
+    if not sampled:
+        # Rowids too sparse (mass deletes) for a sample
+        return conn.execute(count_all).scalar_one(), False
+    return round(matches * total_rows / sampled), True
+
+def listing_total(conn, table, filters, count_stmt, facet=None, prefix=None, estimate=False):
+    """
+    Total of a listing of table (projects or areas).
+
+    From the counters when the listing is unfiltered or only filtered by one
+    facet prefix (facet, prefix); else estimated from a sample (estimate=True)
+    or counted with count_stmt.
+
+    Args:
+        filters: the WHERE conditions on table, or None when the listing has
+                 others (e.g. a HAVING) and is always counted with count_stmt
+
+    Returns:
+        tuple: (total, True if the total is an estimate)
+    """
+    if filters is not None and (not filters or facet is not None):
+        total = counted_total(conn, table.name, facet, prefix)
+        if total is not None:
+            return total, False
+    if estimate and filters is not None:
+        total_rows = counted_total(conn, table.name)
+        if total_rows is not None:
+            return estimated_total(conn, table, filters, total_rows)
+    return conn.execute(count_stmt).scalar_one(), False
+
+def counter_facet(active_filters):
+    """
+    The (facet, prefix) of a listing whose only active filter is a prefix
+    filter on a COUNTER_FACETS column, else (None, None).
+
+    Args:
+        active_filters: {column name: filter value} of the non-empty filters
+    """
+    if len(active_filters) == 1:
+        (column, value), = active_filters.items()
+        if column in COUNTER_FACETS:
+            return column, value
+    return None, None
@@ -0,0 +1,313 @@
+"""
+Coverage density grids ("where do we have maps").
+
+All map frames of the areas table are rasterized into a NumPy 2D count grid
+over a UTM 36N extent: every cell holds the number of frames overlapping it.
+Each frame adds +1/-1 to the four corners of its cell range in a difference
+grid and two cumulative sums turn that into counts, so the cost does not depend
+on the frame sizes.
+
+The exact fraction of a query box covered by the union of map frames (without
+double counting overlaps) is computed with a sweep line over x and a segment
+tree over the compressed y coordinates, in O(n log n) for n frames.
+
+Computed grids are cached per worker. The cache key includes the change counter
+and max id of the areas and projects tables, so writing frames or projects
+(from any worker) invalidates the cached grids.
+"""
+
+import math
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+
+from sqlalchemy import select, and_, text
+
+from counters import change_count
+from packed_index import NUMPY_AVAILABLE
+from spatial_index import bbox_predicate_filter, PREDICATE_INTERSECTS
+from date_utils import parse_date_range, date_range_filters
+from scale_utils import scale_filter
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+# Largest grid (number of cells) a single request may ask for
+MAX_HEATMAP_CELLS = 4000000
+# Cell size in meters when the request does not give one
+DEFAULT_CELL_SIZE = 1000.0
+# Number of grids kept per worker
+HEATMAP_CACHE_SIZE = 32
+
+class CoverageCache:
+    """Small thread-safe LRU cache for computed grids"""
+
+    def __init__(self, max_entries=HEATMAP_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+coverage_cache = CoverageCache()
+
+def table_version(conn, table_name):
+    """
+    Fingerprint of projects or areas for the cache keys: its change counter and
+    max rowid, two primary key lookups.
+
+    Returns:
+        tuple, or None if the database has no change counters yet (pending
+        migrations); in-place updates can't be detected then, so callers
+        don't cache
+    """
+    changes = change_count(conn, table_name)
+    if changes is None:
+        return None
+    return changes, conn.execute(text(f"SELECT max(rowid) FROM {table_name}")).scalar()
+
+def areas_version(conn):
+    """Fingerprint of the areas table (or None), see table_version()"""
+    return table_version(conn, 'areas')
+
+def parse_heatmap_args(args):
+    """
+    Validate the heatmap request arguments.
+
+    Args:
+        args: request.args (bbox=xmin,ymin,xmax,ymax, cell_size, scale, date_from,
+              date_to, format)
+
+    Returns:
+        tuple: (options dict, None) or (None, error message)
+    """
+    bbox = args.get('bbox', '').strip()
+    if not bbox:
+        return None, "Missing 'bbox' parameter (xmin,ymin,xmax,ymax in UTM 36N meters)"
+    try:
+        xmin, ymin, xmax, ymax = [float(v) for v in bbox.split(',')]
+    except ValueError:
+        return None, "'bbox' must be four numbers: xmin,ymin,xmax,ymax"
+    if xmin >= xmax or ymin >= ymax:
+        return None, "'bbox' must have xmin < xmax and ymin < ymax"
+
+    try:
+        cell_size = float(args.get('cell_size', DEFAULT_CELL_SIZE))
+    except ValueError:
+        return None, "'cell_size' must be a number"
+    if cell_size <= 0:
+        return None, "'cell_size' must be positive"
+    nx, ny = grid_shape(xmin, ymin, xmax, ymax, cell_size)
+    if nx * ny > MAX_HEATMAP_CELLS:
+        return None, f'Grid of {nx} x {ny} cells is too large (maximum {MAX_HEATMAP_CELLS} cells), use a larger cell_size'
+
+    output_format = args.get('format', 'json').strip().lower()
+    if output_format not in ('json', 'png'):
+        return None, "'format' must be json or png"
+
+    options = {
+        'bbox': (xmin, ymin, xmax, ymax),
+        'cell_size': cell_size,
+        'scale': args.get('scale', '').strip(),
+        'date_from': None,
+        'date_to': None,
+        'format': output_format
+    }
+    options['date_from'], options['date_to'], date_error = parse_date_range(args.get('date_from', ''), args.get('date_to', ''))
+    if date_error is not None:
+        return None, date_error
+    return options, None
+
+def grid_shape(xmin, ymin, xmax, ymax, cell_size):
+    """Number of columns and rows of a grid covering the extent"""
+    nx = max(math.ceil((xmax - xmin) / cell_size), 1)
+    ny = max(math.ceil((ymax - ymin) / cell_size), 1)
+    return nx, ny
+
+def rasterize_counts(area_bounds, xmin, ymin, xmax, ymax, cell_size):
+    """
+    Count the frames overlapping every grid cell.
+
+    Args:
+        area_bounds: (n, 4) array of xmin, ymin, xmax, ymax
+        xmin, ymin, xmax, ymax: grid extent
+        cell_size: cell edge length in meters
+
+    Returns:
+        (rows, cols) int32 array; row 0 is the southern edge of the extent
+    """
+    nx, ny = grid_shape(xmin, ymin, xmax, ymax, cell_size)
+    diff = np.zeros((ny + 1, nx + 1), dtype=np.int32)
+    if len(area_bounds):
+        b = np.asarray(area_bounds, dtype=np.float64)
+        axmin = np.minimum(b[:, 0], b[:, 2])
+        aymin = np.minimum(b[:, 1], b[:, 3])
+        axmax = np.maximum(b[:, 0], b[:, 2])
+        aymax = np.maximum(b[:, 1], b[:, 3])
+        # Cell ranges [c0, c1) x [r0, r1) overlapped by each frame; degenerate
+        # frames (lines, points) still count in the cell they fall into
+        c0 = np.floor((axmin - xmin) / cell_size).astype(np.int64)
+        r0 = np.floor((aymin - ymin) / cell_size).astype(np.int64)
+        c1 = np.maximum(np.ceil((axmax - xmin) / cell_size).astype(np.int64), c0 + 1)
+        r1 = np.maximum(np.ceil((aymax - ymin) / cell_size).astype(np.int64), r0 + 1)
+        c0, c1 = np.clip(c0, 0, nx), np.clip(c1, 0, nx)
+        r0, r1 = np.clip(r0, 0, ny), np.clip(r1, 0, ny)
+        inside = (c0 < c1) & (r0 < r1)
+        c0, c1, r0, r1 = c0[inside], c1[inside], r0[inside], r1[inside]
+        np.add.at(diff, (r0, c0), 1)
+        np.add.at(diff, (r0, c1), -1)
+        np.add.at(diff, (r1, c0), -1)
+        np.add.at(diff, (r1, c1), 1)
+    return np.cumsum(np.cumsum(diff, axis=0), axis=1)[:ny, :nx]
+
+def coverage_grid(conn, projects_table, areas_table, options, use_index=True):
+    """
+    Return the (cached) count grid for validated heatmap options.
+    Row 0 of the grid is the southern edge of the extent.
+    """
+    xmin, ymin, xmax, ymax = options['bbox']
+    # Frames are joined to their projects for the date filters, so project
+    # writes (dates, deletions) invalidate the grids as well
+    versions = (areas_version(conn), table_version(conn, 'projects'))
+    key = versions + (options['bbox'], options['cell_size'],
+                      options['scale'], options['date_from'], options['date_to'])
+    grid = coverage_cache.get(key) if None not in versions else None
+    if grid is not None:
+        return grid
+
+    conditions = [bbox_predicate_filter(areas_table, PREDICATE_INTERSECTS, xmin, ymin, xmax, ymax, use_index=use_index)]
+    if options['scale']:
+        conditions.append(scale_filter(areas_table, options['scale']))
+    conditions.extend(date_range_filters(projects_table, options['date_from'], options['date_to']))
+    stmt = select(areas_table.c.xmin, areas_table.c.ymin, areas_table.c.xmax, areas_table.c.ymax).select_from(
+        areas_table.join(projects_table, areas_table.c.project_id == projects_table.c.uuid)
+    ).where(and_(*conditions))
+    rows = conn.execute(stmt).fetchall()
+    area_bounds = np.array(rows, dtype=np.float64).reshape(-1, 4)
+
+    grid = rasterize_counts(area_bounds, xmin, ymin, xmax, ymax, options['cell_size'])
+    grid.setflags(write=False)
+    if None not in versions:
+        coverage_cache.put(key, grid)
+    return grid
+
+def grid_to_json(grid, options):
+    """JSON body for a grid; 'counts' rows run from north to south like an image"""
+    xmin, ymin, xmax, ymax = options['bbox']
+    return {
+        'bbox': {'xmin': xmin, 'ymin': ymin, 'xmax': xmax, 'ymax': ymax},
+        'cell_size': options['cell_size'],
+        'rows': int(grid.shape[0]),
+        'cols': int(grid.shape[1]),
+        'max_count': int(grid.max()) if grid.size else 0,
+        'counts': grid[::-1].tolist()
+    }
+
+def _png_chunk(chunk_type, data):
+    chunk = chunk_type + data
+    return struct.pack('>I', len(data)) + chunk + struct.pack('>I', zlib.crc32(chunk) & 0xffffffff)
+
+def grid_to_png(grid):
+    """
+    Encode a count grid as an RGBA PNG (north up): empty cells are transparent,
+    covered cells go from blue (one frame) to red (the maximum count).
+    """
+    counts = grid[::-1]
+    height, width = counts.shape
+    max_count = int(counts.max()) if counts.size else 0
+    t = counts / max_count if max_count > 0 else np.zeros(counts.shape)
+    rgba = np.zeros((height, width, 4), dtype=np.uint8)
+    rgba[..., 0] = np.round(255 * t)
+    rgba[..., 1] = np.round(255 * (1 - np.abs(2 * t - 1)) * 0.6)
+    rgba[..., 2] = np.round(255 * (1 - t))
+    rgba[..., 3] = np.where(counts > 0, 200, 0)
+
+    # Every scanline starts with filter type 0 (None)
+    raw = np.zeros((height, width * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(height, width * 4)
+    header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', header) +
+            _png_chunk(b'IDAT', zlib.compress(raw.tobytes(), 6)) + _png_chunk(b'IEND', b''))
+
+def union_area(rects):
+    """
+    Area of the union of axis-aligned rectangles (xmin, ymin, xmax, ymax).
+
+    Sweep line over the x edges; a segment tree over the distinct y edges keeps
+    the length of y covered by the rectangles currently crossing the sweep line.
+    """
+    rects = [r for r in rects if r[2] > r[0] and r[3] > r[1]]
+    if not rects:
+        return 0.0
+    ys = sorted({y for r in rects for y in (r[1], r[3])})
+    y_index = {y: i for i, y in enumerate(ys)}
+    segments = len(ys) - 1
+    cover_count = [0] * (4 * segments)
+    covered_length = [0.0] * (4 * segments)
+
+    def update(node, lo, hi, start, end, delta):
+        # Segment tree node covers the y slabs [lo, hi)
+        if end <= lo or hi <= start:
+            return
+        if start <= lo and hi <= end:
+            cover_count[node] += delta
+        else:
+            mid = (lo + hi) // 2
+            update(2 * node, lo, mid, start, end, delta)
+            update(2 * node + 1, mid, hi, start, end, delta)
+        if cover_count[node] > 0:
+            covered_length[node] = ys[hi] - ys[lo]
+        elif hi - lo == 1:
+            covered_length[node] = 0.0
+        else:
+            covered_length[node] = covered_length[2 * node] + covered_length[2 * node + 1]
+
+    # Closing edges sort before opening edges at the same x (either order is correct)
+    events = sorted(
+        [(r[0], 1, y_index[r[1]], y_index[r[3]]) for r in rects] +
+        [(r[2], -1, y_index[r[1]], y_index[r[3]]) for r in rects]
+    )
+    area = 0.0
+    previous_x = events[0][0]
+    for x, delta, start, end in events:
+        area += covered_length[1] * (x - previous_x)
+        previous_x = x
+        update(1, 0, segments, start, end, delta)
+    return area
+
+def region_coverage(rects, xmin, ymin, xmax, ymax):
+    """
+    How much of the query box is covered by the union of the given frames.
+
+    Returns:
+        dict: query_area and covered_area (square meters) and covered_fraction
+              (0..1, None for a degenerate query box)
+    """
+    clipped = [
+        (max(min(r[0], r[2]), xmin), max(min(r[1], r[3]), ymin),
+         min(max(r[0], r[2]), xmax), min(max(r[1], r[3]), ymax))
+        for r in rects
+    ]
+    query_area = (xmax - xmin) * (ymax - ymin)
+    covered_area = union_area(clipped)
+    return {
+        'query_area': query_area,
+        'covered_area': covered_area,
+        'covered_fraction': min(covered_area / query_area, 1.0) if query_area > 0 else None
+    }
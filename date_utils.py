@@ -0,0 +1,95 @@
+"""
+Helpers for project dates.
+
+projects.date keeps the text the clients send, "DD-MM-YY" from the ArcGIS
+toolbox. Compared as text those dates sort by day first, so range filters were
+wrong across months and years. Databases migrated by db_migrations also keep
+the date as ISO-8601 "YYYY-MM-DD" in the indexed projects.date_iso column,
+which sorts chronologically, and date range filters run on it.
+"""
+
+import re
+from datetime import date
+
+from sqlalchemy import case, func, literal, String
+
+# DD-MM-YY, DD/MM/YYYY, DD.MM.YYYY, ...
+DAY_FIRST_PATTERN = re.compile(r'^(\d{1,2})[-/.](\d{1,2})[-/.](\d{2}|\d{4})$')
+ISO_PATTERN = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')
+
+def parse_project_date(value):
+    """
+    Parse a project date into an ISO-8601 string.
+
+    Examples:
+        '05-08-25' -> '2025-08-05', '09/07/2025' -> '2025-07-09', '2025-07-09' -> '2025-07-09'
+
+    Two-digit years are in the 2000s (the toolbox writes dates with strftime("%d-%m-%y")).
+
+    Returns:
+        str or None if the value is not a valid date
+    """
+    if value is None:
+        return None
+    s = str(value).strip()
+    match = ISO_PATTERN.match(s)
+    if match:
+        year, month, day = (int(g) for g in match.groups())
+    else:
+        match = DAY_FIRST_PATTERN.match(s)
+        if not match:
+            return None
+        day, month, year = (int(g) for g in match.groups())
+        if len(match.group(3)) == 2:
+            year += 2000
+    try:
+        return date(year, month, day).isoformat()
+    except ValueError:
+        return None
+
+def project_date_expression(date_column):
+    """
+    SQL expression for the ISO date of a "DD-MM-YY" date column (NULL for
+    other formats), the fallback for databases without projects.date_iso.
+    """
+    iso = literal('20', String).concat(func.substr(date_column, 7, 2)).concat('-') \
+        .concat(func.substr(date_column, 4, 2)).concat('-').concat(func.substr(date_column, 1, 2))
+    return case((date_column.op('GLOB')('[0-9][0-9]-[0-9][0-9]-[0-9][0-9]'), iso), else_=None)
+
+def project_date_column(projects_table):
+    """ISO date of a project: the indexed date_iso column when the database has it"""
+    if 'date_iso' in projects_table.c:
+        return projects_table.c.date_iso
+    return project_date_expression(projects_table.c.date)
+
+def parse_date_range(date_from, date_to):
+    """
+    Parse the date_from / date_to filters of a search (DD/MM/YYYY, or any
+    format parse_project_date() accepts).
+
+    Returns:
+        tuple: (ISO from, ISO to, None) with None for missing bounds, or (None, None, error message)
+    """
+    bounds = []
+    for value, label in ((date_from, 'From Date'), (date_to, 'To Date')):
+        value = (value or '').strip()
+        if not value:
+            bounds.append(None)
+            continue
+        iso = parse_project_date(value)
+        if iso is None:
+            return None, None, f'Invalid date format for "{label}". Use DD/MM/YYYY format.'
+        bounds.append(iso)
+    return bounds[0], bounds[1], None
+
+def date_range_filters(projects_table, date_from=None, date_to=None):
+    """SQL conditions for an ISO date range (bounds inclusive)"""
+    filters = []
+    if date_from is None and date_to is None:
+        return filters
+    column = project_date_column(projects_table)
+    if date_from is not None:
+        filters.append(column >= date_from)
+    if date_to is not None:
+        filters.append(column <= date_to)
+    return filters
@@ -0,0 +1,99 @@
+"""
+SQLAlchemy engine factory for the elements.db SQLite database.
+
+create_engine('sqlite:///elements.db') with the defaults gives every
+connection SQLite's rollback journal, so readers wait for writers, and a small
+page cache. create_sqlite_engine() sets on every new connection:
+- journal_mode=WAL: readers keep reading while a writer commits
+- synchronous=NORMAL: safe with WAL, no fsync on every commit
+- mmap_size / cache_size: the R*Tree, FTS and B-tree pages stay in memory
+- busy_timeout: writers wait for each other instead of failing with
+  "database is locked"
+
+The pool is a QueuePool sized by config.py (DB_POOL_SIZE, ...), so the
+connections of waitress threads are reused instead of reopened per request.
+Pooled connections must not cross a fork: gunicorn --preload forks the workers
+after the app (and its engine) was imported, so the pools of all engines are
+dropped in the child (without closing the parent's connections).
+
+WAL does not work on network file systems; set DB_JOURNAL_MODE = "DELETE" in
+config.py when elements.db lives on a share.
+"""
+
+import os
+import weakref
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+try:
+    from config import (
+        DB_JOURNAL_MODE, DB_BUSY_TIMEOUT_MS, DB_CACHE_SIZE_KB, DB_MMAP_SIZE,
+        DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT
+    )
+except ImportError:
+    DB_JOURNAL_MODE = 'WAL'
+    DB_BUSY_TIMEOUT_MS = 5000
+    DB_CACHE_SIZE_KB = 64 * 1024
+    DB_MMAP_SIZE = 256 * 1024 * 1024
+    DB_POOL_SIZE = 5
+    DB_MAX_OVERFLOW = 10
+    DB_POOL_TIMEOUT = 30
+
+# Engines created by create_sqlite_engine(), for the fork handler
+_engines = weakref.WeakSet()
+
+def sqlite_pragmas(journal_mode=None, busy_timeout_ms=None, cache_size_kb=None, mmap_size=None):
+    """PRAGMA statements run on every new connection (config.py values by default)"""
+    return [
+        # First, so switching the journal mode waits for other connections too
+        f"PRAGMA busy_timeout = {int(busy_timeout_ms if busy_timeout_ms is not None else DB_BUSY_TIMEOUT_MS)}",
+        f"PRAGMA journal_mode = {journal_mode or DB_JOURNAL_MODE}",
+        "PRAGMA synchronous = NORMAL",
+        # Negative cache_size is in KiB rather than pages
+        f"PRAGMA cache_size = -{int(cache_size_kb if cache_size_kb is not None else DB_CACHE_SIZE_KB)}",
+        f"PRAGMA mmap_size = {int(mmap_size if mmap_size is not None else DB_MMAP_SIZE)}",
+    ]
+
+def create_sqlite_engine(database, pool_size=None, max_overflow=None, pool_timeout=None, **pragma_options):
+    """
+    Create an engine for a SQLite database file.
+
+    Args:
+        database: file path or sqlite:/// URL
+        pool_size, max_overflow, pool_timeout: QueuePool sizing (config.py values by default)
+        pragma_options: journal_mode, busy_timeout_ms, cache_size_kb, mmap_size overrides
+
+    Returns:
+        Engine
+    """
+    url = database if '://' in str(database) else f'sqlite:///{database}'
+    engine = create_engine(
+        url,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE if pool_size is None else pool_size,
+        max_overflow=DB_MAX_OVERFLOW if max_overflow is None else max_overflow,
+        pool_timeout=DB_POOL_TIMEOUT if pool_timeout is None else pool_timeout,
+    )
+    pragmas = sqlite_pragmas(**pragma_options)
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+    _engines.add(engine)
+    return engine
+
+def _dispose_engines_after_fork():
+    """Drop the pools inherited from the parent process; the child opens its own connections"""
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+# Not available on Windows, which has no fork
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_dispose_engines_after_fork)
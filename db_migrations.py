@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Versioned schema updates for existing elements.db files.
+
+Every migration in MIGRATIONS has a version number; the version a database is
+at is kept in SQLite's PRAGMA user_version, and ensure_schema() applies the
+pending ones in order. The migrations themselves (the ensure_* functions) are
+idempotent as well: they check the current schema, apply what is missing and
+backfill existing rows, so a half-applied migration is simply run again.
+
+db_schema.py calls ensure_schema() when it sets up a database. From the command line:
+    python db_migrations.py [status|upgrade] [--database elements.db]
+"""
+
+import argparse
+
+from sqlalchemy import text
+
+from counters import ensure_row_counters, ensure_change_counters
+from db_engine import create_sqlite_engine
+from scale_utils import parse_scale_denominator
+from date_utils import parse_project_date
+
+SCALE_DENOMINATOR_INDEX = 'idx_areas_scale_denominator'
+
+# SQL version of parse_scale_denominator() for writers that don't set the
+# column themselves (e.g. the ArcGIS toolbox): the number after the last ':'
+SCALE_DENOMINATOR_SQL = (
+    "CAST(replace(replace(replace(new.scale, rtrim(new.scale, replace(new.scale, ':', '')), ''), ',', ''), ' ', '') AS REAL)"
+)
+
+SCALE_DENOMINATOR_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS areas_scale_denominator_insert AFTER INSERT ON areas
+    WHEN new.scale_denominator IS NULL BEGIN
+        UPDATE areas SET scale_denominator =
+            CASE WHEN {SCALE_DENOMINATOR_SQL} >= 0.5 THEN CAST(round({SCALE_DENOMINATOR_SQL}) AS INTEGER) END
+        WHERE id = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS areas_scale_denominator_update AFTER UPDATE OF scale ON areas BEGIN
+        UPDATE areas SET scale_denominator =
+            CASE WHEN {SCALE_DENOMINATOR_SQL} >= 0.5 THEN CAST(round({SCALE_DENOMINATOR_SQL}) AS INTEGER) END
+        WHERE id = new.id;
+    END""",
+]
+
+FOOTPRINT_SIZE_INDEX = 'idx_areas_area_m2'
+FOOTPRINT_SIZE_COLUMNS = ('width', 'height', 'area_m2')
+
+# Footprint width, height and area in square meters (coordinates are UTM meters)
+FOOTPRINT_SIZE_SET = (
+    "width = abs(new.xmax - new.xmin), height = abs(new.ymax - new.ymin), "
+    "area_m2 = abs(new.xmax - new.xmin) * abs(new.ymax - new.ymin)"
+)
+
+FOOTPRINT_SIZE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS areas_footprint_size_insert AFTER INSERT ON areas
+    WHEN new.area_m2 IS NULL BEGIN
+        UPDATE areas SET {FOOTPRINT_SIZE_SET} WHERE id = new.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS areas_footprint_size_update AFTER UPDATE OF xmin, ymin, xmax, ymax ON areas BEGIN
+        UPDATE areas SET {FOOTPRINT_SIZE_SET} WHERE id = new.id;
+    END""",
+]
+
+PROJECT_DATE_INDEX = 'idx_projects_date_iso'
+
+# SQL version of parse_project_date() for "DD-MM-YY" dates of writers that don't set the column
+PROJECT_DATE_SQL = (
+    "CASE WHEN new.date GLOB '[0-9][0-9]-[0-9][0-9]-[0-9][0-9]' "
+    "THEN '20' || substr(new.date, 7, 2) || '-' || substr(new.date, 4, 2) || '-' || substr(new.date, 1, 2) END"
+)
+
+PROJECT_DATE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS projects_date_iso_insert AFTER INSERT ON projects
+    WHEN new.date_iso IS NULL BEGIN
+        UPDATE projects SET date_iso = {PROJECT_DATE_SQL} WHERE uuid = new.uuid;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS projects_date_iso_update AFTER UPDATE OF date ON projects BEGIN
+        UPDATE projects SET date_iso = {PROJECT_DATE_SQL} WHERE uuid = new.uuid;
+    END""",
+]
+
+# Secondary indexes on the columns every join and filter uses
+FILTER_INDEXES = {
+    # Joins of projects and areas, per-project area lookups and deletes
+    'idx_areas_project_id': 'areas (project_id)',
+    'idx_projects_user_name': 'projects (user_name)',
+    'idx_projects_paper_size': 'projects (paper_size)',
+    'idx_projects_file_location': 'projects (file_location)',
+}
+
+# NOCASE indexes for the case-insensitive prefix filters (see text_search.prefix_filter)
+PREFIX_INDEXES = {
+    f'idx_projects_{column}_nocase': f'projects ({column} COLLATE NOCASE)'
+    for column in ('uuid', 'project_name', 'user_name', 'date', 'file_location', 'paper_size')
+}
+
+# Comma separated distinct scales of a project's areas, in the order they were
+# added; NULL for projects without areas. Correlated on projects.uuid.
+ASSOCIATED_SCALES_SQL = (
+    "(SELECT group_concat(scale) FROM (SELECT scale FROM areas WHERE areas.project_id = projects.uuid "
+    "GROUP BY scale ORDER BY min(id)))"
+)
+
+ASSOCIATED_SCALES_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS areas_associated_scales_insert AFTER INSERT ON areas BEGIN
+        UPDATE projects SET associated_scales = {ASSOCIATED_SCALES_SQL} WHERE uuid = new.project_id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS areas_associated_scales_update AFTER UPDATE OF project_id, scale ON areas BEGIN
+        UPDATE projects SET associated_scales = {ASSOCIATED_SCALES_SQL} WHERE uuid IN (old.project_id, new.project_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS areas_associated_scales_delete AFTER DELETE ON areas BEGIN
+        UPDATE projects SET associated_scales = {ASSOCIATED_SCALES_SQL} WHERE uuid = old.project_id;
+    END""",
+]
+
+def table_columns(conn, table_name):
+    """Names of the columns of a table (empty if the table doesn't exist)"""
+    return [row[1] for row in conn.execute(text(f"PRAGMA table_info({table_name})"))]
+
+def ensure_scale_denominator(engine):
+    """
+    Add the integer areas.scale_denominator column with its B-tree index, fill
+    it for existing rows and install the triggers that fill it for new rows.
+
+    Returns:
+        bool: True if the column is available
+    """
+    try:
+        with engine.begin() as conn:
+            columns = table_columns(conn, 'areas')
+            if not columns:
+                return False
+            if 'scale_denominator' not in columns:
+                print("🔄 Adding areas.scale_denominator column...")
+                conn.execute(text("ALTER TABLE areas ADD COLUMN scale_denominator INTEGER"))
+
+            # Backfill rows the column doesn't cover yet (new column or rows written by older versions)
+            rows = conn.execute(text(
+                "SELECT id, scale FROM areas WHERE scale_denominator IS NULL AND scale IS NOT NULL"
+            )).fetchall()
+            updates = [{'id': area_id, 'denominator': parse_scale_denominator(scale)} for area_id, scale in rows]
+            updates = [u for u in updates if u['denominator'] is not None]
+            if updates:
+                conn.execute(text("UPDATE areas SET scale_denominator = :denominator WHERE id = :id"), updates)
+                print(f"✅ Parsed the scale denominator of {len(updates)} areas")
+
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {SCALE_DENOMINATOR_INDEX} ON areas (scale_denominator)"))
+            for statement in SCALE_DENOMINATOR_TRIGGERS:
+                conn.execute(text(statement))
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not add the scale denominator column: {e}")
+        return False
+
+def ensure_footprint_size(engine):
+    """
+    Add the width, height and area_m2 columns of the area footprints with an
+    index on area_m2, fill them for existing rows and install the triggers that
+    keep them current.
+
+    Returns:
+        bool: True if the columns are available
+    """
+    try:
+        with engine.begin() as conn:
+            columns = table_columns(conn, 'areas')
+            if not columns:
+                return False
+            for name in FOOTPRINT_SIZE_COLUMNS:
+                if name not in columns:
+                    print(f"🔄 Adding areas.{name} column...")
+                    conn.execute(text(f"ALTER TABLE areas ADD COLUMN {name} REAL"))
+
+            result = conn.execute(text(
+                f"UPDATE areas SET {FOOTPRINT_SIZE_SET.replace('new.', '')} WHERE area_m2 IS NULL"
+            ))
+            if result.rowcount:
+                print(f"✅ Computed the footprint size of {result.rowcount} areas")
+
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {FOOTPRINT_SIZE_INDEX} ON areas (area_m2)"))
+            for statement in FOOTPRINT_SIZE_TRIGGERS:
+                conn.execute(text(statement))
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not add the footprint size columns: {e}")
+        return False
+
+def ensure_project_date_iso(engine):
+    """
+    Add the ISO-8601 projects.date_iso column with its B-tree index, fill it for
+    existing rows and install the triggers that fill it for new rows.
+
+    Returns:
+        bool: True if the column is available
+    """
+    try:
+        with engine.begin() as conn:
+            columns = table_columns(conn, 'projects')
+            if not columns:
+                return False
+            if 'date_iso' not in columns:
+                print("🔄 Adding projects.date_iso column...")
+                conn.execute(text("ALTER TABLE projects ADD COLUMN date_iso TEXT"))
+
+            rows = conn.execute(text(
+                "SELECT uuid, date FROM projects WHERE date_iso IS NULL AND date IS NOT NULL"
+            )).fetchall()
+            updates = [{'uuid': uuid, 'date_iso': parse_project_date(value)} for uuid, value in rows]
+            updates = [u for u in updates if u['date_iso'] is not None]
+            if updates:
+                conn.execute(text("UPDATE projects SET date_iso = :date_iso WHERE uuid = :uuid"), updates)
+                print(f"✅ Converted the date of {len(updates)} projects to ISO-8601")
+
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {PROJECT_DATE_INDEX} ON projects (date_iso)"))
+            for statement in PROJECT_DATE_TRIGGERS:
+                conn.execute(text(statement))
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not add the ISO date column: {e}")
+        return False
+
+def ensure_filter_indexes(engine):
+    """
+    Create the secondary indexes of FILTER_INDEXES.
+
+    Returns:
+        bool: True if the indexes exist
+    """
+    try:
+        with engine.begin() as conn:
+            if not table_columns(conn, 'projects') or not table_columns(conn, 'areas'):
+                return False
+            for name, target in FILTER_INDEXES.items():
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not create the filter indexes: {e}")
+        return False
+
+def ensure_prefix_indexes(engine):
+    """
+    Create the NOCASE indexes of PREFIX_INDEXES.
+
+    Returns:
+        bool: True if the indexes exist
+    """
+    try:
+        with engine.begin() as conn:
+            if not table_columns(conn, 'projects'):
+                return False
+            for name, target in PREFIX_INDEXES.items():
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {target}"))
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not create the prefix filter indexes: {e}")
+        return False
+
+def ensure_associated_scales(engine):
+    """
+    Add the projects.associated_scales column (the distinct scales of the
+    project's areas), fill it for existing projects and install the triggers on
+    areas that keep it current, so project lists don't aggregate the areas.
+
+    Returns:
+        bool: True if the column is available
+    """
+    try:
+        with engine.begin() as conn:
+            columns = table_columns(conn, 'projects')
+            if not columns or not table_columns(conn, 'areas'):
+                return False
+            if 'associated_scales' not in columns:
+                print("🔄 Adding projects.associated_scales column...")
+                conn.execute(text("ALTER TABLE projects ADD COLUMN associated_scales TEXT"))
+
+            # Recomputed for every project: rows written before the triggers existed may be stale
+            result = conn.execute(text(f"UPDATE projects SET associated_scales = {ASSOCIATED_SCALES_SQL}"))
+            print(f"✅ Collected the scales of {result.rowcount} projects")
+            for statement in ASSOCIATED_SCALES_TRIGGERS:
+                conn.execute(text(statement))
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not add the associated scales column: {e}")
+        return False
+
+# (version, description, migration); append new migrations, never renumber
+MIGRATIONS = (
+    (1, 'Numeric scale denominator of the areas', ensure_scale_denominator),
+    (2, 'Footprint width, height and area of the areas', ensure_footprint_size),
+    (3, 'ISO-8601 project dates', ensure_project_date_iso),
+    (4, 'Indexes on the join and filter columns', ensure_filter_indexes),
+    (5, 'Case-insensitive indexes for the prefix filters', ensure_prefix_indexes),
+    (6, 'Materialized associated scales of the projects', ensure_associated_scales),
+    (7, 'Row counters for the listing totals', ensure_row_counters),
+    (8, 'Change counters for the tile and heatmap caches', ensure_change_counters),
+)
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(conn):
+    """The migration version a database is at (0 for databases never migrated)"""
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+def ensure_schema(engine, target=None):
+    """
+    Apply the pending migrations up to target (default: all of them).
+
+    A migration that can't run yet (e.g. the tables don't exist) stops the
+    upgrade; it is retried on the next call.
+
+    Returns:
+        int: the schema version of the database afterwards
+    """
+    with engine.connect() as conn:
+        version = schema_version(conn)
+    for number, description, migration in MIGRATIONS:
+        if number <= version:
+            continue
+        if target is not None and number > target:
+            break
+        if not migration(engine):
+            break
+        with engine.begin() as conn:
+            conn.execute(text(f"PRAGMA user_version = {number}"))
+        print(f"✅ Applied schema migration {number}: {description}")
+        version = number
+    return version
+
+def derived_area_values(areas_table, xmin, ymin, xmax, ymax, scale):
+    """
+    Values of the derived areas columns (scale denominator, footprint size)
+    for a new row, limited to the columns the table has.
+    """
+    width = abs(xmax - xmin)
+    height = abs(ymax - ymin)
+    values = {
+        'scale_denominator': parse_scale_denominator(scale),
+        'width': width,
+        'height': height,
+        'area_m2': width * height,
+    }
+    return {name: value for name, value in values.items() if name in areas_table.c}
+
+def derived_project_values(projects_table, data):
+    """
+    Values of the derived projects columns for a new project: date_iso from an
+    explicit ISO 'date_iso' field of the request, else parsed from 'date'.
+    """
+    if 'date_iso' not in projects_table.c:
+        return {}
+    return {'date_iso': parse_project_date(data.get('date_iso')) or parse_project_date(data.get('date'))}
+
+def main():
+    """Command line entry point: show or upgrade the schema version of a database"""
+    parser = argparse.ArgumentParser(description='Apply the schema migrations to an elements.db file.')
+    parser.add_argument('command', nargs='?', default='upgrade', choices=('status', 'upgrade'),
+                        help='status: list the migrations, upgrade: apply the pending ones (default)')
+    parser.add_argument('--database', default='elements.db', help='SQLite database file (default elements.db)')
+    parser.add_argument('--target', type=int, default=None, help='stop at this schema version')
+    args = parser.parse_args()
+
+    engine = create_sqlite_engine(args.database)
+    if args.command == 'upgrade':
+        ensure_schema(engine, target=args.target)
+
+    with engine.connect() as conn:
+        version = schema_version(conn)
+    print(f"📊 {args.database} is at schema version {version} of {LATEST_SCHEMA_VERSION}")
+    for number, description, _ in MIGRATIONS:
+        print(f"   {'✅' if number <= version else '⏳'} {number}: {description}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Declared tables of elements.db and the one-time database setup.
+
+Both apps use the tables declared here instead of reflecting the database, so
+starting a worker doesn't read the schema. Creating the tables, applying the
+migrations and building the indexes (R*Tree, full-text, trigram, duplicates)
+is done once per deployment, before the workers start:
+    python db_schema.py [--database elements.db] [--sample-data]
+
+The app factories only read which columns (live_tables()) and which optional
+indexes (database_features()) the database has. A database with pending
+migrations is served through the fallbacks of the query helpers; one without
+the tables is refused.
+"""
+
+import argparse
+
+from sqlalchemy import MetaData, Table, Column, String, Integer, Float, ForeignKey, func, select, text
+
+from db_engine import create_sqlite_engine
+from counters import COUNTERS_TABLE
+from db_migrations import ensure_schema, schema_version, table_columns, derived_area_values, derived_project_values, LATEST_SCHEMA_VERSION
+from spatial_index import ensure_areas_rtree, RTREE_TABLE
+from text_search import ensure_projects_fts, ensure_areas_trigram, FTS_TABLE, TRIGRAM_TABLE
+from duplicates import ensure_duplicates_table, DUPLICATES_TABLE
+
+def declare_tables(metadata, columns=None):
+    """
+    Declare the projects and areas tables on metadata: the schema at
+    LATEST_SCHEMA_VERSION, including the columns added by the migrations.
+
+    Args:
+        columns: {table name: column names} to leave out the columns a
+                 database doesn't have yet
+
+    Returns:
+        tuple: (projects_table, areas_table)
+    """
+    def table(name, *declared):
+        return Table(name, metadata, *[c for c in declared if columns is None or c.name in columns[name]])
+
+    projects = table('projects',
+        Column('uuid', String, primary_key=True),
+        Column('project_name', String, nullable=False),
+        Column('user_name', String, nullable=False),
+        Column('date', String, nullable=False),
+        Column('file_location', String, nullable=False),
+        Column('paper_size', String, nullable=False),
+        Column('description', String, nullable=True),
+        Column('date_iso', String, nullable=True),
+        Column('associated_scales', String, nullable=True)
+    )
+    areas = table('areas',
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('project_id', String, ForeignKey('projects.uuid'), nullable=False),
+        Column('xmin', Float, nullable=False),
+        Column('ymin', Float, nullable=False),
+        Column('xmax', Float, nullable=False),
+        Column('ymax', Float, nullable=False),
+        Column('scale', String, nullable=False),
+        Column('scale_denominator', Integer, nullable=True),
+        Column('width', Float, nullable=True),
+        Column('height', Float, nullable=True),
+        Column('area_m2', Float, nullable=True)
+    )
+    return projects, areas
+
+metadata = MetaData()
+projects_table, areas_table = declare_tables(metadata)
+
+SAMPLE_PROJECTS = [
+    {
+        'uuid': 'sample001',
+        'project_name': 'Sample Project 1',
+        'user_name': 'Test User',
+        'date': '01-01-24',
+        'file_location': 'sampleDataset/sample1',
+        'paper_size': 'A1',
+        'description': 'Sample project for testing'
+    },
+    {
+        'uuid': 'sample002',
+        'project_name': 'Sample Project 2',
+        'user_name': 'Test User',
+        'date': '02-01-24',
+        'file_location': 'sampleDataset/sample2',
+        'paper_size': 'A2',
+        'description': 'Another sample project'
+    }
+]
+
+SAMPLE_AREAS = [
+    {'project_id': 'sample001', 'xmin': 732387, 'ymin': 3595538, 'xmax': 740294, 'ymax': 3601127, 'scale': '1:1000'},
+    {'project_id': 'sample002', 'xmin': 741000, 'ymin': 3600000, 'xmax': 742000, 'ymax': 3602000, 'scale': '1:2000'}
+]
+
+def create_sample_data(engine):
+    """Add the sample projects and areas if the database has no projects"""
+    with engine.begin() as conn:
+        count = conn.execute(select(func.count()).select_from(projects_table)).scalar()
+        if count:
+            print(f"📊 Database contains {count} projects. Skipping sample data creation.")
+            return
+        print("📝 Database is empty. Creating sample data...")
+        for project in SAMPLE_PROJECTS:
+            conn.execute(projects_table.insert().values(**project, **derived_project_values(projects_table, project)))
+        for area in SAMPLE_AREAS:
+            conn.execute(areas_table.insert().values(**area, **derived_area_values(
+                areas_table, area['xmin'], area['ymin'], area['xmax'], area['ymax'], area['scale'])))
+    print("✅ Sample data created successfully!")
+
+def initialize_database(engine, sample_data=False):
+    """
+    Create the missing tables, apply the pending migrations and create or
+    refresh the optional indexes. Safe to run on every deployment.
+
+    Returns:
+        dict: see database_features()
+    """
+    metadata.create_all(engine)
+    ensure_schema(engine)
+    ensure_areas_rtree(engine)
+    ensure_duplicates_table(engine)
+    ensure_projects_fts(engine)
+    ensure_areas_trigram(engine)
+    if sample_data:
+        create_sample_data(engine)
+    return database_features(engine)
+
+def live_tables(engine):
+    """
+    The projects and areas tables as the database has them, from two PRAGMA
+    reads. On an up-to-date database these are the declared tables; on one
+    with pending migrations their columns are left out, and the query helpers
+    use their fallbacks (e.g. footprint_area_column() computes the footprint
+    size when areas.area_m2 doesn't exist yet).
+
+    Returns:
+        tuple: (projects_table, areas_table)
+
+    Raises:
+        RuntimeError: if the database has no projects or areas table
+    """
+    with engine.connect() as conn:
+        columns = {name: set(table_columns(conn, name)) for name in ('projects', 'areas')}
+    missing = [name for name, names in columns.items() if not names]
+    if missing:
+        raise RuntimeError(
+            f"The database has no {' or '.join(missing)} table. Set it up first: python db_schema.py")
+    if all(set(table.c.keys()) <= columns[table.name] for table in (projects_table, areas_table)):
+        return projects_table, areas_table
+    return declare_tables(MetaData(), columns)
+
+def database_features(engine):
+    """
+    Which optional indexes the database has, without creating or checking
+    anything. Searches scan the tables in place of the missing indexes.
+
+    Returns:
+        dict: 'rtree', 'fts', 'trigram', 'counters' and 'duplicates' (bool),
+              'schema_version' (int)
+    """
+    names = {RTREE_TABLE: 'rtree', FTS_TABLE: 'fts', TRIGRAM_TABLE: 'trigram', COUNTERS_TABLE: 'counters',
+             DUPLICATES_TABLE: 'duplicates'}
+    with engine.connect() as conn:
+        existing = set(conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+        features = {feature: name in existing for name, feature in names.items()}
+        features['schema_version'] = schema_version(conn)
+    if features['schema_version'] < LATEST_SCHEMA_VERSION:
+        print(f"⚠️  Database schema is at version {features['schema_version']} of {LATEST_SCHEMA_VERSION}, "
+              f"serving it without the newer columns and indexes. Run: python db_schema.py")
+    return features
+
+def main():
+    """Command line entry point: set up or upgrade a database"""
+    parser = argparse.ArgumentParser(description='Create or upgrade the tables and indexes of an elements.db file.')
+    parser.add_argument('--database', default='elements.db', help='SQLite database file (default elements.db)')
+    parser.add_argument('--sample-data', action='store_true', help='add two sample projects if the database is empty')
+    args = parser.parse_args()
+
+    engine = create_sqlite_engine(args.database)
+    features = initialize_database(engine, sample_data=args.sample_data)
+    print(f"✅ {args.database} is ready (schema version {features['schema_version']}, "
+          f"spatial index: {features['rtree']}, full-text index: {features['fts']}, "
+          f"substring index: {features['trigram']})")
+
+if __name__ == "__main__":
+    main()
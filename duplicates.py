@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate map frame detection.
+
+Re-exporting a layout from the ArcGIS toolbox creates map frames that are
+(nearly) identical to earlier exports, e.g. the projects יריחו, יריחו_2 and
+יריחו_3. This job finds every pair of frames whose intersection over union
+(IoU) reaches a threshold and stores them in the duplicate_candidates table,
+which the apps serve through /api/duplicates.
+
+The pairs come from one spatial self-join: each frame probes the areas R*Tree
+for the frames it touches, so the work grows with the number of overlapping
+pairs instead of with the square of the table size. Frames whose areas differ
+by more than the threshold allows are skipped before the IoU is computed.
+
+Usage:
+    python duplicates.py [--threshold 0.9] [--database elements.db]
+"""
+
+import argparse
+from datetime import datetime
+
+from sqlalchemy import (
+    MetaData, Table, Column, Integer, Float, String, and_, or_, func, literal, select, text
+)
+
+from db_engine import create_sqlite_engine
+from spatial_index import (
+    areas_rtree_table, rtree_condition, exact_bbox_condition, PREDICATE_INTERSECTS
+)
+
+DUPLICATES_TABLE = 'duplicate_candidates'
+DEFAULT_IOU_THRESHOLD = 0.9
+# Largest number of pairs returned by one /api/duplicates call
+MAX_DUPLICATES_LIMIT = 1000
+
+duplicates_metadata = MetaData()
+duplicates_table = Table(DUPLICATES_TABLE, duplicates_metadata,
+    Column('area_id', Integer, primary_key=True),
+    Column('other_area_id', Integer, primary_key=True),
+    Column('project_id', String, nullable=False),
+    Column('other_project_id', String, nullable=False),
+    Column('iou', Float, nullable=False),
+    Column('same_project', Integer, nullable=False),
+    Column('detected_at', String, nullable=False)
+)
+
+DUPLICATES_SCHEMA = [
+    f"""CREATE TABLE IF NOT EXISTS {DUPLICATES_TABLE} (
+        area_id INTEGER NOT NULL,
+        other_area_id INTEGER NOT NULL,
+        project_id TEXT NOT NULL,
+        other_project_id TEXT NOT NULL,
+        iou REAL NOT NULL,
+        same_project INTEGER NOT NULL,
+        detected_at TEXT NOT NULL,
+        PRIMARY KEY (area_id, other_area_id)
+    )""",
+    f"CREATE INDEX IF NOT EXISTS idx_{DUPLICATES_TABLE}_other_area ON {DUPLICATES_TABLE} (other_area_id)",
+    f"CREATE INDEX IF NOT EXISTS idx_{DUPLICATES_TABLE}_iou ON {DUPLICATES_TABLE} (iou)",
+    # Pairs of deleted frames disappear with them
+    f"""CREATE TRIGGER IF NOT EXISTS {DUPLICATES_TABLE}_delete AFTER DELETE ON areas BEGIN
+        DELETE FROM {DUPLICATES_TABLE} WHERE area_id = old.id OR other_area_id = old.id;
+    END""",
+]
+
+def ensure_duplicates_table(engine):
+    """Create the duplicate_candidates table if it doesn't exist"""
+    try:
+        with engine.begin() as conn:
+            for statement in DUPLICATES_SCHEMA:
+                conn.execute(text(statement))
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not create the {DUPLICATES_TABLE} table: {e}")
+        return False
+
+def parse_iou_threshold(value, default=DEFAULT_IOU_THRESHOLD):
+    """
+    Parse an IoU threshold (0 < threshold <= 1).
+
+    Returns:
+        tuple: (threshold, None) or (None, error message)
+    """
+    if value is None or str(value).strip() == '':
+        return default, None
+    try:
+        threshold = float(value)
+    except (TypeError, ValueError):
+        return None, 'The IoU threshold must be a number between 0 and 1.'
+    if not 0 < threshold <= 1:
+        return None, 'The IoU threshold must be a number between 0 and 1.'
+    return threshold, None
+
+def parse_duplicates_args(args):
+    """
+    Parse the query string of /api/duplicates.
+
+    Args:
+        args: request.args (min_iou, project_id, same_project=true|false, limit, offset)
+
+    Returns:
+        tuple: (options dict, None) or (None, error message)
+    """
+    min_iou, error = parse_iou_threshold(args.get('min_iou'), default=None)
+    if error is not None:
+        return None, error
+
+    same_project = args.get('same_project', '').strip().lower()
+    if same_project not in ('', 'true', 'false'):
+        return None, "'same_project' must be true or false"
+
+    try:
+        limit = int(args.get('limit', 100))
+        offset = int(args.get('offset', 0))
+    except ValueError:
+        return None, "'limit' and 'offset' must be integers"
+    if not 1 <= limit <= MAX_DUPLICATES_LIMIT:
+        return None, f"'limit' must be between 1 and {MAX_DUPLICATES_LIMIT}"
+    if offset < 0:
+        return None, "'offset' must not be negative"
+
+    return {
+        'min_iou': min_iou,
+        'project_id': args.get('project_id', '').strip(),
+        'same_project': None if not same_project else same_project == 'true',
+        'limit': limit,
+        'offset': offset,
+    }, None
+
+def duplicate_pairs_select(areas_table, threshold, use_index=True):
+    """
+    Select (area_id, other_area_id, project_id, other_project_id, iou,
+    same_project) for every pair of frames with IoU >= threshold, each pair once
+    (area_id < other_area_id).
+    """
+    a = areas_table.alias('a')
+    b = areas_table.alias('b')
+
+    def footprint(t):
+        return func.abs(t.c.xmax - t.c.xmin) * func.abs(t.c.ymax - t.c.ymin)
+
+    overlap_width = func.min(a.c.xmax, b.c.xmax) - func.max(a.c.xmin, b.c.xmin)
+    overlap_height = func.min(a.c.ymax, b.c.ymax) - func.max(a.c.ymin, b.c.ymin)
+    intersection = overlap_width * overlap_height
+    union = footprint(a) + footprint(b) - intersection
+    iou = (intersection / union).label('iou')
+
+    pair = and_(
+        b.c.id > a.c.id,
+        exact_bbox_condition((b.c.xmin, b.c.ymin, b.c.xmax, b.c.ymax), PREDICATE_INTERSECTS,
+                             a.c.xmin, a.c.ymin, a.c.xmax, a.c.ymax),
+        overlap_width > 0, overlap_height > 0,
+        # IoU <= smaller area / larger area, so frames of very different size can't match
+        footprint(b) >= footprint(a) * threshold,
+        footprint(a) >= footprint(b) * threshold,
+    )
+    if use_index:
+        # Per frame R*Tree probe for the frames it touches, then primary key lookups
+        joined = a.join(areas_rtree_table, and_(
+            areas_rtree_table.c.id > a.c.id,
+            rtree_condition(PREDICATE_INTERSECTS, a.c.xmin, a.c.ymin, a.c.xmax, a.c.ymax)
+        )).join(b, and_(b.c.id == areas_rtree_table.c.id, pair))
+    else:
+        joined = a.join(b, pair)
+
+    return select(
+        a.c.id.label('area_id'), b.c.id.label('other_area_id'),
+        a.c.project_id.label('project_id'), b.c.project_id.label('other_project_id'),
+        iou, (a.c.project_id == b.c.project_id).label('same_project')
+    ).select_from(joined).where(iou >= threshold)
+
+def refresh_duplicate_candidates(engine, areas_table, threshold=DEFAULT_IOU_THRESHOLD, use_index=True):
+    """
+    Recompute the duplicate_candidates table.
+
+    Returns:
+        int: number of candidate pairs found
+    """
+    pairs = duplicate_pairs_select(areas_table, threshold, use_index=use_index).subquery('pairs')
+    detected_at = datetime.now().isoformat(timespec='seconds')
+    with engine.begin() as conn:
+        conn.execute(duplicates_table.delete())
+        conn.execute(duplicates_table.insert().from_select(
+            ['area_id', 'other_area_id', 'project_id', 'other_project_id', 'iou', 'same_project', 'detected_at'],
+            select(pairs.c.area_id, pairs.c.other_area_id, pairs.c.project_id, pairs.c.other_project_id,
+                   pairs.c.iou, pairs.c.same_project, literal(detected_at))
+        ))
+        return conn.execute(select(func.count()).select_from(duplicates_table)).scalar()
+
+def list_duplicate_candidates(conn, projects_table, min_iou=None, project_id=None,
+                              same_project=None, limit=100, offset=0):
+    """
+    Return the stored candidate pairs with the project names of both frames,
+    highest IoU first.
+
+    Args:
+        min_iou: only pairs at or above this IoU
+        project_id: only pairs involving this project
+        same_project: True/False to only return pairs within / across projects
+    """
+    p = projects_table.alias('p')
+    q = projects_table.alias('q')
+    d = duplicates_table.c
+    conditions = []
+    if min_iou is not None:
+        conditions.append(d.iou >= min_iou)
+    if project_id:
+        conditions.append(or_(d.project_id == project_id, d.other_project_id == project_id))
+    if same_project is not None:
+        conditions.append(d.same_project == (1 if same_project else 0))
+
+    stmt = select(
+        d.area_id, d.other_area_id, d.iou, d.same_project, d.detected_at,
+        d.project_id, p.c.project_name.label('project_name'),
+        d.other_project_id, q.c.project_name.label('other_project_name')
+    ).select_from(
+        duplicates_table
+        .join(p, p.c.uuid == d.project_id, isouter=True)
+        .join(q, q.c.uuid == d.other_project_id, isouter=True)
+    )
+    if conditions:
+        stmt = stmt.where(and_(*conditions))
+    stmt = stmt.order_by(d.iou.desc(), d.area_id, d.other_area_id).limit(limit).offset(offset)
+
+    pairs = []
+    for row in conn.execute(stmt):
+        pair = dict(row._mapping)
+        pair['same_project'] = bool(pair['same_project'])
+        pairs.append(pair)
+    return pairs
+
+def main():
+    """Command line entry point: recompute the duplicate candidates of a database"""
+    parser = argparse.ArgumentParser(description='Find near-duplicate map frames (IoU above a threshold).')
+    parser.add_argument('--threshold', default=str(DEFAULT_IOU_THRESHOLD),
+                        help=f'minimum intersection over union, 0-1 (default {DEFAULT_IOU_THRESHOLD})')
+    parser.add_argument('--database', default='elements.db', help='SQLite database file (default elements.db)')
+    args = parser.parse_args()
+
+    threshold, error = parse_iou_threshold(args.threshold)
+    if error is not None:
+        parser.error(error)
+
+    # db_schema imports this module; like the apps, the job only runs on a
+    # database set up by `python db_schema.py`
+    from db_schema import live_tables, database_features
+
+    engine = create_sqlite_engine(args.database)
+    try:
+        _, areas_table = live_tables(engine)
+    except RuntimeError as e:
+        parser.error(str(e))
+    features = database_features(engine)
+    if not features['duplicates']:
+        parser.error(f"The {DUPLICATES_TABLE} table does not exist. Set it up first: python db_schema.py")
+
+    print(f"🔍 Searching for map frames with IoU >= {threshold}...")
+    count = refresh_duplicate_candidates(engine, areas_table, threshold, use_index=features['rtree'])
+    print(f"✅ Found {count} near-duplicate pairs, stored in {DUPLICATES_TABLE}")
+
+if __name__ == "__main__":
+    main()
@@ -45,7 +45,7 @@ class ArcSpatialDBClient {
                 method: 'POST',
                 body: JSON.stringify(searchData)
             });
-            this.displaySearchResults(data.results);
+            this.displaySearchResults(data.results, data.coverage);
         } catch (error) {
             this.showError('Search failed: ' + error.message);
             this.displaySearchResults([]);
@@ -226,7 +226,7 @@ class ArcSpatialDBClient {
         this.displaySearchResults([]);
     }
 
-    displaySearchResults(results) {
+    displaySearchResults(results, coverage = null) {
         const container = document.getElementById('search-results');
         
         if (!results || results.length === 0) {
@@ -234,8 +234,14 @@ class ArcSpatialDBClient {
             return;
         }
 
+        let coverageHtml = '';
+        if (coverage && coverage.covered_fraction !== null) {
+            coverageHtml = `<p class="coverage-summary">Matching map frames cover ${(coverage.covered_fraction * 100).toFixed(1)}% of the search box (${Math.round(coverage.covered_area)} of ${Math.round(coverage.query_area)} m²).</p>`;
+        }
+
         let html = `
             <h3>Project Results:</h3>
+            ${coverageHtml}
             <div class="table-container">
                 <table border="1" cellpadding="5">
                     <tr>
@@ -0,0 +1,121 @@
+"""
+Intersection range filter for search results.
+
+A project passes the filter when at least one of its areas intersects the query
+box by a percentage (intersection area / query box area * 100) inside the
+requested range. The filter can run in two ways:
+
+- inside SQLite: the clipped rectangle is computed with scalar MIN/MAX
+  expressions and the percentage is compared in the WHERE clause, so only
+  qualifying projects ever leave the database;
+- in Python: all candidate areas are fetched with a single query and the
+  percentages are computed for every row at once, then reduced per project.
+"""
+
+from sqlalchemy import select, and_, func, false, bindparam
+
+from packed_index import NUMPY_AVAILABLE
+if NUMPY_AVAILABLE:
+    import numpy as np
+
+def intersection_percentage_condition(areas_table, xmin, ymin, xmax, ymax, range_from, range_to):
+    """
+    SQL condition on an areas row: the area intersects the query box and the
+    intersection covers between range_from and range_to percent of the box.
+    """
+    # Clipped rectangle (SQLite's multi-argument min/max are scalar functions)
+    width = func.min(areas_table.c.xmax, xmax) - func.max(areas_table.c.xmin, xmin)
+    height = func.min(areas_table.c.ymax, ymax) - func.max(areas_table.c.ymin, ymin)
+    query_area = float((xmax - xmin) * (ymax - ymin))
+    if query_area <= 0:
+        return false()
+    # Same operation order as the Python filter so both agree at the range bounds
+    percentage = (width * height) / query_area * 100.0
+    return and_(
+        # Strict overlap (touching areas have no intersection)
+        areas_table.c.xmin < xmax,
+        areas_table.c.xmax > xmin,
+        areas_table.c.ymin < ymax,
+        areas_table.c.ymax > ymin,
+        percentage >= range_from,
+        percentage <= range_to
+    )
+
+def intersection_range_filter(projects_table, areas_table, xmin, ymin, xmax, ymax, range_from, range_to):
+    """
+    Project level filter: the project has at least one area whose intersection
+    percentage with the query box is within [range_from, range_to].
+    Runs as a semi-join, so grouped queries (associated_scales) are unaffected.
+    """
+    qualifying_projects = select(areas_table.c.project_id).where(
+        intersection_percentage_condition(areas_table, xmin, ymin, xmax, ymax, range_from, range_to)
+    )
+    return projects_table.c.uuid.in_(qualifying_projects)
+
+def intersection_percentages(area_bounds, xmin, ymin, xmax, ymax):
+    """
+    Vectorized intersection percentage of many areas with one query box.
+
+    Args:
+        area_bounds: (n, 4) array of xmin, ymin, xmax, ymax
+        xmin, ymin, xmax, ymax: query box
+
+    Returns:
+        numpy array of percentages of the query box covered by each area
+        (0 for areas that don't intersect it)
+    """
+    width = np.minimum(area_bounds[:, 2], xmax) - np.maximum(area_bounds[:, 0], xmin)
+    height = np.minimum(area_bounds[:, 3], ymax) - np.maximum(area_bounds[:, 1], ymin)
+    query_area = (xmax - xmin) * (ymax - ymin)
+    if query_area <= 0:
+        return np.zeros(len(area_bounds))
+    overlaps = (width > 0) & (height > 0)
+    return np.where(overlaps, width * height, 0.0) / query_area * 100.0
+
+def projects_in_intersection_range(conn, areas_table, project_uuids, xmin, ymin, xmax, ymax, range_from, range_to):
+    """
+    Return the subset of project_uuids having an area whose intersection
+    percentage with the query box lies within [range_from, range_to].
+    """
+    if not project_uuids:
+        return set()
+
+    # Only areas that actually intersect the box can qualify
+    stmt = select(
+        areas_table.c.project_id,
+        areas_table.c.xmin,
+        areas_table.c.ymin,
+        areas_table.c.xmax,
+        areas_table.c.ymax
+    ).where(and_(
+        areas_table.c.project_id.in_(bindparam(None, list(project_uuids), expanding=True, literal_execute=True)),
+        areas_table.c.xmin < xmax,
+        areas_table.c.xmax > xmin,
+        areas_table.c.ymin < ymax,
+        areas_table.c.ymax > ymin
+    ))
+    rows = conn.execute(stmt).fetchall()
+    if not rows:
+        return set()
+
+    if not NUMPY_AVAILABLE:
+        required_area = (xmax - xmin) * (ymax - ymin)
+        matching = set()
+        for project_id, axmin, aymin, axmax, aymax in rows:
+            width = min(axmax, xmax) - max(axmin, xmin)
+            height = min(aymax, ymax) - max(aymin, ymin)
+            if width > 0 and height > 0 and required_area > 0:
+                if range_from <= width * height / required_area * 100 <= range_to:
+                    matching.add(project_id)
+        return matching
+
+    project_ids = np.array([row[0] for row in rows], dtype=object)
+    area_bounds = np.array([row[1:] for row in rows], dtype=np.float64)
+    percentages = intersection_percentages(area_bounds, xmin, ymin, xmax, ymax)
+    in_range = (percentages > 0) & (percentages >= range_from) & (percentages <= range_to)
+
+    # Group by project: a project qualifies if any of its areas is in range
+    uniques, inverse = np.unique(project_ids, return_inverse=True)
+    qualifies = np.zeros(len(uniques), dtype=bool)
+    np.logical_or.at(qualifies, inverse, in_range)
+    return set(uniques[qualifies].tolist())
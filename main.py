@@ -1,5 +1,12 @@
 # main.py
-from app import app
+# gunicorn main:app - set up the database once before starting the workers: python db_schema.py
+from app import create_app, setup_database
+
+if __name__ == '__main__':
+    # Running as a single process: set up the database first
+    setup_database()
+
+app = create_app()
 
 if __name__ == '__main__':
     try:
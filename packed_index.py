@@ -0,0 +1,411 @@
+"""
+In-process packed bounding-box index over the areas table.
+
+The areas rectangles are loaded once per worker into NumPy arrays and packed
+into a static R-tree using Sort-Tile-Recursive (STR) bulk loading. Box queries
+are then answered entirely in memory, which matters when elements.db sits on a
+slow network share.
+
+The tree is partitioned by scale band (see scale_utils.SCALE_BANDS): every band
+gets its own packed tree, so a search restricted to one band never visits the
+frames of the others.
+
+Writes made by this worker are applied incrementally (new rows go to a small
+unpacked buffer, deleted rows are masked out) and the tree is repacked once
+enough changes have accumulated. Writes made by other workers are detected with
+a cheap consistency check against the areas row count and max id.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+
+from sqlalchemy import text
+
+from scale_utils import scale_band_code, UNKNOWN_SCALE_BAND
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    print("⚠️  numpy not available. In-memory spatial index will be disabled.")
+    print("   Install with: pip install numpy")
+
+# Number of children per tree node
+NODE_SIZE = 16
+# Repack once this many rows were added since the last pack...
+MAX_PENDING = 512
+# ...or once this fraction of the packed rows has been deleted
+MAX_DELETED_FRACTION = 0.25
+# Seconds between consistency checks against the areas table
+STALE_CHECK_INTERVAL = 5.0
+
+def _expand_ranges(starts, ends):
+    """Concatenate np.arange(s, e) for every (s, e) pair without a Python loop"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.repeat(starts - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return offsets + np.arange(total)
+
+def _str_order(cx, cy, node_size):
+    """Return the Sort-Tile-Recursive ordering of items with centers (cx, cy)"""
+    n = len(cx)
+    if n <= node_size:
+        return np.argsort(cx, kind='stable')
+    node_count = math.ceil(n / node_size)
+    slice_count = math.ceil(math.sqrt(node_count))
+    slice_len = slice_count * node_size
+
+    by_x = np.argsort(cx, kind='stable')
+    order = np.empty(n, dtype=np.int64)
+    for start in range(0, n, slice_len):
+        vertical_slice = by_x[start:start + slice_len]
+        order[start:start + len(vertical_slice)] = vertical_slice[np.argsort(cy[vertical_slice], kind='stable')]
+    return order
+
+class PackedAreaIndex:
+    """
+    Static STR-packed R-trees over the areas table (one per scale band) with
+    incremental updates.
+
+    The rows of all bands share flat arrays, each band in a contiguous range.
+    Each tree level is stored as flat arrays (bounds plus the [start, end) range
+    of its children in the level below), so a query is a handful of vectorized
+    passes, one per level, instead of a per-node Python traversal.
+    """
+
+    def __init__(self, engine, node_size=NODE_SIZE, check_interval=STALE_CHECK_INTERVAL):
+        self.engine = engine
+        self.node_size = node_size
+        self.check_interval = check_interval
+        self.enabled = NUMPY_AVAILABLE
+        self.loaded = False
+        self._lock = threading.RLock()
+        self._last_check = 0.0
+        self._reset()
+
+    def _reset(self):
+        self._ids = np.empty(0, dtype=np.int64) if NUMPY_AVAILABLE else None
+        self._bounds = np.empty((0, 4)) if NUMPY_AVAILABLE else None
+        self._alive = np.empty(0, dtype=bool) if NUMPY_AVAILABLE else None
+        self._bands = np.empty(0, dtype=np.int8) if NUMPY_AVAILABLE else None
+        self._sorted_ids = self._ids
+        self._sorted_pos = self._ids
+        # (band, start, end, levels) per scale band present in the rows
+        self._partitions = []
+        # id -> ((xmin, ymin, xmax, ymax), band) of rows added since the last pack
+        self._pending = {}
+        self._deleted = 0
+        self.count = 0
+        self.max_id = None
+
+    # ------------------------------------------------------------------
+    # Loading and packing
+    # ------------------------------------------------------------------
+
+    def reload(self):
+        """Load all areas from the database and pack fresh trees"""
+        if not self.enabled:
+            return
+        with self.engine.connect() as conn:
+            rows = conn.execute(text("SELECT id, xmin, ymin, xmax, ymax, scale FROM areas")).fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        bounds = np.array([row[1:5] for row in rows], dtype=np.float64).reshape(-1, 4)
+        bands = np.array([scale_band_code(row[5]) for row in rows], dtype=np.int8)
+        with self._lock:
+            self._pack(ids, bounds, bands)
+            self.loaded = True
+            self._last_check = time.monotonic()
+        print(f"🗺️  In-memory spatial index loaded: {len(ids)} areas")
+
+    def _pack(self, ids, bounds, bands=None):
+        """Bulk load the given rows into new STR-packed trees, one per scale band"""
+        self._reset()
+        if bands is None:
+            bands = np.full(len(ids), UNKNOWN_SCALE_BAND, dtype=np.int8)
+        partitions = []
+        if len(ids):
+            # Normalize swapped corners so the tree bounds are always valid
+            bounds = np.column_stack((
+                np.minimum(bounds[:, 0], bounds[:, 2]), np.minimum(bounds[:, 1], bounds[:, 3]),
+                np.maximum(bounds[:, 0], bounds[:, 2]), np.maximum(bounds[:, 1], bounds[:, 3])
+            ))
+            # Group the rows by band, STR order within each band
+            order = []
+            start = 0
+            for band in np.unique(bands).tolist():
+                rows = np.flatnonzero(bands == band)
+                rows = rows[_str_order((bounds[rows, 0] + bounds[rows, 2]) / 2,
+                                       (bounds[rows, 1] + bounds[rows, 3]) / 2, self.node_size)]
+                order.append(rows)
+                partitions.append((band, start, start + len(rows)))
+                start += len(rows)
+            order = np.concatenate(order)
+            ids = ids[order]
+            bounds = bounds[order]
+            bands = bands[order]
+        self._ids = ids
+        self._bounds = bounds
+        self._bands = bands
+        self._alive = np.ones(len(ids), dtype=bool)
+        self._sorted_pos = np.argsort(ids, kind='stable')
+        self._sorted_ids = ids[self._sorted_pos]
+        self._partitions = [(band, start, end, self._build_levels(bounds[start:end]))
+                            for band, start, end in partitions]
+        self.count = len(ids)
+        self.max_id = int(ids.max()) if len(ids) else None
+
+    def _build_levels(self, bounds):
+        """Build the internal levels of one tree bottom-up; levels[0] is the root"""
+        levels = []
+        child_bounds = bounds
+        while len(child_bounds):
+            n = len(child_bounds)
+            starts = np.arange(0, n, self.node_size, dtype=np.int64)
+            ends = np.minimum(starts + self.node_size, n)
+            node_bounds = np.column_stack((
+                np.minimum.reduceat(child_bounds[:, 0], starts),
+                np.minimum.reduceat(child_bounds[:, 1], starts),
+                np.maximum.reduceat(child_bounds[:, 2], starts),
+                np.maximum.reduceat(child_bounds[:, 3], starts)
+            ))
+            if len(node_bounds) > 1:
+                # STR-order this level before it is grouped into its parents;
+                # every node keeps its own child range, so the level below is untouched
+                order = _str_order((node_bounds[:, 0] + node_bounds[:, 2]) / 2,
+                                   (node_bounds[:, 1] + node_bounds[:, 3]) / 2, self.node_size)
+                node_bounds, starts, ends = node_bounds[order], starts[order], ends[order]
+            levels.insert(0, (node_bounds, starts, ends))
+            if len(node_bounds) == 1:
+                break
+            child_bounds = node_bounds
+        return levels
+
+    # ------------------------------------------------------------------
+    # Incremental updates
+    # ------------------------------------------------------------------
+
+    def add_areas(self, rows):
+        """
+        Add newly inserted areas.
+
+        Args:
+            rows: iterable of (id, xmin, ymin, xmax, ymax, scale)
+        """
+        if not self.loaded:
+            return
+        with self._lock:
+            for area_id, xmin, ymin, xmax, ymax, scale in rows:
+                self._pending[int(area_id)] = (
+                    (min(xmin, xmax), min(ymin, ymax), max(xmin, xmax), max(ymin, ymax)),
+                    scale_band_code(scale)
+                )
+                self.count += 1
+                self.max_id = int(area_id) if self.max_id is None else max(self.max_id, int(area_id))
+            if len(self._pending) > MAX_PENDING:
+                self._repack()
+
+    def remove_areas(self, area_ids):
+        """Remove deleted areas by id"""
+        if not self.loaded:
+            return
+        with self._lock:
+            for area_id in area_ids:
+                area_id = int(area_id)
+                if self._pending.pop(area_id, None) is not None:
+                    self.count -= 1
+                    continue
+                i = np.searchsorted(self._sorted_ids, area_id)
+                if i < len(self._sorted_ids) and self._sorted_ids[i] == area_id:
+                    pos = self._sorted_pos[i]
+                    if self._alive[pos]:
+                        self._alive[pos] = False
+                        self._deleted += 1
+                        self.count -= 1
+            if self._deleted > MAX_DELETED_FRACTION * max(len(self._ids), 1):
+                self._repack()
+            elif self.max_id is not None and self.max_id in {int(i) for i in area_ids}:
+                # Deleting the highest id lowers max(id) of the table as well
+                self.max_id = self._current_max_id()
+
+    def _current_max_id(self):
+        alive_ids = self._ids[self._alive]
+        candidates = [int(alive_ids.max())] if len(alive_ids) else []
+        candidates.extend(self._pending.keys())
+        return max(candidates) if candidates else None
+
+    def _repack(self):
+        """Repack the tree from the in-memory rows (no database access)"""
+        ids = self._ids[self._alive]
+        bounds = self._bounds[self._alive]
+        bands = self._bands[self._alive]
+        if self._pending:
+            ids = np.concatenate((ids, np.fromiter(self._pending.keys(), dtype=np.int64)))
+            bounds = np.vstack((bounds, np.array([b for b, _ in self._pending.values()], dtype=np.float64)))
+            bands = np.concatenate((bands, np.array([band for _, band in self._pending.values()], dtype=np.int8)))
+        self._pack(ids, bounds, bands)
+
+    # ------------------------------------------------------------------
+    # Consistency check
+    # ------------------------------------------------------------------
+
+    def is_stale(self):
+        """Compare the index against the areas row count and max id"""
+        with self.engine.connect() as conn:
+            table_count, table_max_id = conn.execute(text("SELECT count(*), max(id) FROM areas")).first()
+        return table_count != self.count or table_max_id != self.max_id
+
+    def ensure_fresh(self):
+        """
+        Load the index on first use and reload it when another worker changed the
+        areas table. The consistency check runs at most every check_interval seconds.
+
+        Returns:
+            bool: True if the index can answer queries
+        """
+        if not self.enabled:
+            return False
+        try:
+            if not self.loaded:
+                self.reload()
+            elif time.monotonic() - self._last_check >= self.check_interval:
+                self._last_check = time.monotonic()
+                if self.is_stale():
+                    print("🔄 In-memory spatial index is stale, reloading...")
+                    self.reload()
+            return True
+        except Exception as e:
+            print(f"⚠️  In-memory spatial index unavailable: {e}")
+            return False
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _partitions_for(self, band):
+        """Partitions to search: all of them, or only the one of the band"""
+        return [p for p in self._partitions if band is None or p[0] == band]
+
+    def _pending_rows(self, band):
+        """ids and bounds of the rows added since the last pack (optionally of one band)"""
+        items = [(area_id, b) for area_id, (b, row_band) in self._pending.items() if band is None or row_band == band]
+        ids = np.fromiter((area_id for area_id, _ in items), dtype=np.int64, count=len(items))
+        bounds = np.array([b for _, b in items], dtype=np.float64).reshape(-1, 4)
+        return ids, bounds
+
+    def _candidates(self, xmin, ymin, xmax, ymax, contains=False, band=None):
+        """
+        Return the packed positions of leaves whose node may hold a match.
+        Nodes must intersect the box; with contains they must cover it.
+        """
+        found = []
+        for _, start, _, levels in self._partitions_for(band):
+            nodes = None
+            for node_bounds, starts, ends in levels:
+                if nodes is None:
+                    nodes = np.arange(len(node_bounds))
+                b = node_bounds[nodes]
+                if contains:
+                    hit = nodes[(b[:, 0] <= xmin) & (b[:, 2] >= xmax) & (b[:, 1] <= ymin) & (b[:, 3] >= ymax)]
+                else:
+                    hit = nodes[(b[:, 0] <= xmax) & (b[:, 2] >= xmin) & (b[:, 1] <= ymax) & (b[:, 3] >= ymin)]
+                nodes = _expand_ranges(starts[hit], ends[hit])
+            if nodes is not None:
+                found.append(nodes + start)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        positions = np.concatenate(found)
+        return positions[self._alive[positions]]
+
+    @staticmethod
+    def _matches(b, predicate, xmin, ymin, xmax, ymax):
+        """Exact predicate test for an (n, 4) bounds array"""
+        if predicate == 'intersects':
+            return (b[:, 0] <= xmax) & (b[:, 2] >= xmin) & (b[:, 1] <= ymax) & (b[:, 3] >= ymin)
+        if predicate == 'contains':
+            return (b[:, 0] <= xmin) & (b[:, 2] >= xmax) & (b[:, 1] <= ymin) & (b[:, 3] >= ymax)
+        return (b[:, 0] >= xmin) & (b[:, 2] <= xmax) & (b[:, 1] >= ymin) & (b[:, 3] <= ymax)
+
+    def search(self, predicate, xmin, ymin, xmax, ymax, band=None):
+        """
+        Return the ids of areas matching a spatial predicate with the query box.
+
+        Args:
+            predicate: 'inside', 'intersects' or 'contains' (see spatial_index)
+            band: scale band code (see scale_utils) to search only that partition
+
+        Returns:
+            numpy array of area ids
+        """
+        with self._lock:
+            positions = self._candidates(xmin, ymin, xmax, ymax, contains=(predicate == 'contains'), band=band)
+            match = self._matches(self._bounds[positions], predicate, xmin, ymin, xmax, ymax)
+            result = self._ids[positions[match]]
+            if self._pending:
+                pending_ids, pending_bounds = self._pending_rows(band)
+                pending_match = self._matches(pending_bounds, predicate, xmin, ymin, xmax, ymax)
+                result = np.concatenate((result, pending_ids[pending_match]))
+            return result
+
+    def search_inside(self, xmin, ymin, xmax, ymax, band=None):
+        """Return the ids of areas fully inside the query box"""
+        return self.search('inside', xmin, ymin, xmax, ymax, band)
+
+    def iter_nearest(self, x, y, band=None):
+        """
+        Yield (distance, id) for all areas (optionally of one scale band) in
+        increasing distance from the point (x, y) by best-first traversal of the
+        trees. The distance to a rectangle is 0 when the point lies inside it.
+
+        Only the nodes needed so far are expanded, so taking the first few items
+        touches a handful of nodes. The generator works on a snapshot of the trees;
+        areas deleted meanwhile are skipped.
+        """
+        with self._lock:
+            partitions = self._partitions_for(band)
+            ids = self._ids
+            bounds = self._bounds
+            alive = self._alive
+            pending_ids, pending_bounds = self._pending_rows(band)
+
+        def squared_distances(b):
+            dx = np.maximum(np.maximum(b[:, 0] - x, x - b[:, 2]), 0.0)
+            dy = np.maximum(np.maximum(b[:, 1] - y, y - b[:, 3]), 0.0)
+            return dx * dx + dy * dy
+
+        # Heap entries are (squared distance, level, index, partition); level -1
+        # marks a pending row and -2 a packed leaf row (index is its position)
+        heap = []
+        for p, (_, _, _, levels) in enumerate(partitions):
+            root_bounds = levels[0][0]
+            heap.extend((float(d), 0, i, p) for i, d in enumerate(squared_distances(root_bounds)))
+        heap.extend((float(d), -1, i, -1) for i, d in enumerate(squared_distances(pending_bounds)))
+        heapq.heapify(heap)
+
+        while heap:
+            d, level, i, p = heapq.heappop(heap)
+            if level == -1:
+                yield math.sqrt(d), int(pending_ids[i])
+            elif level == -2:
+                if alive[i]:
+                    yield math.sqrt(d), int(ids[i])
+            else:
+                _, start, _, levels = partitions[p]
+                _, starts, ends = levels[level]
+                children = np.arange(starts[i], ends[i])
+                if level + 1 < len(levels):
+                    for cd, child in zip(squared_distances(levels[level + 1][0][children]).tolist(), children.tolist()):
+                        heapq.heappush(heap, (cd, level + 1, child, p))
+                else:
+                    positions = children + start
+                    for cd, position in zip(squared_distances(bounds[positions]).tolist(), positions.tolist()):
+                        heapq.heappush(heap, (cd, -2, position, p))
+
+    def nearest(self, x, y, k, band=None):
+        """Return up to k (distance, id) pairs of the areas closest to the point (x, y)"""
+        return list(itertools.islice(self.iter_nearest(x, y, band), k))
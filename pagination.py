@@ -0,0 +1,85 @@
+"""
+Keyset (cursor) pagination for the project and area listings.
+
+LIMIT/OFFSET makes SQLite step over every row before the page, so walking the
+whole catalog page by page is quadratic, and page mode needs a COUNT of all
+matching rows on every call. In cursor mode the listing is ordered by a unique
+sort key and each page starts right after the key of the previous page's last
+row (WHERE key > last key), an index range scan of per_page rows no matter how
+deep the page is. No COUNT is run; the response carries the opaque token of
+the next page instead.
+
+The token is the URL-safe base64 of the last row's key values and the sort
+order, so a token can't be reused with a different sort.
+"""
+
+import base64
+import binascii
+import json
+
+from sqlalchemy import and_, or_
+
+def encode_cursor(sort, values):
+    """Opaque 'after' token for the row with the given key values"""
+    payload = json.dumps({'s': sort, 'k': list(values)}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, sort, key_count):
+    """
+    Decode an 'after' token of a listing sorted by sort.
+
+    Returns:
+        tuple: (key values or None for the first page, None) or (None, error message)
+    """
+    token = (token or '').strip()
+    if not token:
+        return None, None
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode('utf-8'))
+        values = payload['k']
+        token_sort = payload['s']
+    except (binascii.Error, ValueError, UnicodeDecodeError, KeyError, TypeError):
+        return None, "Invalid 'after' cursor"
+    if token_sort != sort or not isinstance(values, list) or len(values) != key_count:
+        return None, "The 'after' cursor belongs to a different sort order"
+    return values, None
+
+def keyset_condition(keys, values):
+    """
+    SQL condition: the row comes after the given key values.
+
+    Args:
+        keys: [(label, column, descending)], the last key unique
+        values: key values of the last row of the previous page
+    """
+    alternatives = []
+    for i, (_, column, descending) in enumerate(keys):
+        equal = [keys[j][1] == values[j] for j in range(i)]
+        after = column < values[i] if descending else column > values[i]
+        alternatives.append(and_(*equal, after))
+    return or_(*alternatives)
+
+def keyset_order(keys):
+    """ORDER BY clauses of the sort key"""
+    return [column.desc() if descending else column for _, column, descending in keys]
+
+def fetch_keyset_page(conn, stmt, keys, sort, after_values, per_page):
+    """
+    Run one page of a listing in cursor mode.
+
+    Args:
+        stmt: the listing select, without ORDER BY / LIMIT; it has to select
+              every key column under its label
+        keys: see keyset_condition()
+
+    Returns:
+        tuple: (rows, token of the next page or None on the last page)
+    """
+    if after_values is not None:
+        stmt = stmt.where(keyset_condition(keys, after_values))
+    rows = conn.execute(stmt.order_by(*keyset_order(keys)).limit(per_page + 1)).fetchall()
+    if len(rows) <= per_page:
+        return rows, None
+    rows = rows[:per_page]
+    last = rows[-1]._mapping
+    return rows, encode_cursor(sort, [last[label] for label, _, _ in keys])
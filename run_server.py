@@ -26,7 +26,9 @@ def check_gunicorn():
 def run_waitress():
     """Run with Waitress"""
     from waitress import serve
-    from app import app
+    from app import create_app, setup_database
+    setup_database()
+    app = create_app()
     
     try:
         from config import FLASK_HOST, FLASK_PORT
@@ -54,16 +56,20 @@ def run_gunicorn():
     print("🌐 URL: http://0.0.0.0:5000")
     print("=" * 50)
     
+    # Set up the database once, not in every worker
+    subprocess.run([sys.executable, "db_schema.py"], check=True)
     subprocess.run([
         sys.executable, "-m", "gunicorn", 
         "-w", "4", 
         "-b", "0.0.0.0:5000", 
-        "app:app"
+        "main:app"
     ])
 
 def run_development():
     """Run with Flask development server"""
-    from app import app
+    from app import create_app, setup_database
+    setup_database()
+    app = create_app()
     
     try:
         from config import FLASK_HOST, FLASK_PORT, FLASK_DEBUG
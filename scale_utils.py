@@ -0,0 +1,152 @@
+"""
+Helpers for map scales.
+
+Scales are stored as free text in areas.scale: "1:25000" from the ArcGIS
+toolbox, "Scale: 1:50000" from older clients and legacy float strings such as
+"2.0". These helpers turn them into a numeric scale denominator and group scales into
+bands, which partition the spatial index.
+
+Databases migrated by db_migrations keep the parsed denominator in the indexed
+areas.scale_denominator column; the SQL helpers use it when it's there.
+"""
+
+import re
+
+from sqlalchemy import and_, cast, func, Float
+
+SCALE_PATTERN = re.compile(r'1\s*:\s*([\d,]+(?:\.\d+)?)')
+
+# Scale bands as (name, largest denominator); each band starts above the previous one
+SCALE_BANDS = (('5k', 5000), ('25k', 25000), ('100k', 100000), ('larger', None))
+SCALE_BAND_NAMES = tuple(name for name, _ in SCALE_BANDS)
+# Band code of scales that can't be parsed (they belong to no band)
+UNKNOWN_SCALE_BAND = len(SCALE_BANDS)
+
+def parse_scale_denominator(scale):
+    """
+    Parse a scale value into its integer denominator.
+
+    Examples:
+        '1:25000' -> 25000, 'Scale: 1:50,000' -> 50000, '2.0' -> 2, 5000 -> 5000
+
+    Returns:
+        int or None if the value can't be parsed
+    """
+    if scale is None:
+        return None
+    if isinstance(scale, (int, float)):
+        return int(round(scale)) if scale > 0 else None
+    s = str(scale).strip()
+    match = SCALE_PATTERN.search(s)
+    try:
+        if match:
+            value = float(match.group(1).replace(',', ''))
+        else:
+            value = float(s.replace(',', ''))
+    except ValueError:
+        return None
+    return int(round(value)) if value > 0 else None
+
+def scale_band_code(scale):
+    """Return the index of the scale band of a scale value (UNKNOWN_SCALE_BAND if unparseable)"""
+    denominator = parse_scale_denominator(scale)
+    if not denominator:
+        return UNKNOWN_SCALE_BAND
+    for code, (_, upper) in enumerate(SCALE_BANDS):
+        if upper is None or denominator <= upper:
+            return code
+    return UNKNOWN_SCALE_BAND
+
+def parse_scale_band(value):
+    """
+    Parse a scale band name from a request ('5k', '25k', '100k' or 'larger').
+
+    Returns:
+        tuple: (band code or None when not given, None) or (None, error message)
+    """
+    name = (value or '').strip().lower()
+    if not name:
+        return None, None
+    if name not in SCALE_BAND_NAMES:
+        return None, f"Invalid scale band. Use one of: {', '.join(SCALE_BAND_NAMES)}."
+    return SCALE_BAND_NAMES.index(name), None
+
+def scale_denominator_expression(scale_column):
+    """
+    SQL expression for the scale denominator: the text after the last ':'
+    without thousands separators ("Scale: 1:50,000" -> 50000, "2.0" -> 2).
+    Unparseable values give 0 or less.
+    """
+    # rtrim() strips every character except ':' from the end, so replace() leaves the part after the last colon
+    after_colon = func.replace(scale_column, func.rtrim(scale_column, func.replace(scale_column, ':', '')), '')
+    return cast(func.replace(func.replace(after_colon, ',', ''), ' ', ''), Float)
+
+def scale_denominator_column(areas_table):
+    """
+    The scale denominator of an areas table: the indexed scale_denominator
+    column when the database has it, otherwise parsed from the scale text.
+    """
+    if 'scale_denominator' in areas_table.c:
+        return areas_table.c.scale_denominator
+    return scale_denominator_expression(areas_table.c.scale)
+
+def scale_band_condition(areas_table, band):
+    """SQL condition: the scale of the area belongs to the band with the given code"""
+    denominator = scale_denominator_column(areas_table)
+    lower = SCALE_BANDS[band - 1][1] if band > 0 else 0
+    upper = SCALE_BANDS[band][1]
+    # Denominators are whole numbers, the Python side rounds them
+    condition = denominator >= lower + 0.5
+    if upper is not None:
+        condition = and_(condition, denominator < upper + 0.5)
+    return condition
+
+def scale_filter(areas_table, scale):
+    """
+    SQL condition for a scale search term.
+
+    "1:5000" (or "Scale: 1:5,000") matches the denominator exactly, so it no
+    longer also finds 1:50000. Plain numbers keep the legacy float string
+    match and anything else a substring match on the scale text.
+    """
+    match = SCALE_PATTERN.search(scale)
+    if match and 'scale_denominator' in areas_table.c:
+        return areas_table.c.scale_denominator == parse_scale_denominator(scale)
+    try:
+        # Try to parse as float for backward compatibility
+        return areas_table.c.scale == str(float(scale))
+    except ValueError:
+        return areas_table.c.scale.ilike(f"%{scale}%")
+
+def parse_scale_range(scale_min, scale_max):
+    """
+    Parse the scale_min / scale_max denominators of a request ("25000",
+    "1:25000" or a number).
+
+    Returns:
+        tuple: (scale_min, scale_max, None) with None for missing bounds, or (None, None, error message)
+    """
+    bounds = []
+    for name, value in (('scale_min', scale_min), ('scale_max', scale_max)):
+        if value is None or str(value).strip() == '':
+            bounds.append(None)
+            continue
+        denominator = parse_scale_denominator(value)
+        if denominator is None:
+            return None, None, f'Invalid {name}. Use a scale denominator such as 25000 or 1:25000.'
+        bounds.append(denominator)
+    if bounds[0] is not None and bounds[1] is not None and bounds[0] > bounds[1]:
+        return None, None, 'scale_min must not be larger than scale_max.'
+    return bounds[0], bounds[1], None
+
+def scale_range_filters(areas_table, scale_min=None, scale_max=None):
+    """SQL conditions for a scale denominator range (bounds inclusive)"""
+    filters = []
+    if scale_min is None and scale_max is None:
+        return filters
+    denominator = scale_denominator_column(areas_table)
+    if scale_min is not None:
+        filters.append(denominator >= scale_min)
+    if scale_max is not None:
+        filters.append(denominator <= scale_max)
+    return filters
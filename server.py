@@ -5,7 +5,7 @@ This is the recommended way to run the application on a VM
 """
 
 from waitress import serve
-from app import app
+from app import create_app, setup_database
 import os
 import sys
 
@@ -29,6 +29,8 @@ def main():
     print("=" * 50)
     
     # Start the production server
+    setup_database()
+    app = create_app()
     serve(app, host=host, port=port, threads=4)
 
 if __name__ == '__main__':
@@ -11,7 +11,7 @@ import signal
 import logging
 from datetime import datetime
 from waitress import serve
-from app import app
+from app import create_app, setup_database
 
 # Set up logging
 logging.basicConfig(
@@ -58,6 +58,7 @@ class AutoReconnectServer:
         logger.info(f"🔌 Port: {self.port}")
         logger.info(f"🌐 URL: http://{self.host}:{self.port}")
         logger.info("=" * 50)
+        setup_database()
         
         while self.running and self.retry_count < self.max_retries:
             try:
@@ -65,7 +66,7 @@ class AutoReconnectServer:
                 logger.info("✅ Starting server...")
                 
                 # Start the production server
-                serve(app, host=self.host, port=self.port, threads=4)
+                serve(create_app(), host=self.host, port=self.port, threads=4)
                 
             except KeyboardInterrupt:
                 logger.info("🛑 Server stopped by user")
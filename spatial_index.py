@@ -0,0 +1,171 @@
+"""
+SQLite R*Tree spatial index for the areas table.
+
+The index lives in the same database file as the areas table (a virtual table
+called areas_rtree) and is kept in sync by insert/update/delete triggers, so
+every writer - the Flask app, the backend API or a manual sqlite3 session -
+maintains it automatically.
+
+Searches use it for bounding box candidate pruning: the R*Tree narrows the
+areas down to the rows near the query box and the exact comparison still runs
+on the real areas columns.
+
+Supported spatial predicates (area compared with the query box):
+- inside (alias within): the area lies fully inside the box (the default)
+- intersects: the area touches or overlaps the box
+- contains: the area fully covers the box (or point)
+"""
+
+from sqlalchemy import MetaData, Table, Column, Integer, Float, and_, select, text, bindparam
+
+from scale_utils import scale_band_condition
+
+RTREE_TABLE = 'areas_rtree'
+
+# The R*Tree stores 32-bit floats rounded outward, which at UTM northings
+# (~3.5 million) means up to half a meter of rounding. The index probe is padded
+# by this many meters so rounding can never drop a matching row.
+RTREE_PADDING = 2.0
+
+# Above this many matching ids the id list handed over by the in-memory index
+# gets too big to inline into the SQL statement; the R*Tree is used instead.
+MAX_INLINE_AREA_IDS = 50000
+
+PREDICATE_INSIDE = 'inside'
+PREDICATE_INTERSECTS = 'intersects'
+PREDICATE_CONTAINS = 'contains'
+SPATIAL_PREDICATES = (PREDICATE_INSIDE, PREDICATE_INTERSECTS, PREDICATE_CONTAINS)
+PREDICATE_ALIASES = {'within': PREDICATE_INSIDE}
+
+# Lightweight table definition used only to compose queries against the index
+rtree_metadata = MetaData()
+areas_rtree_table = Table(RTREE_TABLE, rtree_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('minx', Float),
+    Column('maxx', Float),
+    Column('miny', Float),
+    Column('maxy', Float)
+)
+
+RTREE_SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {RTREE_TABLE} USING rtree(id, minx, maxx, miny, maxy)",
+    # min()/max() keep the index valid even if a frame was saved with swapped corners
+    f"""CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_insert AFTER INSERT ON areas BEGIN
+        INSERT INTO {RTREE_TABLE} (id, minx, maxx, miny, maxy)
+        VALUES (new.id, min(new.xmin, new.xmax), max(new.xmin, new.xmax),
+                min(new.ymin, new.ymax), max(new.ymin, new.ymax));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_update AFTER UPDATE OF id, xmin, ymin, xmax, ymax ON areas BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = old.id;
+        INSERT INTO {RTREE_TABLE} (id, minx, maxx, miny, maxy)
+        VALUES (new.id, min(new.xmin, new.xmax), max(new.xmin, new.xmax),
+                min(new.ymin, new.ymax), max(new.ymin, new.ymax));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {RTREE_TABLE}_delete AFTER DELETE ON areas BEGIN
+        DELETE FROM {RTREE_TABLE} WHERE id = old.id;
+    END""",
+]
+
+def ensure_areas_rtree(engine):
+    """
+    Create the areas R*Tree and its triggers if they don't exist, and (re)fill
+    the index when it is out of sync with the areas table.
+
+    Returns:
+        bool: True if the spatial index is available, False if this SQLite
+              build has no R*Tree support (searches then fall back to a scan)
+    """
+    try:
+        with engine.begin() as conn:
+            for statement in RTREE_SCHEMA:
+                conn.execute(text(statement))
+
+            areas_count = conn.execute(text("SELECT count(*) FROM areas")).scalar()
+            rtree_count = conn.execute(text(f"SELECT count(*) FROM {RTREE_TABLE}")).scalar()
+            if areas_count != rtree_count:
+                print(f"🔄 Rebuilding spatial index ({rtree_count} of {areas_count} areas indexed)...")
+                conn.execute(text(f"DELETE FROM {RTREE_TABLE}"))
+                conn.execute(text(
+                    f"""INSERT INTO {RTREE_TABLE} (id, minx, maxx, miny, maxy)
+                    SELECT id, min(xmin, xmax), max(xmin, xmax), min(ymin, ymax), max(ymin, ymax)
+                    FROM areas"""
+                ))
+        return True
+    except Exception as e:
+        print(f"⚠️  Spatial index not available, spatial searches will scan the areas table: {e}")
+        return False
+
+def area_ids_filter(areas_table, area_ids):
+    """Restrict areas to the given ids (ids are inlined, so SQLite's variable limit does not apply)"""
+    return areas_table.c.id.in_(bindparam(None, [int(i) for i in area_ids], expanding=True, literal_execute=True))
+
+def normalize_predicate(predicate):
+    """
+    Normalize a predicate name from a request.
+
+    Returns:
+        str: one of SPATIAL_PREDICATES (inside when empty), or None if unknown
+    """
+    predicate = (predicate or PREDICATE_INSIDE).strip().lower()
+    predicate = PREDICATE_ALIASES.get(predicate, predicate)
+    return predicate if predicate in SPATIAL_PREDICATES else None
+
+def exact_bbox_condition(columns, predicate, xmin, ymin, xmax, ymax):
+    """
+    Exact bbox comparison; columns are (xmin, ymin, xmax, ymax) column expressions
+    and the box may be numbers or column expressions as well.
+    """
+    c_xmin, c_ymin, c_xmax, c_ymax = columns
+    if predicate == PREDICATE_INTERSECTS:
+        return and_(c_xmin <= xmax, c_xmax >= xmin, c_ymin <= ymax, c_ymax >= ymin)
+    if predicate == PREDICATE_CONTAINS:
+        return and_(c_xmin <= xmin, c_xmax >= xmax, c_ymin <= ymin, c_ymax >= ymax)
+    return and_(c_xmin >= xmin, c_xmax <= xmax, c_ymin >= ymin, c_ymax <= ymax)
+
+def rtree_condition(predicate, xmin, ymin, xmax, ymax):
+    """
+    R*Tree constraint for the predicate (padded, see RTREE_PADDING). The box may
+    be given as numbers or as column expressions of a joined table.
+    """
+    r = areas_rtree_table.c
+    pad = RTREE_PADDING
+    if predicate == PREDICATE_INTERSECTS:
+        return and_(r.minx <= xmax + pad, r.maxx >= xmin - pad, r.miny <= ymax + pad, r.maxy >= ymin - pad)
+    if predicate == PREDICATE_CONTAINS:
+        return and_(r.minx <= xmin + pad, r.maxx >= xmax - pad, r.miny <= ymin + pad, r.maxy >= ymax - pad)
+    return and_(r.minx >= xmin - pad, r.maxx <= xmax + pad, r.miny >= ymin - pad, r.maxy <= ymax + pad)
+
+def rtree_candidates(predicate, xmin, ymin, xmax, ymax):
+    """Select the area ids the R*Tree considers candidates for the predicate"""
+    return select(areas_rtree_table.c.id).where(rtree_condition(predicate, xmin, ymin, xmax, ymax))
+
+def bbox_predicate_filter(areas_table, predicate, xmin, ymin, xmax, ymax, use_index=True, area_index=None, band=None):
+    """
+    Build the filter for a spatial predicate between the areas and the query box.
+
+    With area_index (a packed_index.PackedAreaIndex) the matching area ids are
+    computed in memory and SQLite only looks them up by primary key. Otherwise,
+    with use_index the R*Tree prunes the candidate area ids first; the exact
+    comparison on the areas columns is kept so results are identical to a scan.
+
+    With band (a scale_utils band code) only areas of that scale band match; the
+    in-memory index then searches only that band's partition.
+    """
+    if area_index is not None and area_index.ensure_fresh():
+        area_ids = area_index.search(predicate, xmin, ymin, xmax, ymax, band=band)
+        if len(area_ids) <= MAX_INLINE_AREA_IDS:
+            return area_ids_filter(areas_table, area_ids)
+
+    exact = exact_bbox_condition(
+        (areas_table.c.xmin, areas_table.c.ymin, areas_table.c.xmax, areas_table.c.ymax),
+        predicate, xmin, ymin, xmax, ymax
+    )
+    if band is not None:
+        exact = and_(exact, scale_band_condition(areas_table, band))
+    if not use_index:
+        return exact
+    return and_(areas_table.c.id.in_(rtree_candidates(predicate, xmin, ymin, xmax, ymax)), exact)
+
+def inside_bbox_filter(areas_table, xmin, ymin, xmax, ymax, use_index=True, area_index=None):
+    """Build the INSIDE filter (area fully inside the query box)"""
+    return bbox_predicate_filter(areas_table, PREDICATE_INSIDE, xmin, ymin, xmax, ymax, use_index, area_index)
@@ -0,0 +1,170 @@
+"""
+Spatial lookups on map frames (areas) shared by app.py and the backend API.
+
+All lookups go through a spatial index: the in-memory packed index when the
+caller passes one, otherwise the SQLite R*Tree (see spatial_index).
+"""
+
+import itertools
+import math
+
+from sqlalchemy import select, func, and_
+
+from spatial_index import bbox_predicate_filter, area_ids_filter, PREDICATE_CONTAINS, PREDICATE_INTERSECTS
+from scale_utils import parse_scale_denominator, scale_filter
+from text_search import prefix_filter
+
+PROJECT_FIELDS = ('uuid', 'project_name', 'user_name', 'date', 'file_location', 'paper_size', 'description')
+AREA_FIELDS = ('id', 'project_id', 'xmin', 'ymin', 'xmax', 'ymax', 'scale')
+
+# Largest k accepted by the nearest map frames endpoint
+MAX_NEAREST_K = 100
+# First search radius (meters) of the expanding window used without the in-memory index
+NEAREST_START_RADIUS = 1000.0
+
+def area_with_project_columns(projects_table, areas_table):
+    """Columns for an area row joined with its project (project columns are prefixed)"""
+    return [areas_table.c[name] for name in AREA_FIELDS] + \
+           [projects_table.c[name].label(f'project_{name}') for name in PROJECT_FIELDS]
+
+def area_row_to_dict(row):
+    """Turn a row selected with area_with_project_columns() into {area fields..., 'project': {...}}"""
+    mapping = row._mapping
+    area = {name: mapping[name] for name in AREA_FIELDS}
+    area['project'] = {name: mapping[f'project_{name}'] for name in PROJECT_FIELDS}
+    return area
+
+def scale_sort_key(area):
+    """Sort areas by scale denominator (most detailed first), unparseable scales last"""
+    denominator = parse_scale_denominator(area['scale'])
+    return (denominator is None, denominator or 0, area['id'])
+
+def areas_at_point(conn, projects_table, areas_table, x, y, use_index=True, area_index=None):
+    """
+    Return the map frames whose rectangle contains the point (x, y), with their
+    projects, ordered by scale.
+    """
+    stmt = select(*area_with_project_columns(projects_table, areas_table)).select_from(
+        areas_table.join(projects_table, areas_table.c.project_id == projects_table.c.uuid)
+    ).where(
+        bbox_predicate_filter(areas_table, PREDICATE_CONTAINS, x, y, x, y, use_index=use_index, area_index=area_index)
+    )
+    areas = [area_row_to_dict(row) for row in conn.execute(stmt)]
+    areas.sort(key=scale_sort_key)
+    return areas
+
+def distance_to_area(area, x, y):
+    """Distance from the point (x, y) to an area rectangle (0 if the point is inside)"""
+    dx = max(min(area['xmin'], area['xmax']) - x, x - max(area['xmin'], area['xmax']), 0.0)
+    dy = max(min(area['ymin'], area['ymax']) - y, y - max(area['ymin'], area['ymax']), 0.0)
+    return math.hypot(dx, dy)
+
+def area_attribute_filters(projects_table, areas_table, scale=None, user=None):
+    """Optional scale / user filters, matched like the search form does"""
+    filters = []
+    if scale:
+        filters.append(scale_filter(areas_table, scale))
+    if user:
+        filters.append(prefix_filter(projects_table.c.user_name, user))
+    return filters
+
+def footprint_area_column(areas_table):
+    """Footprint area in square meters: the indexed area_m2 column, or computed from the corners"""
+    if 'area_m2' in areas_table.c:
+        return areas_table.c.area_m2
+    return func.abs(areas_table.c.xmax - areas_table.c.xmin) * func.abs(areas_table.c.ymax - areas_table.c.ymin)
+
+def parse_footprint_size_range(min_area_km2, max_area_km2):
+    """
+    Parse the min_area_km2 / max_area_km2 footprint size bounds of a request.
+
+    Returns:
+        tuple: (min m², max m², None) with None for missing bounds, or (None, None, error message)
+    """
+    bounds = []
+    for name, value in (('min_area_km2', min_area_km2), ('max_area_km2', max_area_km2)):
+        if value is None or str(value).strip() == '':
+            bounds.append(None)
+            continue
+        try:
+            km2 = float(value)
+        except (TypeError, ValueError):
+            return None, None, f'{name} must be a number (square kilometers).'
+        if km2 < 0 or not math.isfinite(km2):
+            return None, None, f'{name} must be a non-negative number (square kilometers).'
+        bounds.append(km2 * 1e6)
+    if bounds[0] is not None and bounds[1] is not None and bounds[0] > bounds[1]:
+        return None, None, 'min_area_km2 must not be larger than max_area_km2.'
+    return bounds[0], bounds[1], None
+
+def footprint_size_filters(areas_table, min_area_m2=None, max_area_m2=None):
+    """SQL conditions for a footprint area range in square meters (bounds inclusive)"""
+    filters = []
+    if min_area_m2 is None and max_area_m2 is None:
+        return filters
+    area = footprint_area_column(areas_table)
+    if min_area_m2 is not None:
+        filters.append(area >= min_area_m2)
+    if max_area_m2 is not None:
+        filters.append(area <= max_area_m2)
+    return filters
+
+def _areas_with_projects(conn, projects_table, areas_table, conditions):
+    stmt = select(*area_with_project_columns(projects_table, areas_table)).select_from(
+        areas_table.join(projects_table, areas_table.c.project_id == projects_table.c.uuid)
+    ).where(and_(*conditions))
+    return [area_row_to_dict(row) for row in conn.execute(stmt)]
+
+def nearest_areas(conn, projects_table, areas_table, x, y, k, scale=None, user=None, use_index=True, area_index=None):
+    """
+    Return the k map frames closest to the point (x, y), with their projects and
+    a 'distance' field (0 for frames containing the point), nearest first.
+
+    With area_index the candidates come from a best-first traversal of the
+    in-memory tree, fetched in growing batches until k of them pass the filters.
+    Otherwise an expanding search window is probed through the R*Tree.
+    """
+    filters = area_attribute_filters(projects_table, areas_table, scale, user)
+
+    if area_index is not None and area_index.ensure_fresh():
+        found = []
+        batch_size = max(2 * k, 32)
+        candidates = area_index.iter_nearest(x, y)
+        while len(found) < k:
+            batch = [area_id for _, area_id in itertools.islice(candidates, batch_size)]
+            if not batch:
+                break
+            areas = _areas_with_projects(conn, projects_table, areas_table,
+                                         [area_ids_filter(areas_table, batch)] + filters)
+            found.extend(areas)
+            # Selective filters: fetch more per round to keep the number of queries low
+            batch_size *= 2
+        for area in found:
+            area['distance'] = distance_to_area(area, x, y)
+        found.sort(key=lambda a: (a['distance'], a['id']))
+        return found[:k]
+
+    # Extent of the candidate frames bounds the window growth
+    extent_stmt = select(
+        func.min(areas_table.c.xmin), func.min(areas_table.c.ymin),
+        func.max(areas_table.c.xmax), func.max(areas_table.c.ymax)
+    ).select_from(areas_table.join(projects_table, areas_table.c.project_id == projects_table.c.uuid))
+    if filters:
+        extent_stmt = extent_stmt.where(and_(*filters))
+    extent = conn.execute(extent_stmt).first()
+    if extent is None or extent[0] is None:
+        return []
+    max_radius = max(abs(x - extent[0]), abs(x - extent[2]), abs(y - extent[1]), abs(y - extent[3]))
+
+    radius = NEAREST_START_RADIUS
+    while True:
+        window = bbox_predicate_filter(areas_table, PREDICATE_INTERSECTS, x - radius, y - radius,
+                                       x + radius, y + radius, use_index=use_index)
+        areas = _areas_with_projects(conn, projects_table, areas_table, [window] + filters)
+        for area in areas:
+            area['distance'] = distance_to_area(area, x, y)
+        areas.sort(key=lambda a: (a['distance'], a['id']))
+        # Only frames within the radius are guaranteed to be the closest ones
+        if radius >= max_radius or (len(areas) >= k and areas[k - 1]['distance'] <= radius):
+            return areas[:k]
+        radius *= 4
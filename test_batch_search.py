@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for the batch spatial search.
+Compares the single-statement batch search with one search per box.
+"""
+
+import random
+import sqlite3
+from sqlalchemy import select, and_
+
+from spatial_index import ensure_areas_rtree, bbox_predicate_filter, SPATIAL_PREDICATES
+from batch_search import search_boxes, parse_batch_request, MAX_BATCH_BOXES
+from test_intersection_filter import create_random_catalog
+
+def per_box_search(conn, projects_table, areas_table, box, predicate, filters=()):
+    stmt = select(projects_table.c.uuid).select_from(
+        projects_table.join(areas_table, projects_table.c.uuid == areas_table.c.project_id)
+    ).where(and_(bbox_predicate_filter(areas_table, predicate, *box, use_index=False), *filters)).distinct()
+    return sorted(conn.execute(stmt).scalars())
+
+def random_boxes(count, seed=3):
+    rng = random.Random(seed)
+    boxes = []
+    for _ in range(count):
+        x = rng.uniform(695000, 725000)
+        y = rng.uniform(3495000, 3525000)
+        size = rng.uniform(100, 15000)
+        boxes.append((x, y, x + size, y + size))
+    # A degenerate box (point) as used for coverage checks
+    boxes.append((710000, 3510000, 710000, 3510000))
+    return boxes
+
+def test_batch_matches_per_box_search():
+    engine, uuids, areas_table, projects_table = create_random_catalog()
+    ensure_areas_rtree(engine)
+    boxes = random_boxes(60)
+    with engine.connect() as conn:
+        for predicate in SPATIAL_PREDICATES:
+            for use_index in (True, False):
+                batch = search_boxes(conn, projects_table, areas_table, boxes, predicate, use_index=use_index)
+                assert len(batch) == len(boxes)
+                for box, projects in zip(boxes, batch):
+                    assert [p['uuid'] for p in projects] == per_box_search(conn, projects_table, areas_table, box, predicate)
+
+def test_max_boxes_within_variable_limit():
+    engine, uuids, areas_table, projects_table = create_random_catalog()
+    ensure_areas_rtree(engine)
+    boxes = random_boxes(MAX_BATCH_BOXES - 1)
+    with engine.connect() as conn:
+        # SQLite before 3.32 allows 999 variables per statement
+        conn.connection.driver_connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+        batch = search_boxes(conn, projects_table, areas_table, boxes, 'intersects')
+        assert len(batch) == MAX_BATCH_BOXES
+        assert [p['uuid'] for p in batch[-1]] == per_box_search(conn, projects_table, areas_table, boxes[-1], 'intersects')
+
+def test_batch_request_filters():
+    engine, uuids, areas_table, projects_table = create_random_catalog()
+    ensure_areas_rtree(engine)
+    boxes, predicate, filters, error = parse_batch_request(
+        {'boxes': [[700000, 3500000, 730000, 3530000]], 'predicate': 'intersects', 'uuid': 'proj000'},
+        projects_table, areas_table, parse_point=None
+    )
+    assert error is None and predicate == 'intersects'
+    with engine.connect() as conn:
+        result = search_boxes(conn, projects_table, areas_table, boxes, predicate, filters)
+    assert [p['uuid'] for p in result[0]] == [f"proj000{i}" for i in range(10)]
+
+def test_batch_request_errors():
+    def parse_point(s):
+        x, y = s.split('/')
+        return (float(x), float(y)), None
+    assert parse_batch_request({}, None, None, parse_point)[3] is not None
+    assert parse_batch_request({'boxes': [[1, 2, 3]]}, None, None, parse_point)[3].startswith('Box 0')
+    assert parse_batch_request({'boxes': [[0, 0, 1, 1], [5, 5, 1, 1]]}, None, None, parse_point)[3].startswith('Box 1')
+    assert parse_batch_request({'boxes': [[0, 0, 'nan', 1]]}, None, None, parse_point)[3].startswith('Box 0')
+    boxes, _, _, error = parse_batch_request({'boxes': [{'bottom_left': '1/2', 'top_right': '3/4'}]}, None, None, parse_point)
+    assert error is None and boxes == [(1.0, 2.0, 3.0, 4.0)]
+
+if __name__ == "__main__":
+    test_batch_matches_per_box_search()
+    test_max_boxes_within_variable_limit()
+    test_batch_request_filters()
+    test_batch_request_errors()
+    print("✅ All batch search tests passed!")
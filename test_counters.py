@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script for the trigger-maintained row counters and the listing totals.
+Uses a temporary database so elements.db is never touched.
+"""
+
+import random
+
+from sqlalchemy import func, select
+
+from counters import (
+    ensure_row_counters, counted_total, listing_total, estimated_total, counter_facet, row_counts_table, ESTIMATE_SAMPLE_ROWS
+)
+from text_search import prefix_filter
+from test_spatial_index import create_test_database
+
+def add_project(conn, projects_table, uuid, user_name='tester', paper_size='A4'):
+    conn.execute(projects_table.insert().values(
+        uuid=uuid, project_name=f'Project {uuid}', user_name=user_name, date='01-01-24',
+        file_location='x', paper_size=paper_size, description=''
+    ))
+
+def add_area(conn, areas_table, project_id, scale='1:5000'):
+    conn.execute(areas_table.insert().values(project_id=project_id, xmin=0, ymin=0, xmax=1, ymax=1, scale=scale))
+
+def facet_counts(conn, facet):
+    c = row_counts_table.c
+    return dict(conn.execute(select(c.key, c.count).where(c.scope == facet, c.count != 0)).fetchall())
+
+def test_counters_follow_writes():
+    engine, projects_table, areas_table = create_test_database()
+    with engine.begin() as conn:
+        # Rows written before the counters existed are counted by the backfill
+        add_project(conn, projects_table, 'p1', user_name='alice')
+        add_area(conn, areas_table, 'p1')
+    assert ensure_row_counters(engine)
+
+    with engine.begin() as conn:
+        add_project(conn, projects_table, 'p2', user_name='bob', paper_size='A3')
+        add_project(conn, projects_table, 'p3', user_name='alice', paper_size='A3')
+        add_area(conn, areas_table, 'p2')
+        add_area(conn, areas_table, 'p3')
+        conn.execute(projects_table.update().where(projects_table.c.uuid == 'p3').values(user_name='carol'))
+        conn.execute(areas_table.delete().where(areas_table.c.project_id == 'p1'))
+        conn.execute(projects_table.delete().where(projects_table.c.uuid == 'p1'))
+
+    with engine.connect() as conn:
+        assert counted_total(conn, 'projects') == 2
+        assert counted_total(conn, 'areas') == 2
+        assert facet_counts(conn, 'user_name') == {'bob': 1, 'carol': 1}
+        assert facet_counts(conn, 'paper_size') == {'A3': 2}
+        # Same case-insensitive prefix match as the listing filters
+        assert counted_total(conn, 'projects', 'user_name', 'B') == 1
+        assert counted_total(conn, 'projects', 'paper_size', 'a') == 2
+        assert counted_total(conn, 'projects', 'paper_size', 'A4') == 0
+
+def test_listing_totals_use_the_counters():
+    engine, projects_table, areas_table = create_test_database()
+    with engine.begin() as conn:
+        for i in range(6):
+            add_project(conn, projects_table, f'p{i}', user_name='alice' if i % 2 else 'bob')
+    ensure_row_counters(engine)
+    count_all = select(func.count()).select_from(projects_table)
+
+    with engine.begin() as conn:
+        # Served from the counter, not from count_stmt
+        conn.execute(row_counts_table.update().where(row_counts_table.c.key == 'projects').values(count=99))
+        assert listing_total(conn, projects_table, [], count_all) == (99, False)
+
+        user_filter = prefix_filter(projects_table.c.user_name, 'al')
+        facet, prefix = counter_facet({'user_name': 'al'})
+        assert (facet, prefix) == ('user_name', 'al')
+        assert listing_total(conn, projects_table, [user_filter],
+                             count_all.where(user_filter), facet=facet, prefix=prefix) == (3, False)
+
+        # Other filters and listings with a HAVING are counted
+        assert counter_facet({'user_name': 'al', 'project_name': 'P'}) == (None, None)
+        name_filter = projects_table.c.project_name == 'Project p1'
+        assert listing_total(conn, projects_table, [name_filter],
+                             count_all.where(name_filter)) == (1, False)
+        assert listing_total(conn, projects_table, None, count_all) == (6, False)
+
+    # Databases without the counters count every listing
+    engine, projects_table, _ = create_test_database()
+    with engine.connect() as conn:
+        assert listing_total(conn, projects_table, [], count_all, estimate=True) == (0, False)
+
+def check_estimate(engine, areas_table):
+    scale_filter = areas_table.c.scale == '1:500'
+    count_stmt = select(func.count()).select_from(areas_table).where(scale_filter)
+    with engine.connect() as conn:
+        exact = conn.execute(count_stmt).scalar_one()
+        total_rows = counted_total(conn, 'areas')
+        total, is_estimate = estimated_total(conn, areas_table, [scale_filter], total_rows, rng=random.Random(1))
+        assert is_estimate
+        assert abs(total - exact) <= exact * 0.1, (total, exact)
+        # Unseeded sample: a wider tolerance, but never the first rows only
+        total, is_estimate = listing_total(conn, areas_table, [scale_filter], count_stmt, estimate=True)
+        assert is_estimate
+        assert abs(total - exact) <= exact * 0.25, (total, exact)
+        assert listing_total(conn, areas_table, [scale_filter], count_stmt) == (exact, False)
+
+def test_estimated_totals():
+    engine, projects_table, areas_table = create_test_database()
+    with engine.begin() as conn:
+        add_project(conn, projects_table, 'p1')
+        for i in range(3 * ESTIMATE_SAMPLE_ROWS):
+            add_area(conn, areas_table, 'p1', scale='1:500' if i % 4 == 0 else '1:5000')
+    ensure_row_counters(engine)
+    check_estimate(engine, areas_table)
+
+def test_estimate_of_rows_added_last():
+    # Only the last third of the areas match, e.g. a newly used scale
+    engine, projects_table, areas_table = create_test_database()
+    n = 3 * ESTIMATE_SAMPLE_ROWS
+    with engine.begin() as conn:
+        add_project(conn, projects_table, 'p1')
+        for i in range(n):
+            add_area(conn, areas_table, 'p1', scale='1:500' if i >= 2 * n // 3 else '1:5000')
+    ensure_row_counters(engine)
+    check_estimate(engine, areas_table)
+
+if __name__ == "__main__":
+    test_counters_follow_writes()
+    test_listing_totals_use_the_counters()
+    test_estimated_totals()
+    test_estimate_of_rows_added_last()
+    print("✅ All row counter tests passed!")
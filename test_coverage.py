@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Test script for the coverage density grids.
+Checks the rasterization against a per-cell count, the cache invalidation and
+the PNG encoding.
+"""
+
+import struct
+import zlib
+import numpy as np
+from sqlalchemy import text
+
+from counters import ensure_row_counters, ensure_change_counters
+from spatial_index import ensure_areas_rtree
+from coverage import rasterize_counts, coverage_grid, coverage_cache, grid_to_png, parse_heatmap_args, union_area, region_coverage
+from test_intersection_filter import create_random_catalog
+
+def per_cell_counts(area_bounds, xmin, ymin, xmax, ymax, cell_size):
+    nx = int(np.ceil((xmax - xmin) / cell_size))
+    ny = int(np.ceil((ymax - ymin) / cell_size))
+    grid = np.zeros((ny, nx), dtype=np.int32)
+    for row in range(ny):
+        for col in range(nx):
+            cx0, cy0 = xmin + col * cell_size, ymin + row * cell_size
+            cx1, cy1 = cx0 + cell_size, cy0 + cell_size
+            b = area_bounds
+            grid[row, col] = np.sum((b[:, 0] < cx1) & (b[:, 2] > cx0) & (b[:, 1] < cy1) & (b[:, 3] > cy0))
+    return grid
+
+def test_rasterize_matches_per_cell_count():
+    rng = np.random.default_rng(1)
+    x = rng.uniform(690000, 730000, 300)
+    y = rng.uniform(3490000, 3530000, 300)
+    bounds = np.column_stack((x, y, x + rng.uniform(10, 9000, 300), y + rng.uniform(10, 9000, 300)))
+    extent = (700000, 3500000, 725000, 3520000)
+    for cell_size in (1000, 2500, 3333):
+        assert np.array_equal(rasterize_counts(bounds, *extent, cell_size), per_cell_counts(bounds, *extent, cell_size))
+
+def test_grid_cache_invalidated_on_insert_and_delete():
+    engine, uuids, areas_table, projects_table = create_random_catalog()
+    ensure_areas_rtree(engine)
+    assert ensure_row_counters(engine) and ensure_change_counters(engine)
+    options, error = parse_heatmap_args({'bbox': '700000,3500000,730000,3530000', 'cell_size': '1000'})
+    assert error is None
+    with engine.connect() as conn:
+        first = coverage_grid(conn, projects_table, areas_table, options)
+        assert coverage_grid(conn, projects_table, areas_table, options) is first
+
+    with engine.begin() as conn:
+        conn.execute(areas_table.insert().values(project_id=uuids[0], xmin=700100, ymin=3500100,
+                                                 xmax=700200, ymax=3500200, scale='1:5000'))
+    with engine.connect() as conn:
+        second = coverage_grid(conn, projects_table, areas_table, options)
+        assert second[0, 0] == first[0, 0] + 1
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM areas WHERE project_id = :p"), {'p': uuids[0]})
+    with engine.connect() as conn:
+        third = coverage_grid(conn, projects_table, areas_table, options)
+        assert third.sum() < second.sum()
+
+def test_grid_cache_invalidated_on_project_date_change():
+    # Same catalog as the test above, whose grids are still cached
+    coverage_cache.clear()
+    for change_counters in (False, True):
+        engine, uuids, areas_table, projects_table = create_random_catalog()
+        ensure_areas_rtree(engine)
+        if change_counters:
+            assert ensure_row_counters(engine) and ensure_change_counters(engine)
+        options, error = parse_heatmap_args({'bbox': '700000,3500000,730000,3530000', 'cell_size': '1000',
+                                             'date_from': '2024-01-01'})
+        assert error is None
+        with engine.connect() as conn:
+            first = coverage_grid(conn, projects_table, areas_table, options)
+            assert first.sum() > 0
+
+        # Only the projects change: the areas version stays the same
+        with engine.begin() as conn:
+            conn.execute(projects_table.update().values(date='01-01-23'))
+        with engine.connect() as conn:
+            assert coverage_grid(conn, projects_table, areas_table, options).sum() == 0
+
+def test_png_encoding():
+    grid = np.array([[0, 1], [2, 4], [0, 0]], dtype=np.int32)
+    png = grid_to_png(grid)
+    assert png[:8] == b'\x89PNG\r\n\x1a\n'
+    width, height = struct.unpack('>II', png[16:24])
+    assert (width, height) == (2, 3)
+    idat_length = struct.unpack('>I', png[33:37])[0]
+    raw = np.frombuffer(zlib.decompress(png[41:41 + idat_length]), dtype=np.uint8).reshape(3, 9)
+    alpha = raw[:, 1:].reshape(3, 2, 4)[..., 3]
+    # North up: the last grid row is the first image row
+    assert alpha.tolist() == [[0, 0], [200, 200], [0, 200]]
+
+def test_union_area_matches_unit_raster():
+    # Integer rectangles: the union area equals the number of covered unit cells
+    rng = np.random.default_rng(5)
+    for _ in range(20):
+        n = int(rng.integers(1, 40))
+        x0 = rng.integers(0, 50, n)
+        y0 = rng.integers(0, 50, n)
+        rects = np.column_stack((x0, y0, x0 + rng.integers(0, 20, n), y0 + rng.integers(0, 20, n)))
+        raster = np.zeros((70, 70), dtype=bool)
+        for xmin, ymin, xmax, ymax in rects:
+            raster[ymin:ymax, xmin:xmax] = True
+        assert union_area(rects.tolist()) == raster.sum()
+
+def test_region_coverage_does_not_double_count():
+    # Two identical frames and one overlapping half of the box
+    frames = [(0, 0, 50, 100), (0, 0, 50, 100), (25, 0, 75, 100), (500, 500, 600, 600)]
+    coverage = region_coverage(frames, 0, 0, 100, 100)
+    assert coverage['covered_area'] == 7500
+    assert coverage['covered_fraction'] == 0.75
+    assert region_coverage([], 0, 0, 100, 100)['covered_fraction'] == 0
+    assert region_coverage(frames, 10, 10, 10, 10)['covered_fraction'] is None
+
+if __name__ == "__main__":
+    test_rasterize_matches_per_cell_count()
+    test_grid_cache_invalidated_on_insert_and_delete()
+    test_grid_cache_invalidated_on_project_date_change()
+    test_png_encoding()
+    test_union_area_matches_unit_raster()
+    test_region_coverage_does_not_double_count()
+    print("✅ All coverage tests passed!")
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for the SQLite engine factory (WAL, PRAGMAs, pooling, fork handling).
+Uses a temporary database so elements.db is never touched.
+"""
+
+import os
+import tempfile
+
+from sqlalchemy import text
+from sqlalchemy.pool import QueuePool
+
+from db_engine import create_sqlite_engine, _dispose_engines_after_fork
+
+def temp_database():
+    return os.path.join(tempfile.mkdtemp(), 'test_elements.db')
+
+def test_pragmas_are_set_on_every_connection():
+    engine = create_sqlite_engine(temp_database(), busy_timeout_ms=1234, cache_size_kb=2048, mmap_size=1 << 20)
+    with engine.connect() as a, engine.connect() as b:
+        for conn in (a, b):
+            assert conn.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+            assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+            assert conn.execute(text("PRAGMA busy_timeout")).scalar() == 1234
+            assert conn.execute(text("PRAGMA cache_size")).scalar() == -2048
+            assert conn.execute(text("PRAGMA mmap_size")).scalar() == 1 << 20
+
+def test_journal_mode_override():
+    engine = create_sqlite_engine(temp_database(), journal_mode='DELETE')
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == 'delete'
+
+def test_pool_sizing():
+    engine = create_sqlite_engine(f'sqlite:///{temp_database()}', pool_size=3, max_overflow=1, pool_timeout=2)
+    assert isinstance(engine.pool, QueuePool)
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 1
+    assert engine.pool._timeout == 2
+
+def test_readers_are_not_blocked_by_a_writer():
+    engine = create_sqlite_engine(temp_database(), busy_timeout_ms=100)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t VALUES (1)"))
+    with engine.connect() as writer, engine.connect() as reader:
+        writer.execute(text("BEGIN IMMEDIATE"))
+        writer.execute(text("INSERT INTO t VALUES (2)"))
+        # With a rollback journal this read would fail with "database is locked"
+        assert reader.execute(text("SELECT count(*) FROM t")).scalar() == 1
+        writer.execute(text("COMMIT"))
+        reader.rollback()
+        assert reader.execute(text("SELECT count(*) FROM t")).scalar() == 2
+
+def test_pool_is_replaced_after_fork():
+    engine = create_sqlite_engine(temp_database())
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    pool = engine.pool
+    assert pool.checkedin() == 1
+    _dispose_engines_after_fork()
+    assert engine.pool is not pool
+    assert engine.pool.checkedin() == 0
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+def test_forked_child_opens_its_own_connection():
+    if not hasattr(os, 'fork'):
+        return
+    engine = create_sqlite_engine(temp_database())
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert engine.pool.checkedin() == 1
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            # The parent's pooled connection was dropped, a new one is opened
+            ok = engine.pool.checkedin() == 0
+            with engine.connect() as conn:
+                ok = ok and conn.execute(text("SELECT 1")).scalar() == 1
+            os.write(write_fd, b'1' if ok else b'0')
+        finally:
+            os._exit(0)
+    os.close(write_fd)
+    result = os.read(read_fd, 1)
+    os.waitpid(pid, 0)
+    assert result == b'1'
+
+if __name__ == "__main__":
+    test_pragmas_are_set_on_every_connection()
+    test_journal_mode_override()
+    test_pool_sizing()
+    test_readers_are_not_blocked_by_a_writer()
+    test_pool_is_replaced_after_fork()
+    test_forked_child_opens_its_own_connection()
+    print("✅ All engine factory tests passed!")
@@ -65,8 +65,9 @@ def test_database_initialization():
     # Test 4: Try to import and run the app
     print("\n🚀 Testing app import...")
     try:
-        # Import the app module
+        # Import the app module and prepare it for this database
         import app
+        app.create_app()
         print("✅ App module imported successfully")
         
         # Check if tables are accessible
@@ -83,71 +84,53 @@ def test_database_initialization():
     return True
 
 def test_empty_database():
-    """Test with a completely empty database"""
+    """Test the init command (db_schema.py) with a database that doesn't exist yet"""
     
     print("\n🧪 Testing Empty Database Scenario")
     print("=" * 50)
     
-    # Backup existing database if it exists
-    db_file = 'elements.db'
-    backup_file = 'elements.db.backup'
+    import tempfile
+    import app
+    from db_engine import create_sqlite_engine
+    from db_schema import initialize_database
     
-    if os.path.exists(db_file):
-        print(f"📦 Backing up existing database to {backup_file}")
-        import shutil
-        shutil.copy2(db_file, backup_file)
+    db_file = os.path.join(tempfile.mkdtemp(), 'elements.db')
+    database_url = f'sqlite:///{db_file}'
     
-    # Remove the database file
-    if os.path.exists(db_file):
-        os.remove(db_file)
-        print("🗑️ Removed existing database file")
-    
-    # Try to import the app (this should create the database)
-    print("🔄 Importing app to create new database...")
+    # The app doesn't create the database, it refuses to start without the tables
+    print("🔄 Starting the app without a database...")
     try:
-        import app
-        print("✅ App imported successfully with empty database")
-        
-        # Check if database was created
-        if os.path.exists(db_file):
-            print("✅ Database file was created")
-            
-            # Check if tables were created
-            engine = create_engine('sqlite:///elements.db')
-            metadata = MetaData()
-            metadata.reflect(bind=engine)
-            
-            if 'projects' in metadata.tables and 'areas' in metadata.tables:
-                print("✅ Tables were created successfully")
-                
-                # Check if sample data was added
-                with engine.connect() as conn:
-                    projects_count = conn.execute(select(func.count()).select_from(metadata.tables['projects'])).scalar()
-                    areas_count = conn.execute(select(func.count()).select_from(metadata.tables['areas'])).scalar()
-                    
-                    print(f"📊 Projects in new database: {projects_count}")
-                    print(f"📊 Areas in new database: {areas_count}")
-                    
-                    if projects_count > 0:
-                        print("✅ Sample data was added successfully")
-                    else:
-                        print("⚠️ No sample data was added")
-            else:
-                print("❌ Tables were not created")
-        else:
-            print("❌ Database file was not created")
-            
-    except Exception as e:
-        print(f"❌ App import failed with empty database: {e}")
+        app.create_app(database_url)
+        print("❌ App started without the tables")
         return False
-    
-    # Restore backup if it existed
-    if os.path.exists(backup_file):
-        print(f"🔄 Restoring original database from {backup_file}")
-        import shutil
-        shutil.copy2(backup_file, db_file)
-        os.remove(backup_file)
-        print("✅ Original database restored")
+    except RuntimeError as e:
+        print(f"✅ App refused to start: {e}")
+    
+    # The init command creates the tables, without sample data unless asked for
+    print("🔄 Running the init command...")
+    engine = create_sqlite_engine(db_file)
+    initialize_database(engine)
+    with engine.connect() as conn:
+        projects_count = conn.execute(select(func.count()).select_from(app.projects_table)).scalar()
+    print(f"📊 Projects in new database: {projects_count}")
+    assert projects_count == 0
+    
+    initialize_database(engine, sample_data=True)
+    with engine.connect() as conn:
+        projects_count = conn.execute(select(func.count()).select_from(app.projects_table)).scalar()
+        areas_count = conn.execute(select(func.count()).select_from(app.areas_table)).scalar()
+    print(f"📊 Projects / areas after --sample-data: {projects_count} / {areas_count}")
+    assert projects_count == 2 and areas_count == 2
+    
+    # The app serves the new database
+    try:
+        app.create_app(database_url)
+        status = app.app.test_client().get('/').status_code
+        print(f"✅ App started on the new database, GET / -> {status}")
+        assert status == 200
+    finally:
+        # Back to elements.db for the other tests
+        app.create_app(app.DATABASE_URL)
     
     print("\n🎉 Empty database test completed!")
     return True
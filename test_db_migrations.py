@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Test script for the schema updates of db_migrations.
+Uses a temporary database so elements.db is never touched.
+"""
+
+from sqlalchemy import MetaData, Table, select, text, func, distinct
+
+from db_migrations import (
+    ensure_scale_denominator, ensure_footprint_size, ensure_project_date_iso, ensure_schema,
+    derived_area_values, derived_project_values, schema_version, table_columns,
+    SCALE_DENOMINATOR_INDEX, FOOTPRINT_SIZE_INDEX, PROJECT_DATE_INDEX, LATEST_SCHEMA_VERSION
+)
+from scale_utils import scale_filter, parse_scale_range, scale_range_filters, scale_band_condition, SCALE_BANDS
+from spatial_queries import parse_footprint_size_range, footprint_size_filters
+from date_utils import parse_project_date, parse_date_range, date_range_filters
+from text_search import prefix_filter
+from test_spatial_index import create_test_database
+
+SCALES = ['1:5000', '1:50000', 'Scale: 1:25,000', '1:500', '2.0', 'unknown']
+
+def create_legacy_database():
+    """Database without the scale_denominator column, with one project and some areas"""
+    engine, projects_table, areas_table = create_test_database()
+    with engine.begin() as conn:
+        conn.execute(projects_table.insert().values(
+            uuid='p1', project_name='Test', user_name='tester', date='01-01-24',
+            file_location='sampleDataset/test', paper_size='A4', description=''
+        ))
+        for i, scale in enumerate(SCALES):
+            conn.execute(areas_table.insert().values(
+                project_id='p1', xmin=i, ymin=i, xmax=i + 1, ymax=i + 1, scale=scale
+            ))
+    return engine
+
+def query_plan(conn, stmt):
+    """EXPLAIN QUERY PLAN details of a statement, joined into one string"""
+    compiled = stmt.compile(conn.engine, compile_kwargs={'literal_binds': True})
+    return ' '.join(str(row[-1]) for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+
+def reflect_areas(engine):
+    return Table('areas', MetaData(), autoload_with=engine)
+
+def denominators(engine):
+    with engine.connect() as conn:
+        return dict(conn.execute(text("SELECT scale, scale_denominator FROM areas")).fetchall())
+
+def test_column_is_added_and_backfilled():
+    engine = create_legacy_database()
+    assert ensure_scale_denominator(engine)
+    with engine.connect() as conn:
+        assert 'scale_denominator' in table_columns(conn, 'areas')
+    assert denominators(engine) == {
+        '1:5000': 5000, '1:50000': 50000, 'Scale: 1:25,000': 25000,
+        '1:500': 500, '2.0': 2, 'unknown': None
+    }
+    # Running it again changes nothing
+    assert ensure_scale_denominator(engine)
+    assert denominators(engine)['1:50000'] == 50000
+
+def test_triggers_fill_rows_of_other_writers():
+    engine = create_legacy_database()
+    ensure_scale_denominator(engine)
+    with engine.begin() as conn:
+        # Writers that don't know about the column (e.g. the ArcGIS toolbox)
+        conn.execute(text(
+            "INSERT INTO areas (project_id, xmin, ymin, xmax, ymax, scale) VALUES ('p1', 0, 0, 1, 1, 'Scale: 1:10,000')"
+        ))
+        conn.execute(text("UPDATE areas SET scale = '1:2500' WHERE scale = '1:500'"))
+    values = denominators(engine)
+    assert values['Scale: 1:10,000'] == 10000
+    assert values['1:2500'] == 2500
+
+def test_scale_filter_matches_exact_denominator():
+    engine = create_legacy_database()
+    ensure_scale_denominator(engine)
+    areas_table = reflect_areas(engine)
+    with engine.connect() as conn:
+        def scales(condition):
+            return sorted(conn.execute(select(areas_table.c.scale).where(condition)).scalars())
+        # The old ilike('%5000%') also matched 1:50000
+        assert scales(scale_filter(areas_table, '1:5000')) == ['1:5000']
+        assert scales(scale_filter(areas_table, '1:25000')) == ['Scale: 1:25,000']
+        # Legacy values keep working
+        assert scales(scale_filter(areas_table, '2')) == ['2.0']
+        assert scales(scale_filter(areas_table, 'unk')) == ['unknown']
+
+def test_scale_range_uses_index():
+    engine = create_legacy_database()
+    ensure_scale_denominator(engine)
+    areas_table = reflect_areas(engine)
+    scale_min, scale_max, error = parse_scale_range('5000', '1:25000')
+    assert error is None and (scale_min, scale_max) == (5000, 25000)
+
+    stmt = select(areas_table.c.scale).where(*scale_range_filters(areas_table, scale_min, scale_max))
+    with engine.connect() as conn:
+        assert sorted(conn.execute(stmt).scalars()) == ['1:5000', 'Scale: 1:25,000']
+        plan = query_plan(conn, stmt)
+    assert SCALE_DENOMINATOR_INDEX in plan
+
+def test_band_condition_uses_column():
+    engine = create_legacy_database()
+    ensure_scale_denominator(engine)
+    areas_table = reflect_areas(engine)
+    with engine.connect() as conn:
+        for band, (name, _) in enumerate(SCALE_BANDS):
+            scales = sorted(conn.execute(select(areas_table.c.scale).where(scale_band_condition(areas_table, band))).scalars())
+            if name == '5k':
+                assert scales == ['1:500', '1:5000', '2.0']
+            elif name == '100k':
+                assert scales == ['1:50000']
+
+def test_parse_scale_range_errors():
+    assert parse_scale_range('', None) == (None, None, None)
+    assert parse_scale_range('abc', '')[2] is not None
+    assert parse_scale_range('50000', '5000')[2] is not None
+
+def footprint_sizes(engine):
+    with engine.connect() as conn:
+        return {row[0]: tuple(row[1:]) for row in conn.execute(text("SELECT id, width, height, area_m2 FROM areas"))}
+
+def test_footprint_size_is_backfilled_and_maintained():
+    engine = create_legacy_database()
+    assert ensure_footprint_size(engine)
+    # create_legacy_database() areas are 1 x 1 m squares
+    assert set(footprint_sizes(engine).values()) == {(1.0, 1.0, 1.0)}
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO areas (project_id, xmin, ymin, xmax, ymax, scale) VALUES ('p1', 0, 0, 4000, 3000, '1:5000')"
+        ))
+        new_id = conn.execute(text("SELECT max(id) FROM areas")).scalar()
+        conn.execute(text("UPDATE areas SET xmax = 2 WHERE id = 1"))
+    sizes = footprint_sizes(engine)
+    assert sizes[new_id] == (4000.0, 3000.0, 12000000.0)
+    assert sizes[1] == (2.0, 1.0, 2.0)
+
+def test_derived_area_values_match_triggers():
+    engine = create_legacy_database()
+    ensure_schema(engine)
+    areas_table = reflect_areas(engine)
+    values = derived_area_values(areas_table, 100, 200, 1100, 700, 'Scale: 1:25,000')
+    assert values == {'scale_denominator': 25000, 'width': 1000, 'height': 500, 'area_m2': 500000}
+    # Tables without the derived columns get none of them
+    legacy_table = create_test_database()[2]
+    assert derived_area_values(legacy_table, 0, 0, 1, 1, '1:5000') == {}
+
+def test_footprint_size_range_uses_index():
+    engine = create_legacy_database()
+    ensure_schema(engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO areas (project_id, xmin, ymin, xmax, ymax, scale) VALUES ('p1', 0, 0, 5000, 4000, '1:5000')"
+        ))
+    areas_table = reflect_areas(engine)
+    min_area_m2, max_area_m2, error = parse_footprint_size_range('10', '')
+    assert error is None and min_area_m2 == 10e6 and max_area_m2 is None
+
+    stmt = select(areas_table.c.xmax).where(*footprint_size_filters(areas_table, min_area_m2, max_area_m2))
+    with engine.connect() as conn:
+        assert list(conn.execute(stmt).scalars()) == [5000]
+        plan = query_plan(conn, stmt)
+    assert FOOTPRINT_SIZE_INDEX in plan
+
+    # Without the column the same filter is computed from the corners
+    legacy_engine, _, legacy_table = create_test_database()
+    with legacy_engine.begin() as conn:
+        conn.execute(text("INSERT INTO projects VALUES ('p1', 'Test', 'tester', '01-01-24', 'x', 'A4', '')"))
+        conn.execute(text("INSERT INTO areas (project_id, xmin, ymin, xmax, ymax, scale) VALUES ('p1', 0, 0, 5000, 4000, '1:5000')"))
+        conn.execute(text("INSERT INTO areas (project_id, xmin, ymin, xmax, ymax, scale) VALUES ('p1', 0, 0, 10, 10, '1:5000')"))
+    with legacy_engine.connect() as conn:
+        stmt = select(legacy_table.c.xmax).where(*footprint_size_filters(legacy_table, min_area_m2, max_area_m2))
+        assert list(conn.execute(stmt).scalars()) == [5000]
+
+def test_parse_footprint_size_range_errors():
+    assert parse_footprint_size_range(None, '') == (None, None, None)
+    assert parse_footprint_size_range('big', '')[2] is not None
+    assert parse_footprint_size_range('-1', '')[2] is not None
+    assert parse_footprint_size_range('5', '1')[2] is not None
+
+PROJECT_DATES = {'p2': '15-11-24', 'p3': '02-01-25', 'p4': '31-12-24', 'p5': '28-02-25', 'p6': 'sometime'}
+
+def create_dated_database():
+    """Legacy database with projects dated in the toolbox's DD-MM-YY format"""
+    engine = create_legacy_database()
+    with engine.begin() as conn:
+        for uuid, value in PROJECT_DATES.items():
+            conn.execute(text(
+                "INSERT INTO projects VALUES (:uuid, 'Dated', 'tester', :date, 'x', 'A4', '')"
+            ), {'uuid': uuid, 'date': value})
+    return engine
+
+def reflect_projects(engine):
+    return Table('projects', MetaData(), autoload_with=engine)
+
+def test_parse_project_date():
+    assert parse_project_date('05-08-25') == '2025-08-05'
+    assert parse_project_date('9/7/2025') == '2025-07-09'
+    assert parse_project_date('2025-07-09') == '2025-07-09'
+    assert parse_project_date('31-02-24') is None
+    assert parse_project_date('sometime') is None
+    assert parse_date_range('15/11/2024', '')[:2] == ('2024-11-15', None)
+    assert parse_date_range('', '40/01/2025')[2] is not None
+
+def test_project_dates_are_backfilled_and_maintained():
+    engine = create_dated_database()
+    assert ensure_project_date_iso(engine)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO projects VALUES ('p7', 'New', 'tester', '05-08-25', 'x', 'A4', '', NULL)"))
+        conn.execute(text("UPDATE projects SET date = '01-03-25' WHERE uuid = 'p5'"))
+        dates = dict(conn.execute(text("SELECT uuid, date_iso FROM projects")).fetchall())
+    assert dates == {
+        'p1': '2024-01-01', 'p2': '2024-11-15', 'p3': '2025-01-02', 'p4': '2024-12-31',
+        'p5': '2025-03-01', 'p6': None, 'p7': '2025-08-05'
+    }
+    projects_table = reflect_projects(engine)
+    assert derived_project_values(projects_table, {'date': '05-08-25'}) == {'date_iso': '2025-08-05'}
+    assert derived_project_values(projects_table, {'date': '05-08-25', 'date_iso': '2025-08-06'}) == {'date_iso': '2025-08-06'}
+
+def test_date_range_is_chronological_and_indexed():
+    engine = create_dated_database()
+    ensure_schema(engine)
+    projects_table = reflect_projects(engine)
+    date_from, date_to, error = parse_date_range('01/12/2024', '31/01/2025')
+    assert error is None
+    stmt = select(projects_table.c.uuid).where(*date_range_filters(projects_table, date_from, date_to))
+    with engine.connect() as conn:
+        # As DD-MM-YY text, '02-01-25' < '01-12-24' and the range would be empty
+        assert sorted(conn.execute(stmt).scalars()) == ['p3', 'p4']
+        plan = query_plan(conn, stmt)
+    assert PROJECT_DATE_INDEX in plan
+
+    # Without the column the dates are converted in the query
+    legacy_projects = create_test_database()[1]
+    with engine.connect() as conn:
+        stmt = select(legacy_projects.c.uuid).where(*date_range_filters(legacy_projects, date_from, date_to))
+        assert sorted(conn.execute(stmt).scalars()) == ['p3', 'p4']
+
+def test_migrations_are_versioned():
+    engine = create_legacy_database()
+    with engine.connect() as conn:
+        assert schema_version(conn) == 0
+    assert ensure_schema(engine, target=2) == 2
+    with engine.connect() as conn:
+        assert 'area_m2' in table_columns(conn, 'areas')
+        assert 'date_iso' not in table_columns(conn, 'projects')
+    assert ensure_schema(engine) == LATEST_SCHEMA_VERSION
+    # Up to date databases are left alone
+    assert ensure_schema(engine) == LATEST_SCHEMA_VERSION
+
+def test_migrations_wait_for_the_tables():
+    engine, projects_table, areas_table = create_test_database()
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE areas"))
+    assert ensure_schema(engine) == 0
+    areas_table.create(engine)
+    assert ensure_schema(engine) == LATEST_SCHEMA_VERSION
+
+def test_hot_queries_use_indexes():
+    engine = create_legacy_database()
+    ensure_schema(engine)
+    projects_table = reflect_projects(engine)
+    areas_table = reflect_areas(engine)
+    with engine.connect() as conn:
+        # Areas of one project (project page, delete, downloads)
+        stmt = select(areas_table).where(areas_table.c.project_id == 'p1')
+        assert 'USING INDEX idx_areas_project_id' in query_plan(conn, stmt)
+
+        # Projects with their aggregated scales (search results, All Projects table)
+        stmt = select(
+            projects_table.c.uuid, func.group_concat(distinct(areas_table.c.scale))
+        ).select_from(
+            projects_table.outerjoin(areas_table, projects_table.c.uuid == areas_table.c.project_id)
+        ).group_by(projects_table.c.uuid)
+        assert 'SEARCH areas USING INDEX idx_areas_project_id' in query_plan(conn, stmt)
+
+        for column, index in (('user_name', 'idx_projects_user_name'),
+                              ('paper_size', 'idx_projects_paper_size'),
+                              ('file_location', 'idx_projects_file_location')):
+            stmt = select(projects_table.c.uuid).where(projects_table.c[column] == 'x')
+            assert index in query_plan(conn, stmt)
+
+def test_prefix_filters_use_nocase_indexes():
+    engine = create_dated_database()
+    ensure_schema(engine)
+    projects_table = reflect_projects(engine)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE projects SET user_name = 'Yoav Cohen' WHERE uuid IN ('p2', 'p3')"))
+    with engine.connect() as conn:
+        stmt = select(projects_table.c.uuid).where(prefix_filter(projects_table.c.user_name, 'yoav'))
+        # Case-insensitive like the ilike() filters it replaces
+        assert sorted(conn.execute(stmt).scalars()) == ['p2', 'p3']
+        assert 'idx_projects_user_name_nocase' in query_plan(conn, stmt)
+
+        for column in ('uuid', 'project_name', 'date', 'file_location', 'paper_size'):
+            stmt = select(projects_table.c.uuid).where(prefix_filter(projects_table.c[column], 'x'))
+            assert f'idx_projects_{column}_nocase' in query_plan(conn, stmt)
+
+def test_associated_scales_are_materialized():
+    engine = create_legacy_database()
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO projects (uuid, project_name, user_name, date, file_location, paper_size) "
+                          "VALUES ('p2', 'Empty', 'tester', '01-01-24', 'x', 'A4')"))
+        conn.execute(text("INSERT INTO areas (project_id, xmin, ymin, xmax, ymax, scale) VALUES ('p1', 0, 0, 1, 1, '1:5000')"))
+    ensure_schema(engine)
+
+    def scales():
+        with engine.connect() as conn:
+            return dict(conn.execute(text("SELECT uuid, associated_scales FROM projects")).fetchall())
+
+    # Distinct, in the order the frames were added (by area id)
+    assert scales() == {'p1': ','.join(SCALES), 'p2': None}
+
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO areas (project_id, xmin, ymin, xmax, ymax, scale) VALUES ('p2', 0, 0, 1, 1, '1:1250')"))
+        conn.execute(text("UPDATE areas SET scale = '1:2500' WHERE project_id = 'p1' AND scale = 'unknown'"))
+        conn.execute(text("UPDATE areas SET project_id = 'p2' WHERE project_id = 'p1' AND scale = '1:500'"))
+        conn.execute(text("DELETE FROM areas WHERE project_id = 'p1' AND scale = '2.0'"))
+    assert scales() == {'p1': '1:5000,1:50000,Scale: 1:25,000,1:2500', 'p2': '1:500,1:1250'}
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM areas WHERE project_id = 'p2'"))
+    assert scales()['p2'] is None
+
+    # The project list reads projects only
+    projects_table = reflect_projects(engine)
+    with engine.connect() as conn:
+        stmt = select(projects_table.c.uuid, projects_table.c.associated_scales).order_by(projects_table.c.uuid)
+        assert 'areas' not in query_plan(conn, stmt)
+
+if __name__ == "__main__":
+    test_column_is_added_and_backfilled()
+    test_triggers_fill_rows_of_other_writers()
+    test_scale_filter_matches_exact_denominator()
+    test_scale_range_uses_index()
+    test_band_condition_uses_column()
+    test_parse_scale_range_errors()
+    test_footprint_size_is_backfilled_and_maintained()
+    test_derived_area_values_match_triggers()
+    test_footprint_size_range_uses_index()
+    test_parse_footprint_size_range_errors()
+    test_parse_project_date()
+    test_project_dates_are_backfilled_and_maintained()
+    test_date_range_is_chronological_and_indexed()
+    test_migrations_are_versioned()
+    test_migrations_wait_for_the_tables()
+    test_hot_queries_use_indexes()
+    test_prefix_filters_use_nocase_indexes()
+    test_associated_scales_are_materialized()
+    print("✅ All schema update tests passed!")
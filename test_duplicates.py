@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Test script for the near-duplicate map frame job.
+Uses a temporary database so elements.db is never touched.
+"""
+
+import os
+import random
+import sys
+import tempfile
+
+from werkzeug.datastructures import MultiDict
+from sqlalchemy import text
+
+from duplicates import (
+    ensure_duplicates_table, refresh_duplicate_candidates, list_duplicate_candidates,
+    duplicate_pairs_select, parse_duplicates_args, parse_iou_threshold, main
+)
+from db_engine import create_sqlite_engine
+from db_schema import initialize_database
+from spatial_index import ensure_areas_rtree
+from test_spatial_index import create_test_database
+
+def iou(a, b):
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union
+
+def create_catalog(n=300, seed=7):
+    """Random frames plus a few re-exports (slightly shifted copies) in other projects"""
+    engine, projects_table, areas_table = create_test_database()
+    rng = random.Random(seed)
+    frames = {}
+    with engine.begin() as conn:
+        for uuid in ('p1', 'p2', 'p3'):
+            conn.execute(projects_table.insert().values(
+                uuid=uuid, project_name=f'Project {uuid}', user_name='tester', date='01-01-24',
+                file_location='sampleDataset/test', paper_size='A4', description=''
+            ))
+        for i in range(n):
+            x = 700000 + rng.uniform(0, 50000)
+            y = 3500000 + rng.uniform(0, 50000)
+            w, h = rng.uniform(500, 5000), rng.uniform(500, 5000)
+            box = (x, y, x + w, y + h)
+            project = rng.choice(('p1', 'p2'))
+            area_id = conn.execute(areas_table.insert().values(
+                project_id=project, xmin=box[0], ymin=box[1], xmax=box[2], ymax=box[3], scale='1:5000'
+            )).inserted_primary_key[0]
+            frames[area_id] = (project, box)
+            if i % 25 == 0:
+                # Re-export of the same layout, shifted by a few meters
+                copy = (box[0] + 5, box[1] - 3, box[2] + 5, box[3] - 3)
+                copy_id = conn.execute(areas_table.insert().values(
+                    project_id='p3', xmin=copy[0], ymin=copy[1], xmax=copy[2], ymax=copy[3], scale='1:5000'
+                )).inserted_primary_key[0]
+                frames[copy_id] = ('p3', copy)
+    ensure_areas_rtree(engine)
+    ensure_duplicates_table(engine)
+    return engine, projects_table, areas_table, frames
+
+def brute_force_pairs(frames, threshold):
+    ids = sorted(frames)
+    return {(a, b) for i, a in enumerate(ids) for b in ids[i + 1:]
+            if iou(frames[a][1], frames[b][1]) >= threshold}
+
+def test_pairs_match_brute_force():
+    engine, projects_table, areas_table, frames = create_catalog()
+    for threshold in (0.9, 0.5, 0.1):
+        expected = brute_force_pairs(frames, threshold)
+        for use_index in (True, False):
+            with engine.connect() as conn:
+                rows = conn.execute(duplicate_pairs_select(areas_table, threshold, use_index=use_index)).fetchall()
+            assert {(row.area_id, row.other_area_id) for row in rows} == expected
+            for row in rows:
+                assert abs(row.iou - iou(frames[row.area_id][1], frames[row.other_area_id][1])) < 1e-9
+                assert bool(row.same_project) == (frames[row.area_id][0] == frames[row.other_area_id][0])
+
+def test_refresh_and_list():
+    engine, projects_table, areas_table, frames = create_catalog()
+    count = refresh_duplicate_candidates(engine, areas_table, 0.9)
+    assert count == len(brute_force_pairs(frames, 0.9)) >= 12
+    # Refreshing replaces the previous results
+    assert refresh_duplicate_candidates(engine, areas_table, 0.9) == count
+
+    with engine.connect() as conn:
+        pairs = list_duplicate_candidates(conn, projects_table)
+        assert [p['iou'] for p in pairs] == sorted((p['iou'] for p in pairs), reverse=True)
+        assert all(p['other_project_name'] == 'Project p3' for p in pairs if p['other_project_id'] == 'p3')
+        across = list_duplicate_candidates(conn, projects_table, same_project=False, project_id='p3')
+        assert across and all('p3' in (p['project_id'], p['other_project_id']) for p in across)
+        assert len(list_duplicate_candidates(conn, projects_table, limit=3)) == 3
+
+    # Deleting a frame drops its pairs
+    area_id = pairs[0]['area_id']
+    with engine.begin() as conn:
+        conn.execute(areas_table.delete().where(areas_table.c.id == area_id))
+    with engine.connect() as conn:
+        remaining = conn.execute(text(
+            "SELECT count(*) FROM duplicate_candidates WHERE area_id = :id OR other_area_id = :id"
+        ), {'id': area_id}).scalar()
+    assert remaining == 0
+
+def test_query_plan_uses_rtree():
+    engine, projects_table, areas_table, frames = create_catalog(n=20)
+    stmt = duplicate_pairs_select(areas_table, 0.9)
+    compiled = stmt.compile(engine, compile_kwargs={'literal_binds': True})
+    with engine.connect() as conn:
+        plan = ' '.join(str(row[-1]) for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+    assert 'areas_rtree VIRTUAL TABLE INDEX' in plan
+
+def test_parse_args():
+    assert parse_iou_threshold('') == (0.9, None)
+    assert parse_iou_threshold('0')[1] is not None
+    assert parse_iou_threshold('1.5')[1] is not None
+    options, error = parse_duplicates_args(MultiDict({'min_iou': '0.95', 'same_project': 'false', 'limit': '5'}))
+    assert error is None
+    assert options == {'min_iou': 0.95, 'project_id': '', 'same_project': False, 'limit': 5, 'offset': 0}
+    assert parse_duplicates_args(MultiDict({'same_project': 'maybe'}))[1] is not None
+    assert parse_duplicates_args(MultiDict({'limit': '0'}))[1] is not None
+
+def run_main(database):
+    argv = sys.argv
+    sys.argv = ['duplicates.py', '--database', database]
+    try:
+        main()
+    finally:
+        sys.argv = argv
+
+def test_main_requires_initialized_database():
+    database = os.path.join(tempfile.mkdtemp(), 'elements.db')
+    try:
+        run_main(database)
+        assert False, 'duplicates.py ran without the tables'
+    except SystemExit as e:
+        assert e.code == 2
+    engine = create_sqlite_engine(database)
+    initialize_database(engine, sample_data=True)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO areas (project_id, xmin, ymin, xmax, ymax, scale) "
+            "SELECT project_id, xmin + 1, ymin, xmax + 1, ymax, scale FROM areas"
+        ))
+    run_main(database)
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM duplicate_candidates")).scalar() == 2
+
+if __name__ == "__main__":
+    test_pairs_match_brute_force()
+    test_refresh_and_list()
+    test_query_plan_uses_rtree()
+    test_parse_args()
+    test_main_requires_initialized_database()
+    print("✅ All duplicate detection tests passed!")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script for the intersection range filter.
+Compares the bulk/vectorized filter and the SQL filter with the original
+per-project loop.
+"""
+
+import random
+from sqlalchemy import select
+
+from intersection_filter import projects_in_intersection_range, intersection_range_filter
+from test_spatial_index import create_test_database
+
+def per_project_loop(conn, areas_table, project_uuids, xmin, ymin, xmax, ymax, range_from, range_to):
+    """The original N+1 implementation from app.index(), kept as reference"""
+    required_area = (xmax - xmin) * (ymax - ymin)
+    matching = set()
+    for project_uuid in project_uuids:
+        for area in conn.execute(select(areas_table).where(areas_table.c.project_id == project_uuid)):
+            intersect_xmin = max(area.xmin, xmin)
+            intersect_ymin = max(area.ymin, ymin)
+            intersect_xmax = min(area.xmax, xmax)
+            intersect_ymax = min(area.ymax, ymax)
+            if intersect_xmin < intersect_xmax and intersect_ymin < intersect_ymax:
+                intersection_area = (intersect_xmax - intersect_xmin) * (intersect_ymax - intersect_ymin)
+                intersection_pct = (intersection_area / required_area) * 100 if required_area > 0 else 0
+                if range_from <= intersection_pct <= range_to:
+                    matching.add(project_uuid)
+                    break
+    return matching
+
+def create_random_catalog(project_count=40, areas_per_project=5, seed=7):
+    engine, projects_table, areas_table = create_test_database()
+    rng = random.Random(seed)
+    with engine.begin() as conn:
+        for p in range(project_count):
+            uuid = f"proj{p:04d}"
+            conn.execute(projects_table.insert().values(
+                uuid=uuid, project_name=uuid, user_name='tester', date='01-01-24',
+                file_location=f'sampleDataset/{uuid}', paper_size='A4', description=''
+            ))
+            for _ in range(areas_per_project):
+                x = rng.uniform(700000, 720000)
+                y = rng.uniform(3500000, 3520000)
+                conn.execute(areas_table.insert().values(
+                    project_id=uuid, xmin=x, ymin=y, xmax=x + rng.uniform(500, 8000),
+                    ymax=y + rng.uniform(500, 8000), scale='1:5000'
+                ))
+    return engine, [f"proj{p:04d}" for p in range(project_count)], areas_table, projects_table
+
+def test_matches_per_project_loop():
+    engine, uuids, areas_table, projects_table = create_random_catalog()
+    query_box = (705000, 3505000, 712000, 3511000)
+    with engine.connect() as conn:
+        for range_from, range_to in [(0, 100), (10, 20), (0, 5), (50, 1000), (0, 0)]:
+            expected = per_project_loop(conn, areas_table, uuids, *query_box, range_from, range_to)
+            actual = projects_in_intersection_range(conn, areas_table, uuids, *query_box, range_from, range_to)
+            assert actual == expected, (range_from, range_to)
+
+def test_sql_filter_matches_per_project_loop():
+    engine, uuids, areas_table, projects_table = create_random_catalog()
+    query_box = (705000, 3505000, 712000, 3511000)
+    with engine.connect() as conn:
+        for range_from, range_to in [(0, 100), (10, 20), (0, 5), (50, 1000), (0, 0)]:
+            expected = per_project_loop(conn, areas_table, uuids, *query_box, range_from, range_to)
+            stmt = select(projects_table.c.uuid).where(
+                intersection_range_filter(projects_table, areas_table, *query_box, range_from, range_to)
+            )
+            assert set(conn.execute(stmt).scalars()) == expected, (range_from, range_to)
+
+def test_only_given_projects_are_considered():
+    engine, uuids, areas_table, projects_table = create_random_catalog()
+    with engine.connect() as conn:
+        subset = uuids[:5]
+        result = projects_in_intersection_range(conn, areas_table, subset, 700000, 3500000, 730000, 3530000, 0, 100)
+        assert result <= set(subset)
+        assert projects_in_intersection_range(conn, areas_table, [], 700000, 3500000, 730000, 3530000, 0, 100) == set()
+
+if __name__ == "__main__":
+    test_matches_per_project_loop()
+    test_sql_filter_matches_per_project_loop()
+    test_only_given_projects_are_considered()
+    print("✅ All intersection filter tests passed!")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory packed spatial index.
+Compares the STR-packed tree against a brute force scan and checks the
+incremental updates and the stale detection against a temporary database.
+"""
+
+import numpy as np
+from sqlalchemy import text
+
+from packed_index import PackedAreaIndex
+from test_spatial_index import create_test_database, insert_sample_areas
+
+def brute_force_inside(ids, bounds, xmin, ymin, xmax, ymax):
+    mask = (bounds[:, 0] >= xmin) & (bounds[:, 2] <= xmax) & (bounds[:, 1] >= ymin) & (bounds[:, 3] <= ymax)
+    return sorted(ids[mask].tolist())
+
+def random_areas(n, seed=42):
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(600000, 800000, n)
+    y = rng.uniform(3400000, 3700000, n)
+    bounds = np.column_stack((x, y, x + rng.uniform(100, 5000, n), y + rng.uniform(100, 5000, n)))
+    return np.arange(1, n + 1), bounds
+
+def test_packed_tree_matches_brute_force():
+    ids, bounds = random_areas(20000)
+    index = PackedAreaIndex(None)
+    index._pack(ids, bounds)
+    index.loaded = True
+
+    for box in [(650000, 3500000, 700000, 3550000), (0, 0, 10, 10), (600000, 3400000, 810000, 3710000)]:
+        assert sorted(index.search_inside(*box).tolist()) == brute_force_inside(ids, bounds, *box)
+
+def test_incremental_updates():
+    ids, bounds = random_areas(1000)
+    index = PackedAreaIndex(None)
+    index._pack(ids, bounds)
+    index.loaded = True
+    everything = (0, 0, 10 ** 7, 10 ** 7)
+
+    index.add_areas([(1001, 700000, 3500000, 700100, 3500100, '1:5000')])
+    index.remove_areas([5, 1001])
+    index.remove_areas([7])
+    result = set(index.search_inside(*everything).tolist())
+    assert 5 not in result and 7 not in result and 1001 not in result
+    assert len(result) == index.count == 998
+
+    # Enough deletions trigger a repack from memory
+    index.remove_areas(range(100, 400))
+    assert index._deleted == 0
+    assert len(index.search_inside(*everything)) == index.count == 698
+
+def brute_force_distances(bounds, x, y):
+    dx = np.maximum(np.maximum(bounds[:, 0] - x, x - bounds[:, 2]), 0)
+    dy = np.maximum(np.maximum(bounds[:, 1] - y, y - bounds[:, 3]), 0)
+    return np.hypot(dx, dy)
+
+def test_nearest_matches_brute_force():
+    ids, bounds = random_areas(5000)
+    index = PackedAreaIndex(None)
+    index._pack(ids, bounds)
+    index.loaded = True
+    index.add_areas([(5001, 700000, 3500000, 700100, 3500100, '1:5000')])
+    index.remove_areas([17])
+    all_ids = np.append(ids, 5001)
+    all_bounds = np.vstack((bounds, [(700000, 3500000, 700100, 3500100)]))
+    alive = all_ids != 17
+
+    for x, y in [(700050, 3500050), (650000, 3450000), (0, 0)]:
+        expected = np.sort(brute_force_distances(all_bounds[alive], x, y))[:25]
+        result = index.nearest(x, y, 25)
+        assert np.allclose([d for d, _ in result], expected)
+        for d, area_id in result:
+            assert np.isclose(brute_force_distances(all_bounds[all_ids == area_id], x, y)[0], d)
+    assert index.nearest(700050, 3500050, 1)[0] == (0.0, 5001)
+
+def test_scale_band_partitions():
+    ids, bounds = random_areas(3000)
+    bands = np.arange(3000) % 5  # four bands plus unknown scales
+    index = PackedAreaIndex(None)
+    index._pack(ids, bounds, bands.astype(np.int8))
+    index.loaded = True
+    index.add_areas([(3001, 700000, 3500000, 700100, 3500100, '1:50000')])
+    box = (650000, 3450000, 750000, 3550000)
+
+    everything = set(index.search('intersects', *box).tolist())
+    for band in range(4):
+        expected = set(ids[(bands == band)].tolist()) | ({3001} if band == 2 else set())
+        result = set(index.search('intersects', *box, band=band).tolist())
+        assert result == everything & expected
+        nearest = index.nearest(700050, 3500050, 10, band=band)
+        assert all(area_id in expected for _, area_id in nearest) and len(nearest) == 10
+    assert index.nearest(700050, 3500050, 1, band=2)[0] == (0.0, 3001)
+
+def test_stale_detection():
+    engine, projects_table, areas_table = create_test_database()
+    insert_sample_areas(engine, projects_table, areas_table)
+    index = PackedAreaIndex(engine, check_interval=0)
+    assert index.ensure_fresh()
+    assert index.count == 50 and not index.is_stale()
+
+    # Another worker writes to the table: this worker must notice
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM areas WHERE id = 50"))
+    assert index.is_stale()
+    assert index.ensure_fresh()
+    assert index.count == 49 and not index.is_stale()
+
+if __name__ == "__main__":
+    test_packed_tree_matches_brute_force()
+    test_incremental_updates()
+    test_nearest_matches_brute_force()
+    test_scale_band_partitions()
+    test_stale_detection()
+    print("✅ All packed index tests passed!")
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Test script for the areas R*Tree spatial index.
+Uses a temporary database so elements.db is never touched.
+"""
+
+import os
+import tempfile
+from sqlalchemy import create_engine, MetaData, Table, Column, String, Float, Integer, ForeignKey, select, text
+
+from spatial_index import ensure_areas_rtree, inside_bbox_filter, bbox_predicate_filter, RTREE_TABLE, SPATIAL_PREDICATES
+from packed_index import PackedAreaIndex
+from scale_utils import scale_band_code, SCALE_BANDS
+
+def create_test_database():
+    """Create a temporary database with the same schema as app.initialize_database()"""
+    db_file = os.path.join(tempfile.mkdtemp(), 'test_elements.db')
+    engine = create_engine(f'sqlite:///{db_file}')
+    metadata = MetaData()
+    projects_table = Table('projects', metadata,
+        Column('uuid', String, primary_key=True),
+        Column('project_name', String, nullable=False),
+        Column('user_name', String, nullable=False),
+        Column('date', String, nullable=False),
+        Column('file_location', String, nullable=False),
+        Column('paper_size', String, nullable=False),
+        Column('description', String, nullable=True)
+    )
+    areas_table = Table('areas', metadata,
+        Column('id', Integer, primary_key=True, autoincrement=True),
+        Column('project_id', String, ForeignKey('projects.uuid'), nullable=False),
+        Column('xmin', Float, nullable=False),
+        Column('ymin', Float, nullable=False),
+        Column('xmax', Float, nullable=False),
+        Column('ymax', Float, nullable=False),
+        Column('scale', String, nullable=False)
+    )
+    metadata.create_all(engine)
+    return engine, projects_table, areas_table
+
+def insert_sample_areas(engine, projects_table, areas_table):
+    with engine.begin() as conn:
+        conn.execute(projects_table.insert().values(
+            uuid='p1', project_name='Test', user_name='tester', date='01-01-24',
+            file_location='sampleDataset/test', paper_size='A4', description=''
+        ))
+        for i in range(50):
+            x = 700000 + i * 1000
+            y = 3500000 + i * 1000
+            conn.execute(areas_table.insert().values(
+                project_id='p1', xmin=x, ymin=y, xmax=x + 500.25, ymax=y + 500.75, scale='1:5000'
+            ))
+
+def test_existing_rows_are_backfilled():
+    engine, projects_table, areas_table = create_test_database()
+    insert_sample_areas(engine, projects_table, areas_table)
+
+    assert ensure_areas_rtree(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text(f"SELECT count(*) FROM {RTREE_TABLE}")).scalar() == 50
+
+    # Running it again must be harmless
+    assert ensure_areas_rtree(engine)
+    with engine.connect() as conn:
+        assert conn.execute(text(f"SELECT count(*) FROM {RTREE_TABLE}")).scalar() == 50
+
+def test_triggers_keep_index_in_sync():
+    engine, projects_table, areas_table = create_test_database()
+    assert ensure_areas_rtree(engine)
+    insert_sample_areas(engine, projects_table, areas_table)
+
+    with engine.begin() as conn:
+        conn.execute(areas_table.update().where(areas_table.c.id == 1).values(xmin=1, xmax=2))
+        conn.execute(areas_table.delete().where(areas_table.c.id == 2))
+
+        assert conn.execute(text(f"SELECT count(*) FROM {RTREE_TABLE}")).scalar() == 49
+        minx, maxx = conn.execute(text(f"SELECT minx, maxx FROM {RTREE_TABLE} WHERE id = 1")).first()
+        assert minx <= 1 and maxx >= 2
+
+def test_indexed_filter_matches_scan():
+    engine, projects_table, areas_table = create_test_database()
+    assert ensure_areas_rtree(engine)
+    insert_sample_areas(engine, projects_table, areas_table)
+
+    boxes = [
+        (700000, 3500000, 710000, 3510000),
+        (700000, 3500000, 700500.25, 3500500.75),  # exact fit of the first area
+        (700001, 3500000, 750000, 3550000),
+        (0, 0, 10, 10),
+    ]
+    with engine.connect() as conn:
+        for box in boxes:
+            scan = select(areas_table.c.id).where(inside_bbox_filter(areas_table, *box, use_index=False))
+            indexed = select(areas_table.c.id).where(inside_bbox_filter(areas_table, *box))
+            assert sorted(conn.execute(scan).scalars()) == sorted(conn.execute(indexed).scalars())
+
+def test_predicates_match_scan():
+    engine, projects_table, areas_table = create_test_database()
+    assert ensure_areas_rtree(engine)
+    insert_sample_areas(engine, projects_table, areas_table)
+    area_index = PackedAreaIndex(engine)
+
+    boxes = [
+        (700000, 3500000, 710000, 3510000),
+        (700200, 3500200, 700300, 3500300),  # inside the first area
+        (700250, 3500250, 700250, 3500250),  # a single point
+        (700500.25, 3500500.75, 701000, 3501000),  # touches the first and second area at a corner
+    ]
+    with engine.connect() as conn:
+        for predicate in SPATIAL_PREDICATES:
+            for box in boxes:
+                scan = select(areas_table.c.id).where(bbox_predicate_filter(areas_table, predicate, *box, use_index=False))
+                rtree = select(areas_table.c.id).where(bbox_predicate_filter(areas_table, predicate, *box))
+                memory = select(areas_table.c.id).where(bbox_predicate_filter(areas_table, predicate, *box, area_index=area_index))
+                expected = sorted(conn.execute(scan).scalars())
+                assert sorted(conn.execute(rtree).scalars()) == expected, (predicate, box)
+                assert sorted(conn.execute(memory).scalars()) == expected, (predicate, box)
+
+        # Sanity check of the semantics on the first area
+        contains = select(areas_table.c.id).where(bbox_predicate_filter(areas_table, 'contains', *boxes[2]))
+        touching = select(areas_table.c.id).where(bbox_predicate_filter(areas_table, 'intersects', *boxes[3]))
+        assert list(conn.execute(contains).scalars()) == [1]
+        assert sorted(conn.execute(touching).scalars()) == [1, 2]  # corners of both neighbours
+
+def test_scale_band_filter():
+    engine, projects_table, areas_table = create_test_database()
+    assert ensure_areas_rtree(engine)
+    insert_sample_areas(engine, projects_table, areas_table)
+    scales = ['1:1000', '1:25000', 'Scale: 1:50,000', '1:250000', 'unknown', '1:5,001']
+    with engine.begin() as conn:
+        for i in range(1, 51):
+            conn.execute(text("UPDATE areas SET scale = :s WHERE id = :i"), {'s': scales[i % len(scales)], 'i': i})
+    area_index = PackedAreaIndex(engine)
+    box = (700000, 3500000, 740000, 3540000)
+
+    with engine.connect() as conn:
+        rows = conn.execute(select(areas_table.c.id, areas_table.c.scale, areas_table.c.xmax)).fetchall()
+        for band in range(len(SCALE_BANDS)):
+            expected = sorted(row.id for row in rows if scale_band_code(row.scale) == band and row.xmax <= 740000)
+            assert expected
+            for options in [dict(use_index=False), dict(use_index=True), dict(area_index=area_index)]:
+                stmt = select(areas_table.c.id).where(bbox_predicate_filter(areas_table, 'inside', *box, band=band, **options))
+                assert sorted(conn.execute(stmt).scalars()) == expected, (band, options)
+
+def test_search_uses_rtree():
+    engine, projects_table, areas_table = create_test_database()
+    assert ensure_areas_rtree(engine)
+
+    join_stmt = projects_table.outerjoin(areas_table, projects_table.c.uuid == areas_table.c.project_id)
+    stmt = select(projects_table.c.uuid).select_from(join_stmt).where(
+        inside_bbox_filter(areas_table, 700000, 3500000, 710000, 3510000)
+    )
+    compiled = stmt.compile(engine, compile_kwargs={'literal_binds': True})
+    with engine.connect() as conn:
+        plan = ' '.join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+    print(f"Query plan: {plan}")
+    assert f'SCAN {RTREE_TABLE} VIRTUAL TABLE INDEX' in plan
+    assert 'SEARCH areas USING INTEGER PRIMARY KEY' in plan
+
+if __name__ == "__main__":
+    test_existing_rows_are_backfilled()
+    test_triggers_keep_index_in_sync()
+    test_indexed_filter_matches_scan()
+    test_predicates_match_scan()
+    test_scale_band_filter()
+    test_search_uses_rtree()
+    print("✅ All spatial index tests passed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script for the map frame lookups in spatial_queries.
+Uses a temporary database so elements.db is never touched.
+"""
+
+from spatial_index import ensure_areas_rtree
+from packed_index import PackedAreaIndex
+from spatial_queries import areas_at_point, nearest_areas
+from test_spatial_index import create_test_database
+
+def create_catalog():
+    engine, projects_table, areas_table = create_test_database()
+    ensure_areas_rtree(engine)
+    with engine.begin() as conn:
+        for uuid in ('city', 'region', 'country'):
+            conn.execute(projects_table.insert().values(
+                uuid=uuid, project_name=uuid.title(), user_name='tester', date='01-01-24',
+                file_location=f'sampleDataset/{uuid}', paper_size='A4', description=''
+            ))
+        # Nested frames around (735000, 3600000) at different scales
+        conn.execute(areas_table.insert().values(project_id='country', xmin=600000, ymin=3400000, xmax=800000, ymax=3700000, scale='1:250000'))
+        conn.execute(areas_table.insert().values(project_id='city', xmin=734000, ymin=3599000, xmax=736000, ymax=3601000, scale='1:5000'))
+        conn.execute(areas_table.insert().values(project_id='region', xmin=720000, ymin=3590000, xmax=750000, ymax=3610000, scale='Scale: 1:50000'))
+        conn.execute(areas_table.insert().values(project_id='region', xmin=900000, ymin=3590000, xmax=950000, ymax=3610000, scale='1:50000'))
+    return engine, projects_table, areas_table
+
+def test_areas_at_point_ordered_by_scale():
+    engine, projects_table, areas_table = create_catalog()
+    with engine.connect() as conn:
+        areas = areas_at_point(conn, projects_table, areas_table, 735000, 3600000)
+    assert [a['scale'] for a in areas] == ['1:5000', 'Scale: 1:50000', '1:250000']
+    assert areas[0]['project']['project_name'] == 'City'
+
+def test_areas_at_point_with_memory_index():
+    engine, projects_table, areas_table = create_catalog()
+    area_index = PackedAreaIndex(engine)
+    with engine.connect() as conn:
+        assert len(areas_at_point(conn, projects_table, areas_table, 740000, 3600000, area_index=area_index)) == 2
+        # Points on the frame border are covered
+        assert len(areas_at_point(conn, projects_table, areas_table, 736000, 3601000, area_index=area_index)) == 3
+        assert areas_at_point(conn, projects_table, areas_table, 0, 0, area_index=area_index) == []
+
+def test_nearest_areas():
+    engine, projects_table, areas_table = create_catalog()
+    area_index = PackedAreaIndex(engine)
+    with engine.connect() as conn:
+        for options in [dict(area_index=area_index), dict(use_index=True), dict(use_index=False)]:
+            # Inside three frames, the fourth one is 165 km east
+            areas = nearest_areas(conn, projects_table, areas_table, 735000, 3600000, 4, **options)
+            assert [a['distance'] for a in areas] == [0, 0, 0, 165000]
+            assert areas[3]['xmin'] == 900000
+            # Outside everything: distance to the closest edge
+            areas = nearest_areas(conn, projects_table, areas_table, 880000, 3600000, 1, **options)
+            assert areas[0]['xmin'] == 900000 and areas[0]['distance'] == 20000
+            # Optional filters
+            areas = nearest_areas(conn, projects_table, areas_table, 880000, 3600000, 2, scale='1:250000', **options)
+            assert [a['project']['uuid'] for a in areas] == ['country']
+            areas = nearest_areas(conn, projects_table, areas_table, 735000, 3600000, 5, user='nobody', **options)
+            assert areas == []
+
+if __name__ == "__main__":
+    test_areas_at_point_ordered_by_scale()
+    test_areas_at_point_with_memory_index()
+    test_nearest_areas()
+    print("✅ All spatial query tests passed!")
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: booting a worker (importing main.py, which calls
+create_app()) must stay under a time budget and must not write to the
+database. create_app() serves databases with pending migrations and refuses
+ones without the tables. Uses temporary databases so elements.db is never
+touched.
+
+Run directly to print the timings:
+    python test_startup.py
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from sqlalchemy import func, select
+
+from db_engine import create_sqlite_engine
+from db_schema import initialize_database, projects_table, areas_table
+from test_spatial_index import create_test_database
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Seconds for a fresh interpreter to import main.py (Flask, SQLAlchemy, ... included)
+WORKER_BOOT_BUDGET = 5.0
+# Seconds of that spent in create_app(), whatever the size of the database
+CREATE_APP_BUDGET = 0.25
+
+BOOT_SCRIPT = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+app.create_app()
+ready = time.perf_counter()
+print(json.dumps({'import': imported - start, 'create_app': ready - imported, 'total': ready - start,
+                  'rtree': app.RTREE_AVAILABLE, 'fts': app.FTS_AVAILABLE, 'trigram': app.TRIGRAM_AVAILABLE}))
+"""
+
+def boot_worker(directory, script=BOOT_SCRIPT):
+    """Import the app in a new interpreter with directory as working directory"""
+    env = dict(os.environ, PYTHONPATH=PROJECT_ROOT)
+    result = subprocess.run([sys.executable, '-c', script], cwd=directory, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+def create_catalog(directory, n_areas=20000):
+    """An initialized elements.db with n_areas areas"""
+    database = os.path.join(directory, 'elements.db')
+    engine = create_sqlite_engine(database)
+    initialize_database(engine)
+    if n_areas:
+        with engine.begin() as conn:
+            conn.execute(projects_table.insert(), [
+                {'uuid': f'p{i:04d}', 'project_name': f'Project {i}', 'user_name': f'user{i % 7}', 'date': '01-01-24',
+                 'file_location': 'x', 'paper_size': 'A3', 'description': ''}
+                for i in range(n_areas // 10)
+            ])
+            conn.execute(areas_table.insert(), [
+                {'project_id': f'p{i // 10:04d}', 'xmin': i, 'ymin': i, 'xmax': i + 100, 'ymax': i + 100, 'scale': '1:5000'}
+                for i in range(n_areas)
+            ])
+    engine.dispose()
+    return database
+
+def test_worker_boot_is_under_budget():
+    directory = tempfile.mkdtemp()
+    create_catalog(directory)
+    timings = boot_worker(directory)
+    assert timings['rtree'] and timings['fts'] and timings['trigram']
+    assert timings['create_app'] < CREATE_APP_BUDGET, timings
+    assert timings['total'] < WORKER_BOOT_BUDGET, timings
+
+def test_worker_boot_does_not_write():
+    directory = tempfile.mkdtemp()
+    database = create_catalog(directory, n_areas=0)
+    with open(database, 'rb') as f:
+        before = f.read()
+    boot_worker(directory)
+    with open(database, 'rb') as f:
+        assert f.read() == before
+    # No sample data in an empty database
+    engine = create_sqlite_engine(database)
+    with engine.connect() as conn:
+        assert conn.execute(select(func.count()).select_from(projects_table)).scalar_one() == 0
+
+def test_import_does_not_open_the_database():
+    directory = tempfile.mkdtemp()
+    boot_worker(directory, "import app\nprint('{}')")
+    assert not os.path.exists(os.path.join(directory, 'elements.db'))
+
+def test_unmigrated_database_is_served():
+    import app
+    # Tables as created before the migrations existed, at schema version 0
+    legacy_engine, legacy_projects, legacy_areas = create_test_database()
+    with legacy_engine.begin() as conn:
+        conn.execute(legacy_projects.insert().values(
+            uuid='p1', project_name='Old', user_name='tester', date='01-01-24',
+            file_location='x', paper_size='A4', description=''))
+        conn.execute(legacy_areas.insert().values(project_id='p1', xmin=0, ymin=0, xmax=10, ymax=10, scale='1:500'))
+    try:
+        app.create_app(str(legacy_engine.url))
+        assert 'area_m2' not in app.areas_table.c and 'associated_scales' not in app.projects_table.c
+        client = app.app.test_client()
+        assert client.get('/').status_code == 200
+        assert client.get('/?projects_associated_scales_filter=500').status_code == 200
+        response = client.post('/api/add_project', json={
+            'project_name': 'New', 'user_name': 'tester', 'date': '02-01-24', 'file_location': 'y',
+            'paper_size': 'A3', 'description': '', 'areas': [{'xmin': 1, 'ymin': 1, 'xmax': 2, 'ymax': 2, 'scale': '1:1000'}]
+        })
+        assert response.status_code == 201, response.get_data(as_text=True)
+    finally:
+        app.create_app(app.DATABASE_URL)
+
+def test_uninitialized_database_is_refused():
+    import app
+    try:
+        app.create_app(f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'elements.db')}")
+        assert False, 'create_app() started without the tables'
+    except RuntimeError as e:
+        assert 'db_schema.py' in str(e)
+
+if __name__ == "__main__":
+    directory = tempfile.mkdtemp()
+    create_catalog(directory)
+    timings = boot_worker(directory)
+    print(f"⏱️  import {timings['import']:.3f}s, create_app {timings['create_app'] * 1000:.1f}ms, "
+          f"total {timings['total']:.3f}s (budget {WORKER_BOOT_BUDGET}s)")
+    test_worker_boot_is_under_budget()
+    test_worker_boot_does_not_write()
+    test_import_does_not_open_the_database()
+    test_unmigrated_database_is_served()
+    test_uninitialized_database_is_refused()
+    print("✅ All startup tests passed!")
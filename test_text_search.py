@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Test script for the full-text and substring search indexes.
+Uses a temporary database so elements.db is never touched.
+"""
+
+from sqlalchemy import MetaData, Table, select, text
+
+from text_search import (
+    ensure_projects_fts, parse_text_query, fts_match_query, text_matches, text_scan_filter, FTS_TABLE,
+    ensure_areas_trigram, substring_filter, associated_scales_filter, TRIGRAM_TABLE
+)
+from test_spatial_index import create_test_database
+
+PROJECTS = [
+    ('p1', 'Jericho roads', 'yoav', 'Road survey north of the city'),
+    ('p2', 'יריחו', 'dana', 'Jericho old town'),
+    ('p3', 'Haifa port', 'jericho_team', None),
+    ('p4', 'Eilat', 'dana', 'Coral reef'),
+]
+
+AREAS = [
+    ('p1', '1:5000'), ('p1', '1:50000'), ('p2', '1:25,000'), ('p3', 'Scale: 1:1250'), ('p4', '1:5000'),
+]
+
+def create_catalog():
+    engine, projects_table, areas_table = create_test_database()
+    with engine.begin() as conn:
+        for uuid, name, user, description in PROJECTS:
+            conn.execute(projects_table.insert().values(
+                uuid=uuid, project_name=name, user_name=user, date='01-01-24',
+                file_location='sampleDataset/test', paper_size='A4', description=description
+            ))
+    return engine, projects_table
+
+def create_areas(engine):
+    metadata = MetaData()
+    projects_table = Table('projects', metadata, autoload_with=engine)
+    areas_table = Table('areas', metadata, autoload_with=engine)
+    with engine.begin() as conn:
+        for project_id, scale in AREAS:
+            conn.execute(areas_table.insert().values(
+                project_id=project_id, xmin=0, ymin=0, xmax=1, ymax=1, scale=scale))
+    return projects_table, areas_table
+
+def area_ids(engine, areas_table, condition):
+    with engine.connect() as conn:
+        return sorted(conn.execute(select(areas_table.c.id).where(condition)).scalars())
+
+def search(engine, projects_table, query):
+    matches = text_matches(parse_text_query(query))
+    with engine.connect() as conn:
+        return conn.execute(
+            select(projects_table.c.uuid)
+            .select_from(projects_table.join(matches, matches.c.uuid == projects_table.c.uuid))
+            .order_by(matches.c.text_rank)
+        ).scalars().all()
+
+def test_parse_text_query():
+    assert parse_text_query('  Jericho, "roads" 2024 ') == ['Jericho', 'roads', '2024']
+    assert parse_text_query('') == []
+    assert fts_match_query(['jer', 'road']) == '"jer"* "road"*'
+
+def test_ranked_search():
+    engine, projects_table = create_catalog()
+    assert ensure_projects_fts(engine)
+    # Name matches rank first, then user name matches, then description matches
+    assert search(engine, projects_table, 'jericho') == ['p1', 'p3', 'p2']
+    assert search(engine, projects_table, 'jeri road') == ['p1']
+    assert search(engine, projects_table, 'יריח') == ['p2']
+    assert search(engine, projects_table, 'DANA coral') == ['p4']
+    assert search(engine, projects_table, 'tel aviv') == []
+
+def test_triggers_keep_index_current():
+    engine, projects_table = create_catalog()
+    ensure_projects_fts(engine)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO projects (uuid, project_name, user_name, date, file_location, paper_size, description) "
+            "VALUES ('p5', 'Nablus', 'omer', '01-01-24', 'x', 'A4', 'roads')"
+        ))
+        conn.execute(projects_table.update().where(projects_table.c.uuid == 'p1').values(project_name='Jenin'))
+        conn.execute(projects_table.delete().where(projects_table.c.uuid == 'p2'))
+    assert sorted(search(engine, projects_table, 'road')) == ['p1', 'p5']
+    assert search(engine, projects_table, 'jericho') == ['p3']
+    assert search(engine, projects_table, 'jenin') == ['p1']
+
+def test_out_of_sync_index_is_rebuilt():
+    engine, projects_table = create_catalog()
+    ensure_projects_fts(engine)
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    assert search(engine, projects_table, 'eilat') == []
+    assert ensure_projects_fts(engine)
+    assert search(engine, projects_table, 'eilat') == ['p4']
+
+def fts_keys(engine):
+    with engine.connect() as conn:
+        return sorted(conn.execute(text(f"SELECT rowid, uuid FROM {FTS_TABLE}")).fetchall())
+
+def project_keys(engine):
+    with engine.connect() as conn:
+        return sorted(conn.execute(text("SELECT rowid, uuid FROM projects")).fetchall())
+
+def test_index_rows_keyed_by_project_rowid():
+    engine, projects_table = create_catalog()
+    ensure_projects_fts(engine)
+    with engine.begin() as conn:
+        conn.execute(projects_table.update().where(projects_table.c.uuid == 'p3').values(uuid='p33', project_name='Jenin'))
+        conn.execute(projects_table.delete().where(projects_table.c.uuid == 'p2'))
+    assert fts_keys(engine) == project_keys(engine)
+    assert search(engine, projects_table, 'jenin') == ['p33']
+
+    # An index keyed otherwise (older triggers, renumbered rowids) is rebuilt
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE {FTS_TABLE} SET rowid = rowid + 100"))
+    assert fts_keys(engine) != project_keys(engine)
+    assert ensure_projects_fts(engine)
+    assert fts_keys(engine) == project_keys(engine)
+
+def test_scan_fallback_matches_index():
+    engine, projects_table = create_catalog()
+    ensure_projects_fts(engine)
+    for query in ('jericho', 'road', 'dana coral'):
+        with engine.connect() as conn:
+            scanned = conn.execute(
+                select(projects_table.c.uuid).where(text_scan_filter(projects_table, parse_text_query(query)))
+            ).scalars().all()
+        assert sorted(scanned) == sorted(search(engine, projects_table, query))
+
+def test_query_plan_uses_fts():
+    engine, projects_table = create_catalog()
+    ensure_projects_fts(engine)
+    matches = text_matches(['jericho'])
+    stmt = select(projects_table.c.uuid).select_from(
+        projects_table.join(matches, matches.c.uuid == projects_table.c.uuid))
+    compiled = stmt.compile(engine, compile_kwargs={'literal_binds': True})
+    with engine.connect() as conn:
+        plan = ' '.join(str(row[-1]) for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+    assert f'{FTS_TABLE} VIRTUAL TABLE INDEX' in plan
+
+def test_substring_filters_match_scan():
+    engine, _ = create_catalog()
+    projects_table, areas_table = create_areas(engine)
+    assert ensure_areas_trigram(engine)
+    for column, value in (('scale', '5000'), ('scale', 'SCALE'), ('scale', '25,0'), ('scale', '1:'),
+                          ('scale', '7'), ('project_id', 'p1'), ('project_id', 'P')):
+        indexed = area_ids(engine, areas_table, substring_filter(areas_table, column, value))
+        scanned = area_ids(engine, areas_table, substring_filter(areas_table, column, value, use_index=False))
+        assert indexed == scanned
+    assert len(area_ids(engine, areas_table, substring_filter(areas_table, 'scale', '5000'))) == 3
+
+def test_trigram_triggers_and_rebuild():
+    engine, _ = create_catalog()
+    projects_table, areas_table = create_areas(engine)
+    ensure_areas_trigram(engine)
+    with engine.begin() as conn:
+        conn.execute(areas_table.update().where(areas_table.c.scale == '1:50000').values(scale='1:10000'))
+        conn.execute(areas_table.delete().where(areas_table.c.project_id == 'p4'))
+    assert len(area_ids(engine, areas_table, substring_filter(areas_table, 'scale', '5000'))) == 1
+    assert len(area_ids(engine, areas_table, substring_filter(areas_table, 'scale', '10000'))) == 1
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {TRIGRAM_TABLE}"))
+    assert ensure_areas_trigram(engine)
+    assert len(area_ids(engine, areas_table, substring_filter(areas_table, 'scale', '1:'))) == 4
+
+def test_associated_scales_filter():
+    engine, _ = create_catalog()
+    projects_table, areas_table = create_areas(engine)
+    ensure_areas_trigram(engine)
+    with engine.connect() as conn:
+        stmt = select(projects_table.c.uuid).where(associated_scales_filter(projects_table, areas_table, '5000'))
+        assert sorted(conn.execute(stmt).scalars()) == ['p1', 'p4']
+        stmt = select(projects_table.c.uuid).where(associated_scales_filter(projects_table, areas_table, '1250'))
+        assert conn.execute(stmt).scalars().all() == ['p3']
+        compiled = stmt.compile(engine, compile_kwargs={'literal_binds': True})
+        plan = ' '.join(str(row[-1]) for row in conn.execute(text(f"EXPLAIN QUERY PLAN {compiled}")))
+    assert f'{TRIGRAM_TABLE} VIRTUAL TABLE INDEX' in plan
+    # Spans two scales of the aggregated string
+    assert associated_scales_filter(projects_table, areas_table, '5000,1:') is None
+
+if __name__ == "__main__":
+    test_parse_text_query()
+    test_ranked_search()
+    test_triggers_keep_index_current()
+    test_out_of_sync_index_is_rebuilt()
+    test_index_rows_keyed_by_project_rowid()
+    test_scan_fallback_matches_index()
+    test_query_plan_uses_fts()
+    test_substring_filters_match_scan()
+    test_trigram_triggers_and_rebuild()
+    test_associated_scales_filter()
+    print("✅ All text search tests passed!")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test script for the footprint tiles.
+Uses a temporary database so elements.db is never touched.
+"""
+
+import json
+import math
+
+from counters import ensure_row_counters, ensure_change_counters
+from spatial_index import ensure_areas_rtree
+from tiles import tile_bounds, tile_utm_box, footprint_tile, tile_etag, tile_cache, to_wgs84
+from test_spatial_index import create_test_database
+
+def tile_for(lon, lat, z):
+    n = 2 ** z
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return z, x, y
+
+def test_tile_bounds():
+    west, south, east, north = tile_bounds(0, 0, 0)
+    assert (west, east) == (-180, 180)
+    assert math.isclose(north, 85.0511287798, abs_tol=1e-6) and math.isclose(south, -north)
+    west, south, east, north = tile_bounds(*tile_for(35.5, 32.2, 10))
+    assert west <= 35.5 <= east and south <= 32.2 <= north
+
+def test_footprint_tiles():
+    engine, projects_table, areas_table = create_test_database()
+    ensure_areas_rtree(engine)
+    assert ensure_row_counters(engine) and ensure_change_counters(engine)
+    with engine.begin() as conn:
+        conn.execute(projects_table.insert().values(
+            uuid='p1', project_name='Test', user_name='tester', date='01-01-24',
+            file_location='sampleDataset/test', paper_size='A4', description=''
+        ))
+        conn.execute(areas_table.insert().values(project_id='p1', xmin=735000, ymin=3563000, xmax=736000, ymax=3564000, scale='1:5000'))
+
+    lon, lat = to_wgs84.transform(735500, 3563500)
+    tile = tile_for(lon, lat, 12)
+    xmin, ymin, xmax, ymax = tile_utm_box(*tile)
+    assert xmin < 735500 < xmax and ymin < 3563500 < ymax
+
+    with engine.connect() as conn:
+        data, version = footprint_tile(conn, areas_table, *tile)
+        features = json.loads(data)['features']
+        assert len(features) == 1 and features[0]['properties']['project_id'] == 'p1'
+        ring = features[0]['geometry']['coordinates'][0]
+        assert len(ring) == 5 and ring[0] == ring[-1]
+        assert all(abs(x - lon) < 0.01 and abs(y - lat) < 0.01 for x, y in ring)
+        # Far away tile
+        assert json.loads(footprint_tile(conn, areas_table, *tile_for(34.8, 29.5, 12))[0])['features'] == []
+        # Served from the cache
+        assert footprint_tile(conn, areas_table, *tile)[0] is data
+
+    # Adding a frame invalidates the cached tile
+    with engine.begin() as conn:
+        conn.execute(areas_table.insert().values(project_id='p1', xmin=735100, ymin=3563100, xmax=735200, ymax=3563200, scale='1:1000'))
+    with engine.connect() as conn:
+        new_data, new_version = footprint_tile(conn, areas_table, *tile)
+        assert new_version != version
+        assert len(json.loads(new_data)['features']) == 2
+
+def test_moved_frame_invalidates_tile():
+    engine, projects_table, areas_table = create_test_database()
+    ensure_areas_rtree(engine)
+    with engine.begin() as conn:
+        conn.execute(projects_table.insert().values(
+            uuid='p1', project_name='Test', user_name='tester', date='01-01-24',
+            file_location='sampleDataset/test', paper_size='A4', description=''
+        ))
+        conn.execute(areas_table.insert().values(project_id='p1', xmin=735000, ymin=3563000, xmax=736000, ymax=3564000, scale='1:5000'))
+    tile = tile_for(*to_wgs84.transform(735500, 3563500), 12)
+
+    # Versions of other test databases are in the per-worker cache as well
+    tile_cache.clear()
+    # Without the change counters the tile has no version and is not cached
+    with engine.connect() as conn:
+        data, version = footprint_tile(conn, areas_table, *tile)
+        assert version is None and footprint_tile(conn, areas_table, *tile)[0] is not data
+
+    assert ensure_row_counters(engine) and ensure_change_counters(engine)
+    with engine.connect() as conn:
+        data, version = footprint_tile(conn, areas_table, *tile)
+        assert version is not None and tile_etag(version) == f'areas-{version[0]}-1'
+        assert len(json.loads(data)['features']) == 1
+
+    # Same row count and max id, but the frame moved out of the tile
+    with engine.begin() as conn:
+        conn.execute(areas_table.update().values(xmin=635000, xmax=636000))
+    with engine.connect() as conn:
+        new_data, new_version = footprint_tile(conn, areas_table, *tile)
+        assert new_version != version
+        assert json.loads(new_data)['features'] == []
+
+if __name__ == "__main__":
+    test_tile_bounds()
+    test_footprint_tiles()
+    test_moved_frame_invalidates_tile()
+    print("✅ All tile tests passed!")
@@ -0,0 +1,217 @@
+"""
+Text filters and free-text search on the catalog columns.
+
+Column filter boxes and search fields match case-insensitively from the start
+of the value. SQLAlchemy's ilike() compiles to lower(column) LIKE lower(?),
+which SQLite can't answer from an index. A plain LIKE is already
+case-insensitive in SQLite (for ASCII, like lower()), and a prefix pattern is
+turned into a range scan on an index with NOCASE collation - see the
+PREFIX_INDEXES migration in db_migrations.
+
+Free-text search over the project name, description and user name uses an
+SQLite FTS5 table (projects_fts) kept in sync by triggers like the areas
+R*Tree, so every writer maintains it. Results are ranked with BM25, a match in
+the project name counting most. The FTS rows are keyed by the projects rowid,
+so the triggers update and delete them with a rowid lookup; they also carry the
+project uuid, which searches join on, because VACUUM may renumber the rowids of
+a table with a text primary key. ensure_projects_fts() rebuilds the index when
+the rowids no longer match.
+
+Substring ("contains") filters on the area project ids and scales use a
+second FTS5 table with the trigram tokenizer (areas_trigram, rows keyed by the
+area id). SQLite answers col LIKE '%x%' on it from the trigram index instead of
+scanning the areas table; patterns shorter than three characters still work,
+FTS5 scans its own table for them.
+"""
+
+import re
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, Float, and_, or_, select, text
+
+FTS_TABLE = 'projects_fts'
+
+# BM25 weights of the FTS columns (uuid, project_name, description, user_name)
+FTS_RANK = 'bm25(0.0, 10.0, 1.0, 5.0)'
+
+# Lightweight table definition used only to compose queries against the index;
+# the column named like the table and rank are FTS5's hidden columns
+fts_metadata = MetaData()
+projects_fts_table = Table(FTS_TABLE, fts_metadata,
+    Column('uuid', String, primary_key=True),
+    Column('project_name', String),
+    Column('description', String),
+    Column('user_name', String),
+    Column(FTS_TABLE, String),
+    Column('rank', Float)
+)
+
+FTS_SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        uuid UNINDEXED, project_name, description, user_name,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    # The uuid checks keep a renumbered rowid from touching another project's row
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON projects BEGIN
+        INSERT OR REPLACE INTO {FTS_TABLE} (rowid, uuid, project_name, description, user_name)
+        VALUES (new.rowid, new.uuid, new.project_name, coalesce(new.description, ''), new.user_name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF uuid, project_name, description, user_name ON projects BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid AND uuid = old.uuid;
+        INSERT OR REPLACE INTO {FTS_TABLE} (rowid, uuid, project_name, description, user_name)
+        VALUES (new.rowid, new.uuid, new.project_name, coalesce(new.description, ''), new.user_name);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON projects BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.rowid AND uuid = old.uuid;
+    END""",
+]
+
+TRIGRAM_TABLE = 'areas_trigram'
+# Areas columns in the trigram index
+TRIGRAM_COLUMNS = ('project_id', 'scale')
+
+areas_trigram_table = Table(TRIGRAM_TABLE, fts_metadata,
+    Column('rowid', Integer, primary_key=True),
+    Column('project_id', String),
+    Column('scale', String)
+)
+
+TRIGRAM_SCHEMA = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {TRIGRAM_TABLE} USING fts5(project_id, scale, tokenize = 'trigram')",
+    f"""CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_insert AFTER INSERT ON areas BEGIN
+        INSERT INTO {TRIGRAM_TABLE} (rowid, project_id, scale) VALUES (new.id, new.project_id, new.scale);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_update AFTER UPDATE OF id, project_id, scale ON areas BEGIN
+        DELETE FROM {TRIGRAM_TABLE} WHERE rowid = old.id;
+        INSERT INTO {TRIGRAM_TABLE} (rowid, project_id, scale) VALUES (new.id, new.project_id, new.scale);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_delete AFTER DELETE ON areas BEGIN
+        DELETE FROM {TRIGRAM_TABLE} WHERE rowid = old.id;
+    END""",
+]
+
+# Words of a free-text query: runs of letters/digits (any script)
+TERM_PATTERN = re.compile(r'\w+')
+
+def prefix_filter(column, prefix):
+    """SQL condition: the column starts with prefix, ignoring case (NOCASE index backed)"""
+    return column.like(f"{prefix}%")
+
+def ensure_projects_fts(engine):
+    """
+    Create the projects full-text index and its triggers if they don't exist,
+    and (re)fill the index when it is out of sync with the projects table
+    (missing rows, or rows whose rowid is not their project's).
+
+    Returns:
+        bool: True if full-text search is available, False if this SQLite
+              build has no FTS5 support (searches then scan with LIKE)
+    """
+    try:
+        with engine.begin() as conn:
+            # Older triggers matched the rows by uuid, a scan of the index per write
+            for event in ('insert', 'update', 'delete'):
+                conn.execute(text(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{event}"))
+            for statement in FTS_SCHEMA:
+                conn.execute(text(statement))
+            conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rank) VALUES ('rank', '{FTS_RANK}')"))
+
+            projects_count = conn.execute(text("SELECT count(*) FROM projects")).scalar()
+            fts_count = conn.execute(text(f"SELECT count(*) FROM {FTS_TABLE}")).scalar()
+            keyed_count = conn.execute(text(
+                f"SELECT count(*) FROM projects JOIN {FTS_TABLE} f ON f.rowid = projects.rowid AND f.uuid = projects.uuid"
+            )).scalar()
+            if projects_count != fts_count or keyed_count != projects_count:
+                print(f"🔄 Rebuilding full-text index ({keyed_count} of {projects_count} projects indexed)...")
+                conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+                conn.execute(text(
+                    f"""INSERT INTO {FTS_TABLE} (rowid, uuid, project_name, description, user_name)
+                    SELECT rowid, uuid, project_name, coalesce(description, ''), user_name FROM projects"""
+                ))
+        return True
+    except Exception as e:
+        print(f"⚠️  Full-text index not available, text searches will scan the projects table: {e}")
+        return False
+
+def ensure_areas_trigram(engine):
+    """
+    Create the areas trigram index and its triggers if they don't exist, and
+    (re)fill the index when it is out of sync with the areas table.
+
+    Returns:
+        bool: True if the trigram index is available, False if this SQLite
+              build has no FTS5 trigram tokenizer (filters then scan)
+    """
+    try:
+        with engine.begin() as conn:
+            for statement in TRIGRAM_SCHEMA:
+                conn.execute(text(statement))
+
+            areas_count = conn.execute(text("SELECT count(*) FROM areas")).scalar()
+            trigram_count = conn.execute(text(f"SELECT count(*) FROM {TRIGRAM_TABLE}")).scalar()
+            if areas_count != trigram_count:
+                print(f"🔄 Rebuilding substring index ({trigram_count} of {areas_count} areas indexed)...")
+                conn.execute(text(f"DELETE FROM {TRIGRAM_TABLE}"))
+                conn.execute(text(
+                    f"INSERT INTO {TRIGRAM_TABLE} (rowid, project_id, scale) SELECT id, project_id, scale FROM areas"
+                ))
+        return True
+    except Exception as e:
+        print(f"⚠️  Substring index not available, substring filters will scan the areas table: {e}")
+        return False
+
+def substring_filter(areas_table, column_name, value, use_index=True):
+    """
+    SQL condition on areas: the column (one of TRIGRAM_COLUMNS) contains value,
+    ignoring case. Index backed when use_index is set (see ensure_areas_trigram).
+    """
+    pattern = f"%{value}%"
+    if not use_index:
+        return areas_table.c[column_name].like(pattern)
+    trigram = areas_trigram_table.c
+    return areas_table.c.id.in_(select(trigram.rowid).where(trigram[column_name].like(pattern)))
+
+def associated_scales_filter(projects_table, areas_table, value, use_index=True):
+    """
+    SQL condition on projects: the comma separated associated scales contain
+    value, i.e. some area of the project has a scale containing it. A value
+    with a comma can span two scales; it is matched against the materialized
+    projects.associated_scales column, or None is returned for databases
+    without it (the aggregated string has to be matched instead).
+    """
+    if ',' in value:
+        if 'associated_scales' in projects_table.c:
+            return projects_table.c.associated_scales.like(f"%{value}%")
+        return None
+    return projects_table.c.uuid.in_(
+        select(areas_table.c.project_id).where(substring_filter(areas_table, 'scale', value, use_index))
+    )
+
+def parse_text_query(value):
+    """
+    Split a free-text query into its search terms.
+
+    Example:
+        'Jericho, roads 2024' -> ['Jericho', 'roads', '2024']
+    """
+    return TERM_PATTERN.findall(value or '')
+
+def fts_match_query(terms):
+    """FTS5 query matching projects that contain all terms (each as a word prefix)"""
+    return ' '.join(f'"{term}"*' for term in terms)
+
+def text_matches(terms):
+    """
+    Subquery of the projects matching all terms: (uuid, text_rank), a lower
+    text_rank being a better match. Join it on projects.uuid and order by
+    text_rank.
+    """
+    fts = projects_fts_table.c
+    return select(fts.uuid, fts.rank.label('text_rank')).where(
+        fts[FTS_TABLE].op('MATCH')(fts_match_query(terms))
+    ).subquery('text_matches')
+
+def text_scan_filter(projects_table, terms):
+    """Fallback without the full-text index: every term in the name, description or user name (unranked)"""
+    columns = (projects_table.c.project_name, projects_table.c.description, projects_table.c.user_name)
+    return and_(*[or_(*[column.like(f"%{term}%") for column in columns]) for term in terms])
@@ -0,0 +1,137 @@
+"""
+XYZ tiles of the map frame footprints.
+
+Every tile (Web Mercator z/x/y scheme, as used by Leaflet, OpenLayers and
+MapLibre) is a compact GeoJSON FeatureCollection of the footprints
+intersecting it, in WGS84 longitude/latitude. Footprints are stored in UTM 36N,
+so the tile extent is converted to a UTM box that is answered through the
+spatial index and the frame corners are converted back.
+
+Encoded tiles are cached per worker. The cache key includes the change counter
+and max id of the areas table, so adding, moving or deleting a frame
+invalidates them without counting the areas on every request. Databases with
+pending migrations have no change counter, and their tiles are not cached.
+"""
+
+import json
+import math
+
+from sqlalchemy import select
+
+from coverage import CoverageCache, areas_version
+from spatial_index import bbox_predicate_filter, PREDICATE_INTERSECTS
+
+try:
+    from pyproj import Transformer
+    PYPROJ_AVAILABLE = True
+    to_utm = Transformer.from_crs("EPSG:4326", "EPSG:32636", always_xy=True)
+    to_wgs84 = Transformer.from_crs("EPSG:32636", "EPSG:4326", always_xy=True)
+except ImportError:
+    PYPROJ_AVAILABLE = False
+    print("⚠️  pyproj not available. Footprint tiles will be disabled.")
+    print("   Install with: pip install pyproj")
+
+MAX_ZOOM = 22
+# Footprints per tile; zoom in for the rest
+MAX_TILE_FEATURES = 10000
+# Number of encoded tiles kept per worker
+TILE_CACHE_SIZE = 1024
+# Points per tile edge when projecting the tile extent to UTM (edges bend in UTM)
+EDGE_SAMPLES = 8
+
+tile_cache = CoverageCache(max_entries=TILE_CACHE_SIZE)
+
+def validate_tile(z, x, y):
+    """Return an error message for an out-of-range tile address, or None"""
+    if z < 0 or z > MAX_ZOOM:
+        return f'Zoom must be between 0 and {MAX_ZOOM}'
+    if not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return f'Tile {z}/{x}/{y} does not exist'
+    return None
+
+def tile_bounds(z, x, y):
+    """WGS84 (west, south, east, north) of an XYZ tile"""
+    n = 2 ** z
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, latitude(y + 1), (x + 1) / n * 360.0 - 180.0, latitude(y)
+
+def tile_utm_box(z, x, y):
+    """UTM 36N box enclosing the tile (sampled along the tile edges)"""
+    west, south, east, north = tile_bounds(z, x, y)
+    lons, lats = [], []
+    for i in range(EDGE_SAMPLES + 1):
+        t = i / EDGE_SAMPLES
+        lon = west + (east - west) * t
+        lat = south + (north - south) * t
+        lons.extend((lon, lon, west, east))
+        lats.extend((south, north, lat, lat))
+    xs, ys = to_utm.transform(lons, lats)
+    finite = [(px, py) for px, py in zip(xs, ys) if math.isfinite(px) and math.isfinite(py)]
+    if not finite:
+        return None
+    return (min(p[0] for p in finite), min(p[1] for p in finite),
+            max(p[0] for p in finite), max(p[1] for p in finite))
+
+def coordinate_decimals(z):
+    """Decimal places that keep about a tenth of a pixel of precision at zoom z"""
+    return min(7, max(1, math.ceil(math.log10(2 ** z * 256 / 360.0)) + 1))
+
+def footprint_tile(conn, areas_table, z, x, y, use_index=True, area_index=None):
+    """
+    Return the encoded GeoJSON tile (bytes) for z/x/y and the areas version it
+    was built from (usable as an ETag; None without the change counters, and
+    the tile is not cached).
+    """
+    version = areas_version(conn)
+    key = (version, z, x, y)
+    tile = tile_cache.get(key) if version is not None else None
+    if tile is not None:
+        return tile, version
+
+    features = []
+    truncated = False
+    box = tile_utm_box(z, x, y)
+    if box is not None:
+        stmt = select(
+            areas_table.c.id, areas_table.c.project_id, areas_table.c.scale,
+            areas_table.c.xmin, areas_table.c.ymin, areas_table.c.xmax, areas_table.c.ymax
+        ).where(
+            bbox_predicate_filter(areas_table, PREDICATE_INTERSECTS, *box, use_index=use_index, area_index=area_index)
+        ).order_by(areas_table.c.id).limit(MAX_TILE_FEATURES + 1)
+        rows = conn.execute(stmt).fetchall()
+        truncated = len(rows) > MAX_TILE_FEATURES
+        rows = rows[:MAX_TILE_FEATURES]
+
+        if rows:
+            # Project all corners with one call: SW, SE, NE, NW per frame
+            xs, ys = [], []
+            for row in rows:
+                xs.extend((row.xmin, row.xmax, row.xmax, row.xmin))
+                ys.extend((row.ymin, row.ymin, row.ymax, row.ymax))
+            lons, lats = to_wgs84.transform(xs, ys)
+            decimals = coordinate_decimals(z)
+            for i, row in enumerate(rows):
+                ring = [[round(lons[j], decimals), round(lats[j], decimals)] for j in range(4 * i, 4 * i + 4)]
+                ring.append(ring[0])
+                features.append({
+                    'type': 'Feature',
+                    'id': row.id,
+                    'geometry': {'type': 'Polygon', 'coordinates': [ring]},
+                    'properties': {'project_id': row.project_id, 'scale': row.scale}
+                })
+
+    collection = {'type': 'FeatureCollection', 'features': features}
+    if truncated:
+        collection['truncated'] = True
+    tile = json.dumps(collection, separators=(',', ':')).encode('utf-8')
+    if version is not None:
+        tile_cache.put(key, tile)
+    return tile, version
+
+def tile_etag(version):
+    """ETag for tiles built from a given areas version"""
+    changes, max_id = version
+    return f'areas-{changes}-{max_id}'